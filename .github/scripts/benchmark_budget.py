@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+Select the benchmark jobs that fit in a budget of runner-hours per platform. The
+most important models run first, and the others take turns on the rest of the
+budget so that every model still runs at least every few days. When each job
+last ran is kept in a small JSON file, so the selection only depends on the
+matrix, the budget, that file, and the date. The file needs to outlive the
+ephemeral runners, so the workflow restores and saves it, e.g. with actions/cache
+or as an artifact of the previous run:
+
+{
+  "version": 1,
+  "last_run": {
+    "linux.dgx.b200.8|qwen/qwen3-30b-a3b": "2026-10-16",
+    ...
+  }
+}
+"""
+
+import datetime
+import json
+import os
+from json.decoder import JSONDecodeError
+from logging import info, warning
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Bump this when the layout of the rotation state changes
+ROTATION_STATE_VERSION = 1
+# Every job runs at least once in this many days, whatever its priority
+DEFAULT_MAX_STALENESS = 7
+# The priority of the models without one
+DEFAULT_PRIORITY = 1
+# The budget of the platforms without one
+ALL_PLATFORMS = "*"
+
+
+def parse_budget(budget: str) -> Dict[str, float]:
+    """
+    Parse a budget in runner-hours like 40 for every platform, or cuda=40,rocm=20
+    for some of them and no limit for the rest
+    """
+    budgets = {}
+    for item in budget.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        platform, sep, hours = item.rpartition("=")
+        budgets[platform.strip() if sep else ALL_PLATFORMS] = float(hours)
+    return budgets
+
+
+def get_job_key(entry: Dict[str, Any]) -> str:
+    return f"{entry['runner']}|{entry['models']}"
+
+
+def load_rotation_state(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {"version": ROTATION_STATE_VERSION, "last_run": {}}
+    with open(path) as f:
+        try:
+            state = json.load(f)
+        except JSONDecodeError as e:
+            warning(f"Fail to load {path}, start a new rotation: {e}")
+            state = {}
+    if state.get("version") != ROTATION_STATE_VERSION:
+        return {"version": ROTATION_STATE_VERSION, "last_run": {}}
+    return state
+
+
+def save_rotation_state(path: str, state: Dict[str, Any]) -> None:
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(f"{path}.tmp", path)
+
+
+def get_days_since_last_run(
+    state: Dict[str, Any], entry: Dict[str, Any], today: datetime.date
+) -> Optional[int]:
+    last_run = state["last_run"].get(get_job_key(entry))
+    if not last_run:
+        return None
+    return (today - datetime.date.fromisoformat(last_run)).days
+
+
+def select_within_budget(
+    entries: List[Dict[str, Any]],
+    budgets: Dict[str, float],
+    get_platform: Callable[[Dict[str, Any]], str],
+    priorities: Dict[str, float],
+    state: Dict[str, Any],
+    today: datetime.date,
+    max_staleness: int = DEFAULT_MAX_STALENESS,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    Select the entries that fit in the budget of their platform, each entry has
+    its cost in runner-hours. The jobs that haven't run for max_staleness days,
+    or never, go first, the most overdue first. The rest of the budget goes to
+    the jobs with the highest priority per runner-hour, boosted by how long ago
+    they last ran, so that the low priority ones get their turn before they are
+    overdue. Return the selected and the dropped entries in their original order,
+    and record the selected ones as run today in the state
+    """
+
+    def get_staleness(entry: Dict[str, Any]) -> float:
+        days = get_days_since_last_run(state, entry, today)
+        return float("inf") if days is None else days
+
+    def get_priority(entry: Dict[str, Any]) -> float:
+        return max(
+            priorities.get(model, DEFAULT_PRIORITY)
+            for model in entry["models"].split(",")
+        )
+
+    by_platform: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+    for i, entry in enumerate(entries):
+        by_platform.setdefault(get_platform(entry), []).append((i, entry))
+
+    selected = set()
+    for platform, platform_entries in sorted(by_platform.items()):
+        budget = budgets.get(platform, budgets.get(ALL_PLATFORMS))
+        if budget is None:
+            selected.update(i for i, _ in platform_entries)
+            continue
+
+        overdue = sorted(
+            [(i, e) for i, e in platform_entries if get_staleness(e) >= max_staleness],
+            key=lambda item: (
+                -get_staleness(item[1]),
+                -get_priority(item[1]),
+                get_job_key(item[1]),
+            ),
+        )
+        rest = sorted(
+            [(i, e) for i, e in platform_entries if get_staleness(e) < max_staleness],
+            key=lambda item: (
+                -get_priority(item[1])
+                * (1 + get_staleness(item[1]) / max_staleness)
+                / max(item[1]["cost"], 0.01),
+                get_job_key(item[1]),
+            ),
+        )
+
+        spent = 0.0
+        for i, entry in overdue + rest:
+            if spent + entry["cost"] > budget:
+                # Only warn about the jobs that have run before, all the jobs are
+                # new on the first run
+                if max_staleness <= get_staleness(entry) < float("inf"):
+                    warning(
+                        f"{get_job_key(entry)} is overdue but doesn't fit in the {budget}h budget of {platform}"
+                    )
+                continue
+            spent += entry["cost"]
+            selected.add(i)
+        info(
+            f"Select {len([i for i, _ in platform_entries if i in selected])} out of "
+            f"{len(platform_entries)} jobs on {platform}, {spent:.1f} out of {budget} runner-hours"
+        )
+
+    for i in selected:
+        state["last_run"][get_job_key(entries[i])] = today.isoformat()
+    return (
+        [e for i, e in enumerate(entries) if i in selected],
+        [e for i, e in enumerate(entries) if i not in selected],
+    )
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""
+The historical duration of the benchmark jobs by runner and model, used to pack
+several models into the same job. The history is either a JSON file with a list
+of the past runs:
+
+[
+  {"runner": "linux.dgx.b200.8", "model": "qwen/qwen3-30b-a3b", "duration": 1830},
+  ...
+]
+
+or a mapping from runner to model to duration, or a SQLite database with the
+same columns in a benchmark_durations table. The durations are in seconds and
+exclude the setup of the job, e.g. pulling the docker image.
+"""
+
+import json
+import sqlite3
+import statistics
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+SQLITE_HISTORY_QUERY = """
+SELECT runner, model, duration FROM benchmark_durations
+WHERE duration IS NOT NULL
+ORDER BY timestamp
+"""
+# Only the most recent runs of each model are used, older runs could be on an
+# older vLLM version with a different performance
+HISTORY_WINDOW = 10
+
+
+def load_history(history: str) -> List[Tuple[str, str, float]]:
+    if history.endswith((".db", ".sqlite", ".sqlite3")):
+        conn = sqlite3.connect(history)
+        try:
+            return [
+                (runner, model.lower(), float(duration))
+                for runner, model, duration in conn.execute(SQLITE_HISTORY_QUERY)
+            ]
+        finally:
+            conn.close()
+
+    with open(history) as f:
+        records = json.load(f)
+    if isinstance(records, dict):
+        return [
+            (runner, model.lower(), float(duration))
+            for runner, durations in records.items()
+            for model, duration in durations.items()
+        ]
+    return [
+        (r["runner"], r["model"].lower(), float(r["duration"]))
+        for r in records
+        if r.get("duration") is not None
+    ]
+
+
+def load_durations(history: str) -> Dict[Tuple[str, str], float]:
+    """
+    Return the median duration of the recent runs of each runner and model
+    """
+    runs: Dict[Tuple[str, str], List[float]] = defaultdict(list)
+    for runner, model, duration in load_history(history):
+        runs[(runner, model)].append(duration)
+    return {
+        key: statistics.median(durations[-HISTORY_WINDOW:])
+        for key, durations in runs.items()
+    }
+
+
+def get_duration(
+    durations: Dict[Tuple[str, str], float],
+    runner: str,
+    model: str,
+    runner_to_platform: Dict[str, str],
+) -> Optional[float]:
+    """
+    Return the duration of the model on the runner, or on the other runners of the
+    same platform when it has never run there, or None when it's unknown
+    """
+    if (runner, model) in durations:
+        return durations[(runner, model)]
+
+    platform = runner_to_platform.get(runner)
+    same_platform = [
+        duration
+        for (r, m), duration in durations.items()
+        if m == model and platform and runner_to_platform.get(r) == platform
+    ]
+    if same_platform:
+        return statistics.median(same_platform)
+    return None
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+
+import glob
+import hashlib
+import json
+import os
+import pickle
+import re
+from concurrent.futures import ProcessPoolExecutor
+from logging import info, warning
+from typing import Any, Dict, List, Optional
+from json.decoder import JSONDecodeError
+
+try:
+    import orjson
+
+    orjson_available = True
+except ImportError:
+    orjson_available = False
+
+# Below this number of files, the cost of starting the worker processes is higher
+# than what is saved by parsing the files in parallel
+PARALLEL_LOAD_MIN_FILES = 64
+NON_WHITESPACE = re.compile(r"\S")
+# Bump this when the layout of the parse cache changes
+PARSE_CACHE_VERSION = 1
+
+
+def loads(data: str) -> Any:
+    if orjson_available:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson is stricter than json, i.e. it doesn't accept NaN or Infinity
+            # that Python json.dumps writes by default
+            pass
+    return json.loads(data)
+
+
+def is_json_each_row(data: str) -> bool:
+    """
+    Detect the ClickHouse JSONEachRow format from the first line of the file, a
+    complete JSON record on the first line followed by more content means that
+    there is one record per line. Otherwise, this is a regular JSON file
+    """
+    start = NON_WHITESPACE.search(data)
+    if not start:
+        return False
+
+    newline = data.find("\n", start.start())
+    if newline == -1 or not NON_WHITESPACE.search(data, newline):
+        return False
+
+    first_line = data[start.start() : newline].rstrip()
+    return (first_line.startswith("{") and first_line.endswith("}")) or (
+        first_line.startswith("[") and first_line.endswith("]")
+    )
+
+
+def read_json_each_row(data: str) -> List[Dict[str, Any]]:
+    results = []
+    for line in data.splitlines():
+        if not line or line.isspace():
+            continue
+
+        try:
+            r = loads(line)
+            # Each row needs to be a dictionary in JSON format or a list
+            if isinstance(r, dict):
+                results.append(r)
+            elif isinstance(r, list):
+                results.extend(r)
+            else:
+                warning(f"Not a JSON dict or list {line}, skipping")
+                continue
+
+        except JSONDecodeError:
+            warning(f"Invalid JSON {line}, skipping")
+
+    return results
+
+
+def read_benchmark_results(filepath: str) -> List[Dict[str, Any]]:
+    with open(filepath) as f:
+        data = f.read()
+
+    if is_json_each_row(data):
+        return read_json_each_row(data)
+
+    try:
+        r = loads(data)
+    except JSONDecodeError:
+        # Not a valid JSON file, try to salvage what we can line by line
+        return read_json_each_row(data)
+
+    # Handle the JSONEachRow case where there is only one record in the
+    # JSON file, it can still be loaded normally, but will need to be
+    # added into the list of benchmark results with the length of 1
+    if isinstance(r, dict):
+        return [r]
+    elif isinstance(r, list):
+        return r
+    return []
+
+
+def read_all_benchmark_results(
+    files: List[str], max_workers: Optional[int] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Parse the files in a process pool when there are many of them
+    """
+    if len(files) < PARALLEL_LOAD_MIN_FILES:
+        return [read_benchmark_results(file) for file in files]
+
+    max_workers = max_workers or min(os.cpu_count() or 1, 16)
+    if max_workers == 1:
+        return [read_benchmark_results(file) for file in files]
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return list(
+            executor.map(
+                read_benchmark_results,
+                files,
+                chunksize=max(1, len(files) // (max_workers * 4)),
+            )
+        )
+
+
+def get_file_fingerprint(filepath: str) -> Dict[str, Any]:
+    stat = os.stat(filepath)
+    with open(filepath, "rb") as f:
+        sha256 = hashlib.sha256(f.read()).hexdigest()
+    return {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": sha256,
+    }
+
+
+def is_fresh(filepath: str, fingerprint: Dict[str, Any]) -> bool:
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return False
+
+    # Check the cheap size and mtime first before hashing the file
+    if (
+        stat.st_size != fingerprint["size"]
+        or stat.st_mtime_ns != fingerprint["mtime_ns"]
+    ):
+        return False
+    return get_file_fingerprint(filepath)["sha256"] == fingerprint["sha256"]
+
+
+def read_parse_cache(parse_cache: str) -> Dict[str, Any]:
+    if not os.path.exists(parse_cache):
+        return {}
+
+    try:
+        with open(parse_cache, "rb") as f:
+            cache = pickle.load(f)
+    except Exception as e:
+        warning(f"Fail to load the parse cache {parse_cache}, ignoring it: {e}")
+        return {}
+
+    if not isinstance(cache, dict) or cache.get("version") != PARSE_CACHE_VERSION:
+        warning(f"Unknown parse cache version in {parse_cache}, ignoring it")
+        return {}
+    return cache["files"]
+
+
+def write_parse_cache(
+    parse_cache: str, benchmark_results: Dict[str, List[Dict[str, Any]]]
+) -> None:
+    """
+    Save the parsed benchmark results by file path together with the size, mtime,
+    and hash of the file, so that the next step working on the same directory can
+    skip parsing the files that have not changed
+    """
+    files = {}
+    for file, results in benchmark_results.items():
+        files[os.path.realpath(file)] = {
+            "fingerprint": get_file_fingerprint(file),
+            "results": results,
+        }
+
+    with open(parse_cache, "wb") as f:
+        pickle.dump(
+            {"version": PARSE_CACHE_VERSION, "files": files},
+            f,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+    info(f"Write the parse cache of {len(files)} files to {parse_cache}")
+
+
+def load_benchmark_results(
+    benchmark_results_dir: str,
+    max_workers: Optional[int] = None,
+    parse_cache: Optional[str] = None,
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Read all the JSON files in the benchmark results directory and return their
+    results by file path in the same order as glob. Files that are unchanged since
+    the parse cache was written are not parsed again
+    """
+    files = glob.glob(f"{benchmark_results_dir}/*.json")
+    cache = read_parse_cache(parse_cache) if parse_cache else {}
+
+    benchmark_results = {}
+    stale_files = []
+    for file in files:
+        entry = cache.get(os.path.realpath(file))
+        if entry and is_fresh(file, entry["fingerprint"]):
+            benchmark_results[file] = entry["results"]
+        else:
+            stale_files.append(file)
+
+    if parse_cache:
+        info(
+            f"Reuse {len(benchmark_results)} files from the parse cache {parse_cache}, parse {len(stale_files)}"
+        )
+
+    benchmark_results.update(
+        zip(stale_files, read_all_benchmark_results(stale_files, max_workers))
+    )
+    return {file: benchmark_results[file] for file in files}
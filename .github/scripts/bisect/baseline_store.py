@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+"""
+A local store of the baselines by good commit, repro, and host class, so that
+bisecting again from the same good commit, e.g. with another bad commit or
+threshold, doesn't need to build and run the good commit again. Each baseline
+keeps the samples written by the regression detector with --record-baseline
+and/or the log of the repro, and the environment it was recorded in.
+
+Restore a baseline recorded in the last 7 days, exit code 1 if there is none:
+
+python baseline_store.py get --store-dir ~/.cache/bisect_baselines --commit 34cdf49... \
+    --cmdline "$REPRO_CMDLINE" --max-age 7d --samples baseline.json --log baseline.log
+
+Store the baseline after recording it:
+
+python baseline_store.py put --store-dir ~/.cache/bisect_baselines --commit 34cdf49... \
+    --cmdline "$REPRO_CMDLINE" --samples baseline.json --log baseline.log
+"""
+
+import hashlib
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, Namespace
+from logging import info
+from typing import Any, Dict, Optional
+
+from result_cache import get_env_fingerprint
+
+logging.basicConfig(level=logging.INFO)
+
+# Bump this when the layout of the baselines changes
+BASELINE_STORE_VERSION = 1
+# The baselines older than this are not reused by default
+DEFAULT_MAX_AGE = "7d"
+AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_age(age: str) -> float:
+    """
+    Parse an age like 3600, 30m, 12h, or 7d to seconds
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*", age)
+    if not match:
+        raise ValueError(f"Invalid age {age}, expect e.g. 3600, 30m, 12h, or 7d")
+    return float(match.group(1)) * AGE_UNITS[match.group(2) or "s"]
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} minutes"
+    if seconds < 86400:
+        return f"{seconds / 3600:.1f} hours"
+    return f"{seconds / 86400:.1f} days"
+
+
+def get_gpu_names() -> str:
+    if not shutil.which("nvidia-smi"):
+        return ""
+    try:
+        output = subprocess.check_output(
+            ["nvidia-smi", "--query-gpu=name", "--format=csv,noheader"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        )
+    except (subprocess.CalledProcessError, OSError):
+        return ""
+    names = [line.strip() for line in output.splitlines() if line.strip()]
+    return f"{len(names)}x{names[0]}" if names else ""
+
+
+def get_cpu_model() -> str:
+    try:
+        with open("/proc/cpuinfo") as f:
+            for line in f:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor()
+
+
+def get_host_class() -> str:
+    """
+    The baselines are only comparable on the same kind of host, i.e. the same
+    runner type. Set BISECT_HOST_CLASS to the runner label to name it explicitly
+    """
+    host_class = os.environ.get("BISECT_HOST_CLASS")
+    if host_class:
+        return host_class
+    parts = [platform.machine(), get_cpu_model(), get_gpu_names()]
+    return " / ".join(part for part in parts if part)
+
+
+class BaselineStore:
+    """
+    Each baseline is a JSON file named after the hash of the good commit, the
+    repro command line, the metrics, the host class, and the environment variables
+    that can change the result of the repro, see result_cache.py
+    """
+
+    def __init__(self, store_dir: str, host_class: Optional[str] = None):
+        self.store_dir = store_dir
+        self.host_class = host_class or get_host_class()
+
+    def get_path(
+        self,
+        commit: str,
+        cmdline: str,
+        environ: Dict[str, str],
+        metrics: Optional[str] = None,
+    ) -> str:
+        key = hashlib.sha256(
+            json.dumps(
+                {
+                    "commit": commit,
+                    "cmdline": cmdline,
+                    "metrics": metrics or "",
+                    "host_class": self.host_class,
+                    "env": get_env_fingerprint(environ),
+                },
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()[:16]
+        return os.path.join(self.store_dir, f"{commit}-{key}.json")
+
+    def get(
+        self,
+        commit: str,
+        cmdline: str,
+        environ: Dict[str, str],
+        metrics: Optional[str] = None,
+        max_age: Optional[float] = None,
+        min_samples: int = 1,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return the baseline with its age in seconds, or None if there is no
+        baseline, or it's too old, or it has fewer than min_samples samples
+        """
+        path = self.get_path(commit, cmdline, environ, metrics)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            info(f"Fail to load the baseline {path}, ignoring it: {e}")
+            return None
+        if entry.get("version") != BASELINE_STORE_VERSION:
+            return None
+
+        entry["age"] = time.time() - entry["timestamp"]
+        if max_age is not None and entry["age"] > max_age:
+            info(
+                f"The baseline of {commit} is {format_age(entry['age'])} old, older than {format_age(max_age)}"
+            )
+            return None
+
+        samples = (entry.get("baseline") or {}).get("samples")
+        if samples is not None:
+            if isinstance(samples, list):
+                samples = {"value": samples}
+            if min(len(v) for v in samples.values()) < min_samples:
+                info(f"The baseline of {commit} has fewer than {min_samples} samples")
+                return None
+        elif min_samples > 1 or entry.get("log") is None:
+            return None
+        return entry
+
+    def put(
+        self,
+        commit: str,
+        cmdline: str,
+        environ: Dict[str, str],
+        metrics: Optional[str] = None,
+        baseline: Optional[Dict[str, Any]] = None,
+        log: Optional[str] = None,
+        duration: Optional[float] = None,
+    ) -> str:
+        os.makedirs(self.store_dir, exist_ok=True)
+        path = self.get_path(commit, cmdline, environ, metrics)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(
+                {
+                    "version": BASELINE_STORE_VERSION,
+                    "commit": commit,
+                    "cmdline": cmdline,
+                    "metrics": metrics,
+                    "host_class": self.host_class,
+                    "hostname": socket.gethostname(),
+                    "python": platform.python_version(),
+                    "env": get_env_fingerprint(environ),
+                    "timestamp": int(time.time()),
+                    # The samples written by --record-baseline, and the log
+                    "baseline": baseline,
+                    "log": log,
+                    "duration": duration
+                    or (baseline.get("duration") if baseline else None),
+                },
+                f,
+            )
+        os.replace(f"{path}.tmp", path)
+        return path
+
+    def describe(self, entry: Dict[str, Any]) -> str:
+        return (
+            f"the baseline of {entry['commit']} recorded {format_age(entry['age'])} ago "
+            f"on {entry['hostname']} ({entry['host_class']})"
+        )
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser("Store and restore the bisect baselines")
+    parser.add_argument("command", choices=["get", "put"], help="the command")
+    parser.add_argument(
+        "--store-dir",
+        type=str,
+        required=True,
+        help="the directory of the baseline store",
+    )
+    parser.add_argument(
+        "--commit",
+        type=str,
+        required=True,
+        help="the full SHA of the good commit",
+    )
+    parser.add_argument(
+        "--cmdline",
+        type=str,
+        required=True,
+        help="the repro command line",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        default=os.environ.get("METRICS", ""),
+        help="the metrics of the repro, default to METRICS",
+    )
+    parser.add_argument(
+        "--samples",
+        type=str,
+        help="the baseline samples file written by regression_detector.py --record-baseline",
+    )
+    parser.add_argument(
+        "--log",
+        type=str,
+        help="the log of the baseline run",
+    )
+    parser.add_argument(
+        "--duration",
+        type=float,
+        help="the duration of the baseline run in seconds",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=str,
+        default=DEFAULT_MAX_AGE,
+        help="only reuse the baselines recorded within this age, e.g. 12h or 7d",
+    )
+    parser.add_argument(
+        "--min-samples",
+        type=int,
+        default=1,
+        help="only reuse the baselines with at least this many samples",
+    )
+    parser.add_argument(
+        "--env-file",
+        type=str,
+        help="write the environment variables of the restored baseline, e.g. BASELINE_DURATION, to this file",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    store = BaselineStore(args.store_dir)
+    environ = dict(os.environ)
+
+    if args.command == "put":
+        baseline = None
+        if args.samples:
+            with open(args.samples) as f:
+                baseline = json.load(f)
+        log = None
+        if args.log:
+            with open(args.log) as f:
+                log = f.read()
+        path = store.put(
+            args.commit,
+            args.cmdline,
+            environ,
+            args.metrics,
+            baseline,
+            log,
+            args.duration,
+        )
+        info(f"Store the baseline of {args.commit} in {path}")
+        return 0
+
+    entry = store.get(
+        args.commit,
+        args.cmdline,
+        environ,
+        args.metrics,
+        parse_age(args.max_age),
+        args.min_samples,
+    )
+    if entry is None or (args.samples and not entry.get("baseline")):
+        info(f"Find no baseline of {args.commit} to reuse on {store.host_class}")
+        return 1
+
+    info(f"Reuse {store.describe(entry)}")
+    if args.samples:
+        with open(args.samples, "w") as f:
+            json.dump(entry["baseline"], f)
+    if args.log and entry.get("log") is not None:
+        with open(args.log, "w") as f:
+            f.write(entry["log"])
+    if args.env_file:
+        with open(args.env_file, "w") as f:
+            f.write(f"BASELINE_AGE={int(entry['age'])}\n")
+            if entry.get("duration"):
+                f.write(f"BASELINE_DURATION={entry['duration']:.0f}\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,293 @@
+"""
+How the bisect driver gets a build of a commit before evaluating it:
+
+- InPlaceBuilder checks out and builds each commit in the repo itself, one at a
+  time, the same as tritonparse does.
+- WorktreeBuilder builds several commits at once, each in its own git worktree
+  with a shared compiler cache, and keeps the wheels in a content-addressed cache
+  by commit. A commit is evaluated by checking it out in the repo and installing
+  its cached wheels, so later bisects over overlapping ranges don't build it again.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import queue
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from logging import info, warning
+from typing import Dict, Iterable, List, Optional
+
+from bisect_timeline import Timeline
+
+DEFAULT_INSTALL_CMD = (
+    f"{sys.executable} -m pip install --force-reinstall --no-deps $BISECT_WHEELS"
+)
+DEFAULT_WHEEL_GLOB = "dist/*.whl"
+
+
+def git(repo_dir: str, *args: str) -> str:
+    return subprocess.check_output(["git", *args], cwd=repo_dir, text=True).strip()
+
+
+def checkout(repo_dir: str, commit: str, submodules: bool = False) -> None:
+    git(repo_dir, "checkout", "--quiet", "--force", "--detach", commit)
+    if submodules:
+        git(repo_dir, "submodule", "sync", "--recursive")
+        git(repo_dir, "submodule", "update", "--init", "--recursive")
+
+
+class InPlaceBuilder:
+    def __init__(
+        self,
+        repo_dir: str,
+        build_cmd: str,
+        checkout_submodules: bool = False,
+        timeline: Optional[Timeline] = None,
+    ):
+        self.repo_dir = repo_dir
+        self.build_cmd = build_cmd
+        self.checkout_submodules = checkout_submodules
+        self.timeline = timeline or Timeline()
+        self.builds: List[str] = []
+        self.cached: List[str] = []
+
+    def prefetch(self, commits: Iterable[str]) -> None:
+        # The build is in the repo itself, so there is nothing to do in advance
+        pass
+
+    def prepare(self, commit: str) -> bool:
+        info(f"Build {commit}")
+        self.builds.append(commit)
+        with self.timeline.span("checkout", commit):
+            checkout(self.repo_dir, commit, self.checkout_submodules)
+
+        rc = self.timeline.call(
+            self.build_cmd,
+            "build",
+            commit,
+            env={**os.environ, "BISECT_COMMIT": commit},
+            shell=True,
+            cwd=self.repo_dir,
+        )
+        if rc != 0:
+            warning(f"Fail to build {commit}, exit code {rc}")
+        return rc == 0
+
+    def close(self) -> None:
+        pass
+
+
+class WheelCache:
+    """
+    The wheels are stored once by their SHA256 under objects/, and each commit has
+    an index under commits/ pointing to its wheels. The index is keyed by the
+    commit and the build command, a different build command means different wheels
+    """
+
+    def __init__(self, cache_dir: str, build_cmd: str):
+        self.cache_dir = cache_dir
+        self.build_key = hashlib.sha256(build_cmd.encode()).hexdigest()[:12]
+
+    def get_index_path(self, commit: str) -> str:
+        return os.path.join(
+            self.cache_dir, "commits", f"{commit}-{self.build_key}.json"
+        )
+
+    def get(self, commit: str) -> Optional[List[str]]:
+        index_path = self.get_index_path(commit)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            warning(f"Fail to load the wheel cache index {index_path}: {e}")
+            return None
+
+        wheels = [os.path.join(self.cache_dir, w["path"]) for w in index["wheels"]]
+        if not all(os.path.exists(w) for w in wheels):
+            return None
+        return wheels
+
+    def put(self, commit: str, wheels: List[str]) -> List[str]:
+        entries = []
+        for wheel in wheels:
+            with open(wheel, "rb") as f:
+                sha256 = hashlib.sha256(f.read()).hexdigest()
+            # Keep the name of the wheel, pip needs it to install the wheel
+            path = os.path.join("objects", sha256, os.path.basename(wheel))
+            cached_wheel = os.path.join(self.cache_dir, path)
+            if not os.path.exists(cached_wheel):
+                os.makedirs(os.path.dirname(cached_wheel), exist_ok=True)
+                shutil.copyfile(wheel, f"{cached_wheel}.tmp")
+                os.replace(f"{cached_wheel}.tmp", cached_wheel)
+            entries.append({"path": path, "sha256": sha256})
+
+        index_path = self.get_index_path(commit)
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        with open(f"{index_path}.tmp", "w") as f:
+            json.dump(
+                {"commit": commit, "timestamp": int(time.time()), "wheels": entries},
+                f,
+            )
+        os.replace(f"{index_path}.tmp", index_path)
+        return [os.path.join(self.cache_dir, e["path"]) for e in entries]
+
+
+class WorktreeBuilder:
+    def __init__(
+        self,
+        repo_dir: str,
+        work_dir: str,
+        build_cmd: str,
+        wheel_cache: str,
+        install_cmd: str = DEFAULT_INSTALL_CMD,
+        compiler_cache: Optional[str] = None,
+        max_workers: int = 1,
+        checkout_submodules: bool = False,
+        wheel_glob: str = DEFAULT_WHEEL_GLOB,
+        timeline: Optional[Timeline] = None,
+    ):
+        self.repo_dir = repo_dir
+        self.work_dir = work_dir
+        self.build_cmd = build_cmd
+        self.cache = WheelCache(wheel_cache, build_cmd)
+        self.install_cmd = install_cmd
+        self.compiler_cache = compiler_cache
+        self.max_workers = max_workers
+        self.checkout_submodules = checkout_submodules
+        self.wheel_glob = wheel_glob
+        self.timeline = timeline or Timeline()
+        self.builds: List[str] = []
+        self.cached: List[str] = []
+        self.failed: Dict[str, int] = {}
+        # Each concurrent build takes a worktree and gives it back when it's done,
+        # the worktrees are kept between the builds for incremental builds
+        self.slots: queue.Queue = queue.Queue()
+        for i in range(max_workers):
+            self.slots.put(os.path.join(work_dir, f"worktree-{i}"))
+
+    def get_build_env(self, worktree: str, commit: str) -> Dict[str, str]:
+        env = {**os.environ, "BISECT_COMMIT": commit}
+        if self.compiler_cache:
+            env.update(
+                {
+                    "CCACHE_DIR": os.path.join(self.compiler_cache, "ccache"),
+                    "SCCACHE_DIR": os.path.join(self.compiler_cache, "sccache"),
+                    # Rewrite the absolute paths relative to the worktree, so that
+                    # the worktrees can hit the cache entries of each other
+                    "CCACHE_BASEDIR": worktree,
+                    "CCACHE_NOHASHDIR": "1",
+                }
+            )
+        return env
+
+    def build(self, commit: str) -> None:
+        worktree = self.slots.get()
+        try:
+            with self.timeline.span("checkout", commit, worktree=worktree):
+                if os.path.exists(worktree):
+                    checkout(worktree, commit, self.checkout_submodules)
+                else:
+                    os.makedirs(self.work_dir, exist_ok=True)
+                    git(
+                        self.repo_dir,
+                        "worktree",
+                        "add",
+                        "--force",
+                        "--detach",
+                        worktree,
+                        commit,
+                    )
+                    if self.checkout_submodules:
+                        checkout(worktree, commit, True)
+
+            # Don't pick up the wheels of the previous build
+            for wheel in glob.glob(os.path.join(worktree, self.wheel_glob)):
+                os.remove(wheel)
+
+            info(f"Build {commit} in {worktree}")
+            self.builds.append(commit)
+            rc = self.timeline.call(
+                self.build_cmd,
+                "build",
+                commit,
+                env=self.get_build_env(worktree, commit),
+                attrs={"worktree": worktree},
+                shell=True,
+                cwd=worktree,
+            )
+            wheels = sorted(glob.glob(os.path.join(worktree, self.wheel_glob)))
+            if rc != 0 or not wheels:
+                warning(f"Fail to build {commit}, exit code {rc}, wheels {wheels}")
+                self.failed[commit] = rc
+                return
+            self.cache.put(commit, wheels)
+        except subprocess.CalledProcessError as e:
+            warning(f"Fail to check out {commit} in {worktree}: {e}")
+            self.failed[commit] = e.returncode
+        finally:
+            self.slots.put(worktree)
+
+    def prefetch(self, commits: Iterable[str]) -> None:
+        """
+        Build the commits that are not in the wheel cache concurrently
+        """
+        missing = []
+        for commit in commits:
+            if commit in missing or commit in self.failed:
+                continue
+            if self.cache.get(commit) is not None:
+                continue
+            missing.append(commit)
+        if not missing:
+            return
+
+        parent = self.timeline.get_current()
+
+        def build(commit: str) -> None:
+            with self.timeline.nested(parent):
+                self.build(commit)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            list(executor.map(build, missing))
+
+    def prepare(self, commit: str) -> bool:
+        wheels = self.cache.get(commit)
+        if wheels is None and commit not in self.failed:
+            self.build(commit)
+            wheels = self.cache.get(commit)
+        elif wheels is not None and commit not in self.builds:
+            info(f"Reuse the cached wheels of {commit}")
+            self.cached.append(commit)
+        if wheels is None:
+            return False
+
+        with self.timeline.span("checkout", commit):
+            checkout(self.repo_dir, commit, self.checkout_submodules)
+        rc = self.timeline.call(
+            self.install_cmd,
+            "install",
+            commit,
+            env={
+                **os.environ,
+                "BISECT_COMMIT": commit,
+                "BISECT_WHEELS": " ".join(wheels),
+            },
+            shell=True,
+            cwd=self.repo_dir,
+        )
+        if rc != 0:
+            warning(f"Fail to install the wheels of {commit}, exit code {rc}")
+        return rc == 0
+
+    def close(self) -> None:
+        while not self.slots.empty():
+            worktree = self.slots.get()
+            if os.path.exists(worktree):
+                git(self.repo_dir, "worktree", "remove", "--force", worktree)
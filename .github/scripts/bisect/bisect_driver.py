@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+
+"""
+Bisect several regressions in the same commit range at once. Each target keeps
+its own good and bad frontier, and every commit is built at most once and then
+evaluated by all the targets that are still searching around it.
+
+Example usage:
+
+python bisect_driver.py --repo-dir $PYTORCH_SRC_DIR --good 34cdf49 --bad 9d49044 \
+    --targets targets.json --build-cmd "bash build_pytorch.sh" --log-dir bisect_logs
+
+With --parallel, several commits are built at once in separate git worktrees, the
+build command then needs to write wheels, e.g. python setup.py bdist_wheel, that
+are kept in a cache by commit and installed before evaluating the commit.
+"""
+
+import json
+import logging
+import os
+import sys
+from argparse import Action, ArgumentParser, Namespace
+from logging import info, warning
+from typing import Any, Dict, List, Optional, Union
+
+from baseline_store import DEFAULT_MAX_AGE, BaselineStore, format_age, parse_age
+from bisect_builders import (
+    DEFAULT_INSTALL_CMD,
+    DEFAULT_WHEEL_GLOB,
+    InPlaceBuilder,
+    WorktreeBuilder,
+    git,
+)
+from bisect_targets import (
+    SKIP_EXIT_CODE,
+    SKIP_EXIT_CODES,
+    evaluate_targets,
+    get_target_env,
+    load_targets,
+)
+from bisect_timeline import Timeline, load_spans, summarize
+from commit_pruning import get_changed_paths, parse_globs, prune_commits
+
+logging.basicConfig(level=logging.INFO)
+
+DETECTOR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "regression_detector.py"
+)
+
+
+class ValidateDir(Action):
+    def __call__(
+        self,
+        parser: ArgumentParser,
+        namespace: Namespace,
+        values: Any,
+        option_string: Optional[str] = None,
+    ) -> None:
+        if os.path.isdir(values):
+            setattr(namespace, self.dest, values)
+            return
+
+        parser.error(f"{values} is not a valid directory")
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser("Bisect several regressions at once, sharing the builds")
+    parser.add_argument(
+        "--repo-dir",
+        type=str,
+        required=True,
+        action=ValidateDir,
+        help="the PyTorch repo to bisect",
+    )
+    parser.add_argument(
+        "--good",
+        type=str,
+        required=True,
+        help="the last known good commit",
+    )
+    parser.add_argument(
+        "--bad",
+        type=str,
+        required=True,
+        help="the first known bad commit",
+    )
+    parser.add_argument(
+        "--targets",
+        type=str,
+        required=True,
+        help="the JSON file with the targets, see bisect_targets.py",
+    )
+    parser.add_argument(
+        "--build-cmd",
+        type=str,
+        required=True,
+        help="the shell command to build the commit checked out in the repo",
+    )
+    parser.add_argument(
+        "--checkout-submodules",
+        action="store_true",
+        help="update the submodules after checking out each commit",
+    )
+    parser.add_argument(
+        "--log-dir",
+        type=str,
+        default="bisect_logs",
+        help="where to write the baselines and the bisect results",
+    )
+    parser.add_argument(
+        "--detector",
+        type=str,
+        default=DETECTOR,
+        help="the regression detector script",
+    )
+    parser.add_argument(
+        "--include",
+        type=str,
+        default="",
+        help="only bisect the commits changing these comma-separated path globs, see commit_pruning.py",
+    )
+    parser.add_argument(
+        "--exclude",
+        type=str,
+        default="",
+        help="don't bisect the commits only changing these comma-separated path globs",
+    )
+    parser.add_argument(
+        "--parallel",
+        type=int,
+        default=1,
+        help="build this many commits at once in separate worktrees, each step then splits the range into parallel + 1 segments",
+    )
+    parser.add_argument(
+        "--work-dir",
+        type=str,
+        help="where to create the worktrees, default to <repo-dir>-worktrees",
+    )
+    parser.add_argument(
+        "--wheel-cache",
+        type=str,
+        help="keep the wheels built for each commit in this directory and reuse them, default to <work-dir>/wheels",
+    )
+    parser.add_argument(
+        "--wheel-glob",
+        type=str,
+        default=DEFAULT_WHEEL_GLOB,
+        help="the wheels written by the build command, relative to the worktree",
+    )
+    parser.add_argument(
+        "--install-cmd",
+        type=str,
+        default=DEFAULT_INSTALL_CMD,
+        help="the shell command to install the wheels of a commit listed in $BISECT_WHEELS",
+    )
+    parser.add_argument(
+        "--compiler-cache",
+        type=str,
+        help="the ccache or sccache directory shared by the worktrees",
+    )
+    parser.add_argument(
+        "--skip-preflight",
+        action="store_true",
+        help="don't check that every target regresses on the bad commit first",
+    )
+    parser.add_argument(
+        "--timeline",
+        type=str,
+        help="write the timeline of the bisect to this JSON lines file, see bisect_timeline.py, default to <log-dir>/timeline.jsonl",
+    )
+    parser.add_argument(
+        "--baseline-store",
+        type=str,
+        help="reuse the baselines of the good commit from this directory and store the new ones there, see baseline_store.py",
+    )
+    parser.add_argument(
+        "--baseline-max-age",
+        type=str,
+        default=DEFAULT_MAX_AGE,
+        help="only reuse the stored baselines recorded within this age, e.g. 12h or 7d",
+    )
+    return parser.parse_args()
+
+
+def list_commits(repo_dir: str, good: str, bad: str) -> List[str]:
+    """
+    Return the commits after good up to bad, oldest first, so bad is the last one
+    """
+    return git(
+        repo_dir, "rev-list", "--reverse", "--ancestry-path", f"{good}..{bad}"
+    ).split()
+
+
+class MultiTargetBisect:
+    def __init__(
+        self,
+        repo_dir: str,
+        good: str,
+        commits: List[str],
+        targets: List[Dict[str, Any]],
+        builder: Union[InPlaceBuilder, WorktreeBuilder],
+        log_dir: str,
+        detector: str = DETECTOR,
+        parallel: int = 1,
+        timeline: Optional[Timeline] = None,
+        baseline_store: Optional[BaselineStore] = None,
+        baseline_max_age: Optional[float] = None,
+    ):
+        self.repo_dir = repo_dir
+        self.good = good
+        self.commits = commits
+        self.targets = targets
+        self.builder = builder
+        self.log_dir = log_dir
+        self.detector = detector
+        # The number of commits probed at once, they split the widest frontier
+        # into parallel + 1 segments
+        self.parallel = parallel
+        self.timeline = timeline or Timeline()
+        self.baseline_store = baseline_store
+        self.baseline_max_age = baseline_max_age
+        # The age in seconds of the stored baselines reused by each target
+        self.reused_baselines: Dict[str, float] = {}
+        # The frontier of each target, as indices into commits where -1 is the
+        # good commit
+        self.frontiers = {
+            target["name"]: {"good": -1, "bad": len(commits) - 1, "skipped": []}
+            for target in targets
+        }
+        self.dropped: Dict[str, str] = {}
+
+    def get_commit(self, index: int) -> str:
+        return self.good if index == -1 else self.commits[index]
+
+    def evaluate(
+        self, index: int, names: List[str], record_baseline_dir: Optional[str] = None
+    ) -> Dict[str, int]:
+        commit = self.get_commit(index)
+        with self.timeline.span("commit", commit):
+            if not self.builder.prepare(commit):
+                return {name: SKIP_EXIT_CODE for name in names}
+            return evaluate_targets(
+                self.detector,
+                self.targets,
+                {**os.environ, "PYTORCH_SRC_DIR": self.repo_dir},
+                names,
+                record_baseline_dir,
+                timeline=self.timeline,
+                commit=commit,
+            )
+
+    def is_functional(self, target: Dict[str, Any]) -> bool:
+        return bool(int(get_target_env(target, dict(os.environ)).get("FUNCTIONAL", 0)))
+
+    def needs_baselines(self) -> List[str]:
+        # A functional repro only checks that the repro passes, it has no baseline
+        return [
+            target["name"]
+            for target in self.targets
+            if "baseline_log" not in target
+            and "baseline_samples" not in target
+            and not self.is_functional(target)
+        ]
+
+    def get_baseline_key(self, target: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        The arguments identifying the baseline of the target in the baseline store
+        """
+        env = get_target_env(
+            target, {**os.environ, "PYTORCH_SRC_DIR": self.repo_dir}
+        )
+        return {
+            "commit": git(self.repo_dir, "rev-parse", self.good),
+            "cmdline": env["REPRO_CMDLINE"],
+            "environ": env,
+            "metrics": env.get("METRICS"),
+        }
+
+    def restore_baselines(self) -> None:
+        """
+        Reuse the stored baselines of the targets that don't have one, so that the
+        good commit is only built when some of them still need one
+        """
+        if not self.baseline_store:
+            return
+
+        baseline_dir = os.path.join(self.log_dir, "baselines")
+        for target in self.targets:
+            if target["name"] not in self.needs_baselines():
+                continue
+            key = self.get_baseline_key(target)
+            entry = self.baseline_store.get(
+                **key,
+                max_age=self.baseline_max_age,
+                min_samples=int(key["environ"].get("REPRO_SAMPLES", 1)),
+            )
+            if entry is None or not entry.get("baseline"):
+                continue
+
+            info(f"Reuse {self.baseline_store.describe(entry)} for {target['name']}")
+            os.makedirs(baseline_dir, exist_ok=True)
+            path = os.path.join(baseline_dir, f"{target['name']}.json")
+            with open(path, "w") as f:
+                json.dump(entry["baseline"], f)
+            target["baseline_samples"] = path
+            self.reused_baselines[target["name"]] = entry["age"]
+
+    def record_baselines(self) -> None:
+        """
+        Build the good commit once to record the baselines of all the targets that
+        don't have one
+        """
+        names = self.needs_baselines()
+        if not names:
+            return
+
+        baseline_dir = os.path.join(self.log_dir, "baselines")
+        os.makedirs(baseline_dir, exist_ok=True)
+        results = self.evaluate(-1, names, baseline_dir)
+        for target in self.targets:
+            if target["name"] not in results:
+                continue
+            if results[target["name"]] != 0:
+                self.drop(target["name"], "fail to record the baseline")
+                continue
+
+            target["baseline_samples"] = os.path.join(
+                baseline_dir, f"{target['name']}.json"
+            )
+            if self.baseline_store:
+                with open(target["baseline_samples"]) as f:
+                    baseline = json.load(f)
+                self.baseline_store.put(
+                    **self.get_baseline_key(target), baseline=baseline
+                )
+
+    def drop(self, name: str, reason: str) -> None:
+        warning(f"Stop bisecting {name}: {reason}")
+        self.dropped[name] = reason
+        del self.frontiers[name]
+
+    def preflight(self) -> None:
+        """
+        Check that every target regresses on the bad commit
+        """
+        results = self.evaluate(len(self.commits) - 1, list(self.frontiers.keys()))
+        for name, rc in results.items():
+            if rc == 0:
+                self.drop(name, "no regression detected on the bad commit")
+            elif rc in SKIP_EXIT_CODES:
+                self.drop(name, "the bad commit can't be tested")
+
+    def get_probes(self, name: str, count: int = 1) -> List[int]:
+        """
+        Split the frontier of the target into count + 1 segments, the probes are the
+        closest commits to the split points that have not been skipped
+        """
+        frontier = self.frontiers[name]
+        candidates = [
+            i
+            for i in range(frontier["good"] + 1, frontier["bad"])
+            if i not in frontier["skipped"]
+        ]
+
+        probes: List[int] = []
+        length = frontier["bad"] - frontier["good"]
+        for j in range(1, count + 1):
+            remaining = [i for i in candidates if i not in probes]
+            if not remaining:
+                break
+            point = frontier["good"] + length * j // (count + 1)
+            probes.append(min(remaining, key=lambda i: (abs(i - point), i)))
+        return sorted(probes)
+
+    def step(self) -> bool:
+        """
+        Probe the widest frontier and evaluate each probe for all the targets whose
+        frontier still contains it. The probes are built at once and evaluated from
+        the oldest, so a bad probe saves the evaluation of the newer ones. Return
+        False when all the targets are done
+        """
+        searching = [name for name in self.frontiers if self.get_probes(name)]
+        if not searching:
+            return False
+
+        widest = max(
+            searching,
+            key=lambda n: self.frontiers[n]["bad"] - self.frontiers[n]["good"],
+        )
+        probes = self.get_probes(widest, self.parallel)
+        with self.timeline.span("prefetch"):
+            self.builder.prefetch(self.get_commit(index) for index in probes)
+
+        for index in probes:
+            names = [
+                name
+                for name in searching
+                if self.frontiers[name]["good"] < index < self.frontiers[name]["bad"]
+                and index not in self.frontiers[name]["skipped"]
+            ]
+            if not names:
+                continue
+
+            info(f"Probe {self.get_commit(index)} for {', '.join(names)}")
+            for name, rc in self.evaluate(index, names).items():
+                frontier = self.frontiers[name]
+                if rc == 0:
+                    frontier["good"] = index
+                elif rc in SKIP_EXIT_CODES:
+                    frontier["skipped"].append(index)
+                else:
+                    frontier["bad"] = index
+        return True
+
+    def run(self, preflight: bool = True) -> Dict[str, Any]:
+        os.makedirs(self.log_dir, exist_ok=True)
+        self.restore_baselines()
+        # Build the good and the bad commits at the same time when possible
+        with self.timeline.span("prefetch"):
+            self.builder.prefetch(
+                ([self.good] if self.needs_baselines() else [])
+                + ([self.commits[-1]] if preflight else [])
+            )
+        with self.timeline.span("baseline"):
+            self.record_baselines()
+        if preflight:
+            with self.timeline.span("preflight"):
+                self.preflight()
+        while True:
+            with self.timeline.span("step"):
+                if not self.step():
+                    break
+        return self.get_results()
+
+    def get_results(self) -> Dict[str, Any]:
+        targets = {}
+        for name, frontier in self.frontiers.items():
+            # The skipped commits within the frontier can't be ruled out
+            candidates = [
+                self.commits[i]
+                for i in range(frontier["good"] + 1, frontier["bad"] + 1)
+            ]
+            targets[name] = {
+                "status": "found" if len(candidates) == 1 else "ambiguous",
+                "first_bad": self.commits[frontier["bad"]],
+                "candidates": candidates,
+            }
+        for name, reason in self.dropped.items():
+            targets[name] = {"status": "dropped", "reason": reason}
+
+        return {
+            "commits": len(self.commits),
+            "builds": len(self.builder.builds),
+            "built_commits": self.builder.builds,
+            "cached_commits": self.builder.cached,
+            "reused_baselines": self.reused_baselines,
+            "targets": targets,
+        }
+
+
+def main() -> None:
+    args = parse_args()
+    targets = load_targets(args.targets)
+    commits = list_commits(args.repo_dir, args.good, args.bad)
+    if not commits:
+        warning(f"Find no commits between {args.good} and {args.bad}")
+        sys.exit(1)
+
+    os.makedirs(args.log_dir, exist_ok=True)
+    # Nest under the span of run.sh when there is one
+    timeline = Timeline(
+        args.timeline
+        or os.environ.get("BISECT_TIMELINE")
+        or os.path.join(args.log_dir, "timeline.jsonl"),
+        os.environ.get("BISECT_TIMELINE_PARENT") or None,
+    )
+    if args.include or args.exclude:
+        with timeline.span("prune"):
+            pruning = prune_commits(
+                get_changed_paths(args.repo_dir, args.good, args.bad),
+                parse_globs(args.include),
+                parse_globs(args.exclude),
+            )
+        commits = pruning["candidates"]
+        with open(os.path.join(args.log_dir, "pruned_commits.json"), "w") as f:
+            json.dump(pruning, f, indent=2)
+        info(
+            f"Keep {len(commits)} of {pruning['commits']} commits after pruning by path, saving about {pruning['builds_saved']} builds"
+        )
+
+    if args.parallel > 1 or args.wheel_cache:
+        work_dir = args.work_dir or f"{os.path.abspath(args.repo_dir)}-worktrees"
+        builder: Union[InPlaceBuilder, WorktreeBuilder] = WorktreeBuilder(
+            args.repo_dir,
+            work_dir,
+            args.build_cmd,
+            args.wheel_cache or os.path.join(work_dir, "wheels"),
+            args.install_cmd,
+            args.compiler_cache,
+            args.parallel,
+            args.checkout_submodules,
+            args.wheel_glob,
+            timeline,
+        )
+    else:
+        builder = InPlaceBuilder(
+            args.repo_dir, args.build_cmd, args.checkout_submodules, timeline
+        )
+
+    bisect = MultiTargetBisect(
+        args.repo_dir,
+        args.good,
+        commits,
+        targets,
+        builder,
+        args.log_dir,
+        args.detector,
+        args.parallel,
+        timeline,
+        BaselineStore(args.baseline_store) if args.baseline_store else None,
+        parse_age(args.baseline_max_age),
+    )
+    try:
+        results = bisect.run(not args.skip_preflight)
+    finally:
+        builder.close()
+
+    output = os.path.join(args.log_dir, "bisect_results.json")
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    info(
+        f"Bisect {len(targets)} targets over {results['commits']} commits with {results['builds']} builds, "
+        f"reuse {len(results['cached_commits'])} cached builds"
+    )
+    for name, age in results["reused_baselines"].items():
+        info(f"{name}: reuse a stored baseline recorded {format_age(age)} ago")
+    for name, result in results["targets"].items():
+        if result["status"] == "dropped":
+            info(f"{name}: {result['reason']}")
+        else:
+            info(f"{name}: first bad commit {' or '.join(result['candidates'])}")
+    info(f"Write the bisect results to {output}")
+    if timeline.path and os.path.exists(timeline.path):
+        info(
+            f"Write the timeline to {timeline.path}:\n"
+            f"{summarize(load_spans(timeline.path))}"
+        )
+    found = all(r["status"] == "found" for r in results["targets"].values())
+    sys.exit(0 if found else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+The targets of a multi-target bisect, i.e. several regressions in the same commit
+range. Each target has its own repro and baseline and is evaluated by running the
+regression detector with the matching environment. The targets are a JSON list
+like:
+
+[
+  {"name": "inception_v3", "repro_cmdline": "python benchmarks/dynamo/timm_models.py ...", "baseline_log": "baseline.log"},
+  {"name": "bert", "repro_cmdline": "...", "metrics": [...], "regression_threshold": 5, "env": {"TORCHINDUCTOR_MAX_AUTOTUNE": "1"}}
+]
+"""
+
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+from bisect_timeline import Timeline
+from repro_watchdog import ERROR_PATTERN_EXIT_CODE, STALL_EXIT_CODE, TIMEOUT_EXIT_CODE
+
+# The keys of a target and the environment variables of the detector they set
+TARGET_ENV = {
+    "repro_cmdline": "REPRO_CMDLINE",
+    "baseline_log": "BASELINE_LOG",
+    "baseline_samples": "BASELINE_SAMPLES",
+    "baseline_duration": "BASELINE_DURATION",
+    "metrics": "METRICS",
+    "regression_threshold": "REGRESSION_THRESHOLD",
+    "repro_samples": "REPRO_SAMPLES",
+    "functional": "FUNCTIONAL",
+}
+# Follow git bisect, this exit code means that the commit can't be tested
+SKIP_EXIT_CODE = 125
+# The commit is also skipped when the watchdog of the detector stops the repro
+SKIP_EXIT_CODES = set(
+    [SKIP_EXIT_CODE, TIMEOUT_EXIT_CODE, STALL_EXIT_CODE, ERROR_PATTERN_EXIT_CODE]
+)
+
+
+def load_targets(targets: str) -> List[Dict[str, Any]]:
+    with open(targets) as f:
+        targets_list = json.load(f)
+
+    names = set()
+    for target in targets_list:
+        assert target.get("name"), f"Target {target} has no name."
+        assert target["name"] not in names, f"Target {target['name']} is duplicated."
+        assert target.get("repro_cmdline"), f"Target {target['name']} has no repro."
+        names.add(target["name"])
+    return targets_list
+
+
+def get_target_env(target: Dict[str, Any], environ: Dict[str, str]) -> Dict[str, str]:
+    env = dict(environ)
+    # Don't leak the baseline of the single target mode into the targets
+    for name in TARGET_ENV.values():
+        if name not in ["FUNCTIONAL", "REGRESSION_THRESHOLD", "REPRO_SAMPLES"]:
+            env.pop(name, None)
+
+    for key, name in TARGET_ENV.items():
+        if key not in target:
+            continue
+        value = target[key]
+        if isinstance(value, (dict, list)):
+            value = json.dumps(value)
+        elif isinstance(value, bool):
+            value = str(int(value))
+        env[name] = str(value)
+    env.update({k: str(v) for k, v in target.get("env", {}).items()})
+    return env
+
+
+def evaluate_targets(
+    detector: str,
+    targets: List[Dict[str, Any]],
+    environ: Dict[str, str],
+    names: Optional[List[str]] = None,
+    record_baseline_dir: Optional[str] = None,
+    extra_args: Optional[List[str]] = None,
+    timeline: Optional[Timeline] = None,
+    commit: Optional[str] = None,
+) -> Dict[str, int]:
+    """
+    Run the detector once per target on the current build and return the exit
+    code of each target
+    """
+    timeline = timeline or Timeline()
+    results = {}
+    for target in targets:
+        if names is not None and target["name"] not in names:
+            continue
+
+        cmd = [sys.executable, detector] + (extra_args or [])
+        if record_baseline_dir:
+            cmd += ["--record-baseline", f"{record_baseline_dir}/{target['name']}.json"]
+        print(f"Evaluate target {target['name']}")
+        results[target["name"]] = timeline.call(
+            cmd,
+            "evaluate",
+            commit,
+            env=get_target_env(target, environ),
+            attrs={"target": target["name"]},
+        )
+    return results
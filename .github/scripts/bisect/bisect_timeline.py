@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+"""
+A timeline of the bisect as JSON lines, one span per phase, e.g. checkout, build,
+install, evaluate, or repro, and per commit, with the CPU time and the peak RSS of
+the child processes. The spans of the child processes, e.g. the repro spans of the
+regression detector, are written to the same file when BISECT_TIMELINE is set and
+nested under the span that started them with BISECT_TIMELINE_PARENT.
+
+Run a command in a span, e.g. from run.sh:
+
+python bisect_timeline.py run --phase build --commit 9d49044 -- bash build_pytorch.sh
+
+Print the critical path and the slowest commits of a bisect:
+
+python bisect_timeline.py summarize bisect_logs/timeline.jsonl
+"""
+
+import itertools
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from argparse import ArgumentParser, Namespace
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# The number of slowest commits and spans to print
+SUMMARY_TOP = 10
+
+
+def get_rusage(usage: resource.struct_rusage) -> Dict[str, Any]:
+    return {
+        "cpu_user": usage.ru_utime,
+        "cpu_system": usage.ru_stime,
+        # KB on Linux
+        "max_rss_kb": usage.ru_maxrss,
+    }
+
+
+class Timeline:
+    """
+    Write the spans to the timeline file, nothing is written when it's not set.
+    The spans of each thread are nested separately, so that the concurrent builds
+    of WorktreeBuilder don't end up under each other
+    """
+
+    def __init__(self, path: Optional[str] = None, parent: Optional[str] = None):
+        self.path = path
+        self.parent = parent
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.local = threading.local()
+
+    @classmethod
+    def from_env(cls) -> "Timeline":
+        return cls(
+            os.environ.get("BISECT_TIMELINE") or None,
+            os.environ.get("BISECT_TIMELINE_PARENT") or None,
+        )
+
+    def get_stack(self) -> List[str]:
+        if not hasattr(self.local, "stack"):
+            self.local.stack = []
+        return self.local.stack
+
+    def get_current(self) -> Optional[str]:
+        stack = self.get_stack()
+        return stack[-1] if stack else self.parent
+
+    @contextmanager
+    def nested(self, parent: Optional[str]) -> Iterator[None]:
+        """
+        Nest the spans of this thread under a span of another thread, e.g. the one
+        that submitted the work to a thread pool
+        """
+        stack = self.get_stack()
+        if parent is None:
+            yield
+            return
+        stack.append(parent)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    def get_env(self) -> Dict[str, str]:
+        """
+        The environment for a child process to nest its spans under the current one
+        """
+        if not self.path:
+            return {}
+        return {
+            "BISECT_TIMELINE": self.path,
+            "BISECT_TIMELINE_PARENT": self.get_current() or "",
+        }
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if not self.path:
+            return
+        with self.lock:
+            # Append a whole line at once, the child processes write to the same file
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    @contextmanager
+    def span(
+        self, phase: str, commit: Optional[str] = None, **attrs: Any
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Record a span around the block, the block can add attributes to the span
+        through the dict it gets, e.g. the exit code. The CPU time is the one of the
+        child processes that finish within the span, and the peak RSS is the one of
+        the largest child process so far. Use call() for the exact resource usage of
+        a child process, i.e. when other threads run child processes at the same
+        time
+        """
+        stack = self.get_stack()
+        span_id = f"{os.getpid()}-{next(self.ids)}"
+        record: Dict[str, Any] = {
+            "id": span_id,
+            "parent": self.get_current(),
+            "phase": phase,
+            "commit": commit,
+            **attrs,
+        }
+        before = resource.getrusage(resource.RUSAGE_CHILDREN)
+        start = time.time()
+        stack.append(span_id)
+        try:
+            yield record
+        finally:
+            stack.pop()
+            end = time.time()
+            if "cpu_user" not in record:
+                after = resource.getrusage(resource.RUSAGE_CHILDREN)
+                record.update(
+                    {
+                        "cpu_user": after.ru_utime - before.ru_utime,
+                        "cpu_system": after.ru_stime - before.ru_stime,
+                        "max_rss_kb": after.ru_maxrss,
+                    }
+                )
+            record.update({"start": start, "end": end, "duration": end - start})
+            self.write(record)
+
+    def call(
+        self,
+        cmd: Any,
+        phase: str,
+        commit: Optional[str] = None,
+        env: Optional[Dict[str, str]] = None,
+        attrs: Optional[Dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> int:
+        """
+        The same as subprocess.call, in a span with the resource usage of the
+        command and its children
+        """
+        with self.span(phase, commit, **(attrs or {})) as record:
+            p = subprocess.Popen(
+                cmd, env={**(env or os.environ), **self.get_env()}, **kwargs
+            )
+            try:
+                _, status, usage = os.wait4(p.pid, 0)
+            except KeyboardInterrupt:
+                p.kill()
+                p.wait()
+                raise
+            p.returncode = os.waitstatus_to_exitcode(status)
+            record.update(get_rusage(usage))
+            record["rc"] = p.returncode
+        return p.returncode
+
+
+def load_spans(path: str) -> List[Dict[str, Any]]:
+    spans = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                spans.append(json.loads(line))
+            except json.JSONDecodeError:
+                # The last line of a killed bisect could be cut short
+                continue
+    return spans
+
+
+def get_leaves(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    parents = set(span["parent"] for span in spans if span.get("parent"))
+    return [span for span in spans if span["id"] not in parents]
+
+
+def get_critical_path(spans: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    The chain of the innermost spans that the bisect waited on, found by walking
+    back from the last span to end to the last span to end before it starts, and
+    so on. The gaps between the spans are the time that no span covers
+    """
+    leaves = sorted(get_leaves(spans), key=lambda s: s["end"])
+    path: List[Dict[str, Any]] = []
+    cutoff = float("inf")
+    for span in reversed(leaves):
+        if span["end"] <= cutoff:
+            path.append(span)
+            cutoff = span["start"]
+    return list(reversed(path))
+
+
+def summarize(spans: List[Dict[str, Any]], top: int = SUMMARY_TOP) -> str:
+    if not spans:
+        return "The timeline is empty"
+
+    start = min(s["start"] for s in spans)
+    end = max(s["end"] for s in spans)
+    lines = [f"Total wall time {end - start:.0f}s, {len(spans)} spans"]
+
+    lines.append("")
+    lines.append(f"{'phase':<16}{'count':>8}{'wall':>10}{'cpu':>10}{'peak rss':>12}")
+    leaves = get_leaves(spans)
+    by_phase: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in leaves:
+        by_phase[span["phase"]].append(span)
+    for phase, phase_spans in sorted(
+        by_phase.items(), key=lambda item: -sum(s["duration"] for s in item[1])
+    ):
+        wall = sum(s["duration"] for s in phase_spans)
+        cpu = sum(s.get("cpu_user", 0) + s.get("cpu_system", 0) for s in phase_spans)
+        rss = max(s.get("max_rss_kb", 0) for s in phase_spans) / 1024
+        lines.append(
+            f"{phase:<16}{len(phase_spans):>8}{wall:>9.0f}s{cpu:>9.0f}s{rss:>9.0f} MB"
+        )
+
+    path = get_critical_path(spans)
+    covered = sum(s["duration"] for s in path)
+    path_by_phase: Dict[str, float] = defaultdict(float)
+    for span in path:
+        path_by_phase[span["phase"]] += span["duration"]
+    lines.append("")
+    lines.append(
+        f"Critical path {covered:.0f}s over {len(path)} spans, {end - start - covered:.0f}s outside of any span:"
+    )
+    for phase, duration in sorted(path_by_phase.items(), key=lambda item: -item[1]):
+        lines.append(f"  {phase:<16}{duration:>9.0f}s {duration / covered * 100:5.1f}%")
+    lines.append("Slowest spans on the critical path:")
+    for span in sorted(path, key=lambda s: -s["duration"])[:top]:
+        lines.append(
+            f"  {span['duration']:>9.0f}s {span['phase']} {span.get('commit') or ''} {span.get('target') or ''}".rstrip()
+        )
+
+    by_commit: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for span in leaves:
+        if span.get("commit"):
+            by_commit[span["commit"]][span["phase"]] += span["duration"]
+    lines.append("")
+    lines.append("Slowest commits:")
+    for commit, phases in sorted(
+        by_commit.items(), key=lambda item: -sum(item[1].values())
+    )[:top]:
+        breakdown = ", ".join(
+            f"{phase} {duration:.0f}s"
+            for phase, duration in sorted(phases.items(), key=lambda item: -item[1])
+        )
+        lines.append(f"  {commit[:12]} {sum(phases.values()):>9.0f}s: {breakdown}")
+    return "\n".join(lines)
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser("The timeline of a bisect")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run a command in a span")
+    run_parser.add_argument("--phase", type=str, required=True, help="the phase")
+    run_parser.add_argument("--commit", type=str, default="", help="the commit")
+    run_parser.add_argument("cmd", nargs="+", help="the command to run")
+
+    summarize_parser = subparsers.add_parser(
+        "summarize", help="print the critical path and the slowest commits"
+    )
+    summarize_parser.add_argument("timeline", type=str, help="the timeline file")
+    summarize_parser.add_argument(
+        "--top",
+        type=int,
+        default=SUMMARY_TOP,
+        help="the number of slowest commits and spans to print",
+    )
+    return parser.parse_args()
+
+
+def main() -> int:
+    args = parse_args()
+    if args.command == "summarize":
+        print(summarize(load_spans(args.timeline), args.top))
+        return 0
+    return Timeline.from_env().call(args.cmd, args.phase, args.commit or None)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
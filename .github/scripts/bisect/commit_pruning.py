@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+"""
+Prune the commits of a bisect range that can't affect the repro by the paths they
+change, so that they are never built. A commit is kept when any of its paths
+matches the include globs and none of the exclude globs. A glob ending with / is
+a directory prefix, e.g.:
+
+python commit_pruning.py --repo-dir $PYTORCH_SRC_DIR --good 34cdf49 --bad 9d49044 \
+    --exclude "docs/,.github/,*.md,torch/_inductor/" --output candidates.json
+"""
+
+import fnmatch
+import json
+import logging
+import math
+import os
+import subprocess
+from argparse import Action, ArgumentParser, Namespace
+from logging import info
+from typing import Any, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+
+
+class ValidateDir(Action):
+    def __call__(
+        self,
+        parser: ArgumentParser,
+        namespace: Namespace,
+        values: Any,
+        option_string: Optional[str] = None,
+    ) -> None:
+        if os.path.isdir(values):
+            setattr(namespace, self.dest, values)
+            return
+
+        parser.error(f"{values} is not a valid directory")
+
+
+def parse_args() -> Namespace:
+    parser = ArgumentParser("Prune the commits that can't affect the repro")
+    parser.add_argument(
+        "--repo-dir",
+        type=str,
+        required=True,
+        action=ValidateDir,
+        help="the PyTorch repo to bisect",
+    )
+    parser.add_argument(
+        "--good",
+        type=str,
+        required=True,
+        help="the last known good commit",
+    )
+    parser.add_argument(
+        "--bad",
+        type=str,
+        required=True,
+        help="the first known bad commit",
+    )
+    parser.add_argument(
+        "--include",
+        type=str,
+        default="",
+        help="the comma-separated list of globs of the paths that can affect the repro, default to all",
+    )
+    parser.add_argument(
+        "--exclude",
+        type=str,
+        default="",
+        help="the comma-separated list of globs of the paths that can't affect the repro",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="write the candidate commits and the pruned commits to this JSON file",
+    )
+    return parser.parse_args()
+
+
+def parse_globs(globs: str) -> List[str]:
+    return [g.strip() for g in globs.split(",") if g.strip()]
+
+
+def matches(path: str, glob: str) -> bool:
+    if glob.endswith("/"):
+        return path.startswith(glob)
+    return fnmatch.fnmatch(path, glob)
+
+
+def is_relevant(paths: List[str], include: List[str], exclude: List[str]) -> bool:
+    # Keep the commits without any path, i.e. merges, to be on the safe side
+    if not paths:
+        return True
+    return any(
+        (not include or any(matches(path, g) for g in include))
+        and not any(matches(path, g) for g in exclude)
+        for path in paths
+    )
+
+
+def get_changed_paths(repo_dir: str, good: str, bad: str) -> Dict[str, List[str]]:
+    """
+    Return the paths changed by every commit after good up to bad, oldest first,
+    with a single git log
+    """
+    output = subprocess.check_output(
+        [
+            "git",
+            "log",
+            "--reverse",
+            "--ancestry-path",
+            "--name-only",
+            "--format=%x00%H",
+            f"{good}..{bad}",
+        ],
+        cwd=repo_dir,
+        text=True,
+    )
+    changed_paths = {}
+    for chunk in output.split("\0")[1:]:
+        lines = [line for line in chunk.splitlines() if line.strip()]
+        changed_paths[lines[0]] = lines[1:]
+    return changed_paths
+
+
+def estimate_builds(commits: int) -> int:
+    """
+    The number of builds to bisect this many commits, not counting the preflight
+    """
+    return math.ceil(math.log2(commits + 1)) if commits > 0 else 0
+
+
+def prune_commits(
+    changed_paths: Dict[str, List[str]], include: List[str], exclude: List[str]
+) -> Dict[str, Any]:
+    commits = list(changed_paths.keys())
+    candidates = []
+    pruned = []
+    for i, (commit, paths) in enumerate(changed_paths.items()):
+        # The bad commit is always kept to anchor the bisect
+        if i == len(commits) - 1 or is_relevant(paths, include, exclude):
+            candidates.append(commit)
+        else:
+            pruned.append({"commit": commit, "paths": paths})
+
+    return {
+        "commits": len(commits),
+        "candidates": candidates,
+        "pruned": pruned,
+        "builds_saved": estimate_builds(len(commits)) - estimate_builds(len(candidates)),
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    results = prune_commits(
+        get_changed_paths(args.repo_dir, args.good, args.bad),
+        parse_globs(args.include),
+        parse_globs(args.exclude),
+    )
+    info(
+        f"Keep {len(results['candidates'])} of {results['commits']} commits, saving about {results['builds_saved']} builds"
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print("\n".join(results["candidates"]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Extract the metrics of the repro from its output. The metrics are configured
+with a JSON list like:
+
+[
+  {"name": "speedup", "extractor": "regex", "pattern": "(?P<value>[0-9.]+)x", "direction": "higher"},
+  {"name": "compile_time", "extractor": "jsonpath", "file": "results.json", "path": "$.compile[0].seconds", "direction": "lower", "threshold": 0.2},
+  {"name": "peak_memory", "extractor": "csv", "file": "metrics.csv", "column": "peak_mem", "where": {"name": "resnet50"}, "direction": "lower"}
+]
+
+- regex: the last match in stdout, the value is the group named after the metric,
+  the group named value, or the first group.
+- jsonpath: a simple path with keys and list indices into a JSON file.
+- csv: a column in a CSV file, or stdout when there is no file, from the last row
+  or the last row matching all the values in where.
+- last_line: the float on the last line of stdout, the default.
+
+The direction tells if higher or lower is better, a regression in the other
+direction is ignored. The default direction both flags any change.
+"""
+
+import csv
+import io
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+DIRECTIONS = set(
+    [
+        "higher",
+        "lower",
+        "both",
+    ]
+)
+# The float on the last line of stdout, optionally ending with x
+DEFAULT_METRIC = {
+    "name": "value",
+    "extractor": "last_line",
+    "direction": "both",
+}
+JSONPATH_TOKEN = re.compile(r"\.([^.\[\]]+)|\[(-?\d+)\]")
+
+
+def parse_value(value: Any) -> float:
+    value = str(value).strip()
+    if value.endswith("x"):
+        value = value[:-1]
+    return float(value)
+
+
+def read_file(spec: Dict[str, Any], cwd: Optional[str]) -> str:
+    if cwd is None:
+        raise ValueError(
+            f"Metric {spec['name']} is read from {spec['file']}, it can only be extracted from a repro run"
+        )
+    with open(os.path.join(cwd, spec["file"])) as f:
+        return f.read()
+
+
+def extract_last_line(
+    spec: Dict[str, Any], stdout_lines: List[str], cwd: Optional[str]
+) -> float:
+    return parse_value(stdout_lines[-1])
+
+
+def extract_regex(
+    spec: Dict[str, Any], stdout_lines: List[str], cwd: Optional[str]
+) -> float:
+    pattern = re.compile(spec["pattern"])
+    for line in reversed(stdout_lines):
+        m = pattern.search(line)
+        if not m:
+            continue
+
+        groups = m.groupdict()
+        if spec["name"] in groups:
+            return parse_value(groups[spec["name"]])
+        if "value" in groups:
+            return parse_value(groups["value"])
+        return parse_value(m.group(1) if m.groups() else m.group(0))
+    raise ValueError(f"Find no match of {spec['pattern']} for metric {spec['name']}")
+
+
+def extract_jsonpath(
+    spec: Dict[str, Any], stdout_lines: List[str], cwd: Optional[str]
+) -> float:
+    value = json.loads(read_file(spec, cwd))
+    path = spec["path"]
+    if not path.startswith("$"):
+        raise ValueError(f"Invalid JSONPath {path} for metric {spec['name']}")
+
+    position = 1
+    for m in JSONPATH_TOKEN.finditer(path, 1):
+        if m.start() != position:
+            raise ValueError(f"Invalid JSONPath {path} for metric {spec['name']}")
+        position = m.end()
+        key, index = m.groups()
+        value = value[key] if key is not None else value[int(index)]
+    if position != len(path):
+        raise ValueError(f"Invalid JSONPath {path} for metric {spec['name']}")
+    return parse_value(value)
+
+
+def extract_csv(
+    spec: Dict[str, Any], stdout_lines: List[str], cwd: Optional[str]
+) -> float:
+    data = read_file(spec, cwd) if spec.get("file") else "\n".join(stdout_lines)
+    delimiter = spec.get("delimiter", ",")
+    lines = data.splitlines()
+    # Skip the logs before the header when the table is printed to stdout
+    start = next(
+        (
+            i
+            for i, line in enumerate(lines)
+            if spec["column"] in [c.strip() for c in line.split(delimiter)]
+        ),
+        None,
+    )
+    if start is None:
+        raise ValueError(f"Find no column {spec['column']} for metric {spec['name']}")
+
+    reader = csv.DictReader(
+        io.StringIO("\n".join(lines[start:])),
+        delimiter=delimiter,
+        skipinitialspace=True,
+    )
+    where = spec.get("where", {})
+    value = None
+    for row in reader:
+        row = {(k or "").strip(): (v or "").strip() for k, v in row.items()}
+        if all(row.get(k) == str(v) for k, v in where.items()) and row.get(
+            spec["column"]
+        ):
+            value = row[spec["column"]]
+    if value is None:
+        raise ValueError(f"Find no row with {where} for metric {spec['name']}")
+    return parse_value(value)
+
+
+EXTRACTORS = {
+    "last_line": extract_last_line,
+    "regex": extract_regex,
+    "jsonpath": extract_jsonpath,
+    "csv": extract_csv,
+}
+
+
+def load_metrics(metrics: Optional[str], threshold: float) -> List[Dict[str, Any]]:
+    """
+    Load the metrics from a JSON file or a JSON string. Each metric gets the
+    default threshold unless it has its own
+    """
+    if not metrics:
+        specs = [dict(DEFAULT_METRIC)]
+    elif os.path.exists(metrics):
+        with open(metrics) as f:
+            specs = json.load(f)
+    else:
+        specs = json.loads(metrics)
+
+    names = set()
+    for spec in specs:
+        assert spec.get("name"), f"Metric {spec} has no name."
+        assert spec["name"] not in names, f"Metric {spec['name']} is duplicated."
+        names.add(spec["name"])
+        spec.setdefault("extractor", "last_line")
+        spec.setdefault("direction", "both")
+        spec.setdefault("threshold", threshold)
+        assert spec["extractor"] in EXTRACTORS, (
+            f"Unknown extractor {spec['extractor']} of metric {spec['name']}."
+        )
+        assert spec["direction"] in DIRECTIONS, (
+            f"Unknown direction {spec['direction']} of metric {spec['name']}."
+        )
+    return specs
+
+
+def extract_metrics(
+    metrics: List[Dict[str, Any]], stdout_lines: List[str], cwd: Optional[str]
+) -> Dict[str, float]:
+    """
+    Extract all the metrics from one run. The files are read relative to cwd, use
+    None to extract from a log alone
+    """
+    return {
+        spec["name"]: EXTRACTORS[spec["extractor"]](spec, stdout_lines, cwd)
+        for spec in metrics
+    }
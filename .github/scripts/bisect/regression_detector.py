@@ -8,6 +8,55 @@ Envs to control the behavior:
 - REPRO_CMDLINE: The repro command line to run.
 - BASELINE_LOG: The baseline log file to compare with.
 - REGRESSION_THRESHOLD: The regression threshold, default to 10%.
+- REPRO_SAMPLES: Run the repro up to this many times and compare the samples with
+  a statistical test, default to 1, i.e. compare one value with the threshold.
+- REPRO_MIN_SAMPLES: Stop sampling as soon as the verdict is statistically clear
+  after at least this many samples, default to 3.
+- STAT_TEST: The statistical test, bootstrap (default) or mannwhitney.
+- CONFIDENCE: The confidence level of the statistical test, default to 0.95.
+- BASELINE_SAMPLES: The JSON file with the baseline samples written by
+  --record-baseline, used instead of BASELINE_LOG when it's set.
+- RESULT_CACHE_DIR: Cache the results by PyTorch commit, repro command line, and
+  environment in this directory, so that the commits that have already been
+  measured are not run again. They are measured again when REPRO_SAMPLES is
+  raised above the number of samples of the cached result.
+- RESULT_CACHE_INVALIDATE: Ignore and overwrite the cached result of the current
+  commit, the same as --invalidate-cache.
+- METRICS: The metrics to extract from each run with their direction and
+  threshold, a JSON file or string, see metric_extractors.py. Default to the
+  float on the last line of stdout. The commit is bad if any metric regresses.
+- REPRO_CPUS: Pin the repro to these cores, e.g. 8-15, or to the cores isolated
+  from the scheduler with isolated.
+- REPRO_NUMA_NODE: Bind the repro to this NUMA node, with numactl if it's
+  installed, default to all the cores of the node when REPRO_CPUS is not set.
+- REPRO_MAX_LOAD: Don't measure when the 1-minute load average is above this.
+- REPRO_MAX_CPU_BUSY: Don't measure when any of the repro cores is busier than
+  this fraction, e.g. 0.1.
+- REPRO_NOISE_RETRIES: Check the host this many more times, REPRO_NOISE_WAIT
+  seconds apart, before giving up on a noisy host, default to 3. The commit is
+  skipped with exit code 125 when the host stays noisy, and measured again when
+  the repro cores are busier than REPRO_MAX_CPU_BUSY right after the run. The load
+  average is only checked before the run, it includes the repro after it.
+- REPRO_WATCHDOG: Run the repro under a watchdog, see repro_watchdog.py. It's
+  also on when REPRO_TIMEOUT, REPRO_STALL_TIMEOUT, or REPRO_ERROR_PATTERN is set.
+- REPRO_TIMEOUT: Stop the repro after this many seconds, exit code 124. Default to
+  REPRO_TIMEOUT_FACTOR, i.e. 3, times the duration of the baseline run when it's
+  known, from BASELINE_DURATION or the baseline samples.
+- REPRO_STALL_TIMEOUT: Stop the repro when it has written nothing to stdout for
+  this many seconds, exit code 123.
+- REPRO_ERROR_PATTERN: Stop the repro as soon as a line of stdout matches this
+  regex, exit code 122, i.e. skip the commit. Off by default, set it to known to
+  skip on the errors that are usually unrelated to the commit like CUDA out of
+  memory. Don't set it when bisecting a memory regression or a crash, and it's
+  ignored with FUNCTIONAL=1 where a failure is the regression.
+- WATCHDOG_EXIT_CODE: Exit with this code instead when the watchdog stops the
+  repro, e.g. 125 for git bisect run, which only skips on 125. bisect_driver.py
+  skips on all of them.
+- BISECT_TIMELINE: Write a span per run of the repro to this JSON lines file, see
+  bisect_timeline.py.
+
+The governor, turbo, and load average of the host before and after the run are
+written to the result cache and the baseline samples with the verdict.
 
 Example usage:
 
@@ -16,83 +65,603 @@ BASELINE_LOG="$PWD/bisect_logs/baseline.log" REGRESSION_THRESHOLD="0.1" \
 tritonparseoss bisect --triton-dir $HOME/local/pytorch --test-script $PWD/.ci/bisect/regression_detector.py \
 --good 34cdf49 --bad 9d49044
 
+To evaluate several repros against the same build, each with its own baseline,
+see bisect_targets.py and bisect_driver.py:
+
+python regression_detector.py --targets targets.json --output verdicts.json
+
+To record several baseline samples on the good commit, only for a performance
+repro:
+
+REPRO_CMDLINE="..." REPRO_SAMPLES=10 python regression_detector.py --record-baseline baseline.json
+
 """
 
+import argparse
+import json
 import os
 import subprocess
-from pathlib import Path
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from bisect_targets import (
+    SKIP_EXIT_CODE,
+    SKIP_EXIT_CODES,
+    evaluate_targets,
+    load_targets,
+)
+from bisect_timeline import Timeline
+from metric_extractors import (
+    DEFAULT_METRIC,
+    extract_metrics,
+    load_metrics,
+    parse_value,
+)
+from regression_stats import compare_samples
+from repro_isolation import Isolation
+from repro_watchdog import (
+    DEFAULT_ACCURACY_PATTERN,
+    KNOWN_ERROR_PATTERN,
+    Watchdog,
+    run_watched,
+)
+from result_cache import ResultCache, get_torch_sha
 
 # the default regression threshold is 10%
 REGRESSION_THRESHOLD = float(os.environ.get("REGRESSION_THRESHOLD", 10.0)) / 100.0
 # functional or performance regression
-FUNCTIONAL = bool(int(os.environ["FUNCTIONAL"]))
+FUNCTIONAL = bool(int(os.environ.get("FUNCTIONAL", 0)))
 # repro command line
 REPRO_CMDLINE = os.environ.get("REPRO_CMDLINE", None)
 # baseline log file
 BASELINE_LOG = os.environ.get("BASELINE_LOG", None)
 # pytorch root dir
-TORCH_SRC_DIR = os.environ["PYTORCH_SRC_DIR"]
+TORCH_SRC_DIR = os.environ.get("PYTORCH_SRC_DIR", None)
+# the maximum and minimum number of samples of the repro
+REPRO_SAMPLES = int(os.environ.get("REPRO_SAMPLES", 1))
+REPRO_MIN_SAMPLES = int(os.environ.get("REPRO_MIN_SAMPLES", 3))
+# bootstrap or mannwhitney
+STAT_TEST = os.environ.get("STAT_TEST", "bootstrap")
+CONFIDENCE = float(os.environ.get("CONFIDENCE", 0.95))
+# baseline samples file
+BASELINE_SAMPLES = os.environ.get("BASELINE_SAMPLES", None)
+# result cache dir, the cache is disabled when it's not set
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", None)
+# ignore and overwrite the cached result of the current commit
+RESULT_CACHE_INVALIDATE = bool(int(os.environ.get("RESULT_CACHE_INVALIDATE", 0)))
+# metrics to extract, a JSON file or string, default to the last line of stdout
+METRICS = os.environ.get("METRICS", None)
+# the cores and NUMA node to pin the repro to, and when the host is too noisy
+REPRO_CPUS = os.environ.get("REPRO_CPUS", None)
+REPRO_NUMA_NODE = os.environ.get("REPRO_NUMA_NODE", None)
+REPRO_MAX_LOAD = os.environ.get("REPRO_MAX_LOAD", None)
+REPRO_MAX_CPU_BUSY = os.environ.get("REPRO_MAX_CPU_BUSY", None)
+REPRO_NOISE_RETRIES = int(os.environ.get("REPRO_NOISE_RETRIES", 3))
+REPRO_NOISE_WAIT = float(os.environ.get("REPRO_NOISE_WAIT", 30))
+# the watchdog of the repro, and the duration of the baseline run in seconds
+REPRO_TIMEOUT = os.environ.get("REPRO_TIMEOUT", None)
+REPRO_TIMEOUT_FACTOR = float(os.environ.get("REPRO_TIMEOUT_FACTOR", 3))
+REPRO_STALL_TIMEOUT = os.environ.get("REPRO_STALL_TIMEOUT", None)
+# a regex, or known for KNOWN_ERROR_PATTERN
+REPRO_ERROR_PATTERN = os.environ.get("REPRO_ERROR_PATTERN", None)
+REPRO_WATCHDOG = bool(
+    int(os.environ.get("REPRO_WATCHDOG", 0))
+    or REPRO_TIMEOUT
+    or REPRO_STALL_TIMEOUT
+    or REPRO_ERROR_PATTERN
+)
+BASELINE_DURATION = os.environ.get("BASELINE_DURATION", None)
+WATCHDOG_EXIT_CODE = os.environ.get("WATCHDOG_EXIT_CODE", None)
+# the repro spans are written to BISECT_TIMELINE when it's set
+TIMELINE = Timeline.from_env()
+
+T = TypeVar("T")
 
 
 def get_baseline(baseline_log) -> float:
     with open(baseline_log, "r") as f:
         last_line = f.readlines()[-1].strip()
-    if last_line.endswith("x"):
-        last_line = last_line[:-1]
-    return float(last_line)
+    return parse_value(last_line)
 
 
 def get_current_value(stdout_lines) -> float:
-    last_line = stdout_lines[-1].strip()
-    if last_line.endswith("x"):
-        last_line = last_line[:-1]
-    return float(last_line)
+    return parse_value(stdout_lines[-1])
 
 
-if __name__ == "__main__":
+def get_baseline_samples(
+    baseline_samples, metrics: List[Dict[str, Any]]
+) -> Dict[str, List[float]]:
+    with open(baseline_samples, "r") as f:
+        samples = json.load(f)["samples"]
+    # A plain list has the samples of the first metric
+    if isinstance(samples, list):
+        samples = {metrics[0]["name"]: samples}
+    return {name: [float(v) for v in values] for name, values in samples.items()}
+
+
+def get_baseline_duration() -> Optional[float]:
+    if BASELINE_DURATION:
+        return float(BASELINE_DURATION)
+    if BASELINE_SAMPLES and os.path.exists(BASELINE_SAMPLES):
+        with open(BASELINE_SAMPLES, "r") as f:
+            return json.load(f).get("duration")
+    return None
+
+
+def get_error_pattern() -> Optional[str]:
+    # A functional bisect looks for the commit that makes the repro fail, whatever
+    # the error is
+    if FUNCTIONAL or not REPRO_ERROR_PATTERN:
+        return None
+    if REPRO_ERROR_PATTERN == "known":
+        return KNOWN_ERROR_PATTERN
+    return REPRO_ERROR_PATTERN
+
+
+def get_watchdog() -> Optional[Watchdog]:
+    if not REPRO_WATCHDOG:
+        return None
+
+    timeout = None
+    if REPRO_TIMEOUT:
+        timeout = float(REPRO_TIMEOUT)
+    else:
+        baseline_duration = get_baseline_duration()
+        if baseline_duration:
+            timeout = baseline_duration * REPRO_TIMEOUT_FACTOR
+    return Watchdog(
+        timeout,
+        float(REPRO_STALL_TIMEOUT) if REPRO_STALL_TIMEOUT else None,
+        get_error_pattern(),
+        # stop as soon as the accuracy check fails
+        DEFAULT_ACCURACY_PATTERN if "accuracy" in (REPRO_CMDLINE or "") else None,
+    )
+
+
+def run_repro(
+    cmdline: List[str],
+    cwd: Optional[str],
+    isolation: Optional[Isolation] = None,
+    watchdog: Optional[Watchdog] = None,
+) -> Tuple[int, List[str]]:
+    preexec_fn = None
+    if isolation:
+        cmdline, preexec_fn = isolation.wrap(cmdline)
+    commit = get_torch_sha(TORCH_SRC_DIR) if TIMELINE.path else None
+    with TIMELINE.span("repro", commit) as span:
+        if watchdog:
+            rc, stdout_lines = run_watched(cmdline, cwd, watchdog, preexec_fn)
+            if WATCHDOG_EXIT_CODE and rc in SKIP_EXIT_CODES:
+                rc = int(WATCHDOG_EXIT_CODE)
+        else:
+            p = subprocess.Popen(
+                cmdline,
+                cwd=cwd,
+                stdout=subprocess.PIPE,
+                stderr=None,
+                preexec_fn=preexec_fn,
+            )
+            assert p.stdout is not None
+            stdout_lines = []
+            for line in p.stdout:
+                decoded_line = line.decode("utf-8").strip()
+                print(decoded_line)
+                stdout_lines.append(decoded_line)
+            rc = p.wait()
+        span["rc"] = rc
+    return rc, stdout_lines
+
+
+def compare_all(
+    metrics: List[Dict[str, Any]],
+    baseline: Dict[str, List[float]],
+    samples: Dict[str, List[float]],
+    test: str = STAT_TEST,
+    confidence: float = CONFIDENCE,
+) -> Dict[str, Dict[str, Any]]:
+    return {
+        spec["name"]: compare_samples(
+            baseline[spec["name"]],
+            samples[spec["name"]],
+            spec["threshold"],
+            test,
+            confidence,
+            spec["direction"],
+        )
+        for spec in metrics
+    }
+
+
+def collect_samples(
+    cmdline: List[str],
+    cwd: Optional[str],
+    max_samples: int,
+    metrics: Optional[List[Dict[str, Any]]] = None,
+    min_samples: int = REPRO_MIN_SAMPLES,
+    baseline: Optional[Dict[str, List[float]]] = None,
+    test: str = STAT_TEST,
+    confidence: float = CONFIDENCE,
+    isolation: Optional[Isolation] = None,
+    watchdog: Optional[Watchdog] = None,
+) -> Tuple[int, Dict[str, List[float]], Optional[Dict[str, Dict[str, Any]]]]:
+    """
+    Run the repro up to max_samples times and extract all the metrics from each
+    run. When the baseline is given, the samples are compared with it after every
+    run from min_samples on, and the sampling stops as soon as one metric clearly
+    regresses or none of them clearly does. Return the return code of the first
+    failed run, the samples by metric, and the last verdicts by metric
+    """
+    if metrics is None:
+        metrics = load_metrics(None, REGRESSION_THRESHOLD)
+
+    samples: Dict[str, List[float]] = {spec["name"]: [] for spec in metrics}
+    verdicts = None
+    for i in range(max_samples):
+        print(f"Run the repro, sample {i + 1} / {max_samples}")
+        rc, stdout_lines = run_repro(cmdline, cwd, isolation, watchdog)
+        if rc != 0:
+            return rc, samples, verdicts
+        for name, value in extract_metrics(metrics, stdout_lines, cwd).items():
+            samples[name].append(value)
+
+        if baseline and i + 1 >= min(min_samples, max_samples):
+            verdicts = compare_all(metrics, baseline, samples, test, confidence)
+            if any(v["regression"] and v["decided"] for v in verdicts.values()) or all(
+                v["decided"] for v in verdicts.values()
+            ):
+                break
+    return 0, samples, verdicts
+
+
+def report(verdicts: Dict[str, Dict[str, Any]]) -> int:
+    rc = 0
+    for name, verdict in verdicts.items():
+        details = (
+            f"{verdict['test']} test on {verdict['samples']} samples vs {verdict['baseline_samples']} "
+            f"baseline samples, median change {verdict['change'] * 100:.2f}%, "
+            f"{verdict['direction']} is better, threshold {verdict['threshold'] * 100}%, "
+            f"confidence {verdict['confidence'] * 100:.1f}%"
+        )
+        if "interval" in verdict:
+            low, high = verdict["interval"]
+            details += f", interval [{low * 100:.2f}%, {high * 100:.2f}%]"
+        if not verdict["decided"]:
+            details += ", not statistically conclusive"
+
+        if verdict["regression"]:
+            print(f"Regression detected in {name}: {details}")
+            rc = 1
+        else:
+            print(f"No regression detected in {name}: {details}")
+    return rc
+
+
+def get_isolation() -> Optional[Isolation]:
+    if not any([REPRO_CPUS, REPRO_NUMA_NODE, REPRO_MAX_LOAD, REPRO_MAX_CPU_BUSY]):
+        return None
+    return Isolation(
+        REPRO_CPUS,
+        int(REPRO_NUMA_NODE) if REPRO_NUMA_NODE else None,
+        float(REPRO_MAX_LOAD) if REPRO_MAX_LOAD else None,
+        float(REPRO_MAX_CPU_BUSY) if REPRO_MAX_CPU_BUSY else None,
+        REPRO_NOISE_RETRIES,
+        REPRO_NOISE_WAIT,
+    )
+
+
+def measure_quietly(
+    isolation: Optional[Isolation], measure: Callable[[], T]
+) -> Tuple[Optional[T], Optional[Dict[str, Any]]]:
+    """
+    Wait for the host to be quiet, take the measurement, and check the host again
+    after it. The measurement is taken again when other processes keep the cores
+    of the repro busy after it.
+    Return the result of the measurement, or None when the host stays too noisy,
+    and the state of the host before and after the measurement
+    """
+    if isolation is None:
+        return measure(), None
+
+    for attempt in range(isolation.retries + 1):
+        quiet, before = isolation.wait_until_quiet()
+        if not quiet:
+            return None, {"before": before}
+
+        result = measure()
+        reasons, after = isolation.check(after_run=True)
+        host: Dict[str, Any] = {"before": before, "after": after}
+        if not reasons:
+            return result, host
+        if attempt == isolation.retries:
+            host["noisy"] = reasons
+            return result, host
+        print(f"The host got noisy during the run: {', '.join(reasons)}, run again")
+    return None, None
+
+
+def compare_single(
+    baseline_signal: float,
+    current_value: float,
+    threshold: float = REGRESSION_THRESHOLD,
+    direction: str = "both",
+    name: str = DEFAULT_METRIC["name"],
+) -> int:
+    smaller_value = min(baseline_signal, current_value)
+    larger_value = max(baseline_signal, current_value)
+    assert smaller_value > 0, "smaller_value should be positive, got zero."
+    ratio = (larger_value - smaller_value) / smaller_value * 100
+    # a change in the better direction is not a regression
+    worse = (
+        direction == "both"
+        or (direction == "higher" and current_value < baseline_signal)
+        or (direction == "lower" and current_value > baseline_signal)
+    )
+    metric = "" if name == DEFAULT_METRIC["name"] else f" in {name}"
+    if worse and larger_value > smaller_value * (1 + threshold):
+        print(
+            f"Regression detected{metric}: current value {current_value}, {larger_value} / {smaller_value} - 1 == {ratio}% , threshold {threshold * 100}%)"
+        )
+        return 1
+    else:
+        print(
+            f"No regression detected{metric}: current value {current_value}, {larger_value} / {smaller_value} - 1 == {ratio}%, threshold {threshold * 100}%)"
+        )
+        return 0
+
+
+def load_baseline_samples(metrics: List[Dict[str, Any]]) -> Dict[str, List[float]]:
+    if BASELINE_SAMPLES:
+        return get_baseline_samples(BASELINE_SAMPLES, metrics)
+    assert BASELINE_LOG and os.path.exists(BASELINE_LOG), (
+        f"BASELINE_LOG is not set or to a non-exist location: {BASELINE_LOG}."
+    )
+    with open(BASELINE_LOG, "r") as f:
+        baseline_lines = f.read().splitlines()
+    # the files written by the baseline run are gone, only its log is left
+    return {
+        name: [value]
+        for name, value in extract_metrics(metrics, baseline_lines, None).items()
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="PyTorch regression detector")
+    parser.add_argument(
+        "--record-baseline",
+        type=str,
+        help="run the repro REPRO_SAMPLES times and write the samples to this JSON file",
+    )
+    parser.add_argument(
+        "--invalidate-cache",
+        action="store_true",
+        default=RESULT_CACHE_INVALIDATE,
+        help="ignore and overwrite the cached result of the current commit",
+    )
+    parser.add_argument(
+        "--targets",
+        type=str,
+        help="evaluate all the targets in this JSON file on the current build, see bisect_targets.py",
+    )
+    parser.add_argument(
+        "--only",
+        type=str,
+        default="",
+        help="the comma-separated list of targets to evaluate, default to all",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="write the exit code of each target to this JSON file",
+    )
+    return parser.parse_args()
+
+
+def run_targets(args: argparse.Namespace) -> int:
+    """
+    Evaluate several repros against the same build. With --record-baseline, the
+    baseline samples of each target are written to that directory
+    """
+    targets = load_targets(args.targets)
+    names = [n.strip() for n in args.only.split(",") if n.strip()] or None
+    if args.record_baseline:
+        os.makedirs(args.record_baseline, exist_ok=True)
+
+    results = evaluate_targets(
+        os.path.abspath(__file__),
+        targets,
+        dict(os.environ),
+        names,
+        args.record_baseline,
+        ["--invalidate-cache"] if args.invalidate_cache else [],
+    )
+    for name, rc in results.items():
+        print(f"Target {name}: exit code {rc}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f)
+    return 0 if all(rc == 0 for rc in results.values()) else 1
+
+
+def main() -> int:
+    args = parse_args()
+    if args.targets:
+        return run_targets(args)
+
     assert REPRO_CMDLINE is not None, "REPRO_CMDLINE is not set."
+    if args.record_baseline and FUNCTIONAL:
+        print("A functional repro has no baseline to record, unset FUNCTIONAL.")
+        return 2
     cmdline = REPRO_CMDLINE.split()
+    metrics = load_metrics(METRICS, REGRESSION_THRESHOLD)
+
+    isolation = get_isolation()
+    watchdog = get_watchdog()
+    cache = None
+    sha = get_torch_sha(TORCH_SRC_DIR) if RESULT_CACHE_DIR else None
+    entry = None
+    if sha:
+        cache = ResultCache(RESULT_CACHE_DIR, args.invalidate_cache)
+        entry = cache.get(
+            sha, REPRO_CMDLINE, dict(os.environ), metrics, REPRO_SAMPLES
+        )
+        if entry:
+            print(
+                f"Reuse the cached result of {sha} from {cache.get_path(sha, REPRO_CMDLINE, dict(os.environ), metrics)}: "
+                f"return code {entry['rc']}, samples {entry['samples']}"
+            )
+
+    def save(
+        rc: int,
+        samples: Dict[str, List[float]],
+        verdicts: Optional[Dict[str, Any]] = None,
+        host: Optional[Dict[str, Any]] = None,
+        duration: Optional[float] = None,
+    ) -> None:
+        # The repro could be stopped by the watchdog for a transient reason, e.g. an
+        # OOM, so try it again next time
+        if cache and sha and rc not in SKIP_EXIT_CODES:
+            cache.put(
+                sha,
+                REPRO_CMDLINE,
+                dict(os.environ),
+                rc,
+                samples,
+                verdicts,
+                metrics,
+                host,
+                duration,
+                REPRO_SAMPLES,
+            )
+
+    if args.record_baseline:
+        if (
+            entry
+            and entry["rc"] == 0
+            and min(len(v) for v in entry["samples"].values()) >= REPRO_SAMPLES
+        ):
+            rc, samples, host = 0, entry["samples"], entry.get("host")
+            duration = entry.get("duration")
+        else:
+            start = time.time()
+            result, host = measure_quietly(
+                isolation,
+                lambda: collect_samples(
+                    cmdline,
+                    TORCH_SRC_DIR,
+                    REPRO_SAMPLES,
+                    metrics,
+                    isolation=isolation,
+                    watchdog=watchdog,
+                ),
+            )
+            if result is None:
+                print("The host is too noisy to record the baseline")
+                return SKIP_EXIT_CODE
+            rc, samples, _ = result
+            duration = (time.time() - start) / max(
+                1, min(len(v) for v in samples.values())
+            )
+            save(rc, samples, host=host, duration=duration)
+        if rc != 0:
+            return rc
+        with open(args.record_baseline, "w") as f:
+            json.dump(
+                {
+                    "cmdline": REPRO_CMDLINE,
+                    "samples": samples,
+                    "host": host,
+                    # the duration of a run, for the timeout of the watchdog
+                    "duration": duration,
+                },
+                f,
+            )
+        print(f"Write {REPRO_SAMPLES} baseline samples to {args.record_baseline}")
+        return 0
 
     # functional regression
     if FUNCTIONAL:
+        if entry:
+            return entry["rc"]
+        if watchdog:
+            rc, _ = run_repro(cmdline, TORCH_SRC_DIR, watchdog=watchdog)
+            save(rc, {})
+            return rc
         try:
             subprocess.check_call(cmdline, cwd=TORCH_SRC_DIR)
         except subprocess.CalledProcessError as e:
             print(f"cmd line {cmdline} failed: {e}")
-            exit(e.returncode)
-        exit(0)
+            save(e.returncode, {})
+            return e.returncode
+        save(0, {})
+        return 0
+
+    baseline_samples = load_baseline_samples(metrics)
+    if entry:
+        rc, samples, host = entry["rc"], entry["samples"], entry.get("host")
+        verdicts = None
+        if rc == 0 and REPRO_SAMPLES > 1:
+            # The baseline or the thresholds could have changed since the result was
+            # cached, so compare the cached samples again
+            verdicts = compare_all(metrics, baseline_samples, samples)
+    else:
+
+        def measure() -> Tuple[int, Dict[str, List[float]], Optional[Dict[str, Any]]]:
+            if REPRO_SAMPLES > 1:
+                return collect_samples(
+                    cmdline,
+                    TORCH_SRC_DIR,
+                    REPRO_SAMPLES,
+                    metrics,
+                    baseline=baseline_samples,
+                    isolation=isolation,
+                    watchdog=watchdog,
+                )
+            rc, stdout_lines = run_repro(cmdline, TORCH_SRC_DIR, isolation, watchdog)
+            if rc != 0:
+                return rc, {}, None
+            return (
+                rc,
+                {
+                    name: [value]
+                    for name, value in extract_metrics(
+                        metrics, stdout_lines, TORCH_SRC_DIR
+                    ).items()
+                },
+                None,
+            )
+
+        result, host = measure_quietly(isolation, measure)
+        if result is None:
+            # Don't cache it, the commit can be measured again on a quiet host
+            print(f"The host is too noisy to measure, exit with {SKIP_EXIT_CODE}.")
+            return SKIP_EXIT_CODE
+        rc, samples, verdicts = result
+        save(rc, samples, verdicts, host)
+
+    if host:
+        print(f"Host state: {json.dumps(host)}")
 
-    assert BASELINE_LOG and os.path.exists(BASELINE_LOG), (
-        f"BASELINE_LOG is not set or to a non-exist location: {BASELINE_LOG}."
-    )
-    baseline_signal = get_baseline(BASELINE_LOG)
-    p = subprocess.Popen(cmdline, cwd=TORCH_SRC_DIR, stdout=subprocess.PIPE, stderr=None)
-    assert p.stdout is not None
-    stdout_lines = []
-    for line in p.stdout:
-        decoded_line = line.decode("utf-8").strip()
-        print(decoded_line)
-        stdout_lines.append(decoded_line)
-    rc = p.wait()
     # if subprocess failed, exit with the return code
     if not rc == 0:
-        exit(rc)
+        return rc
     # otherwise, check for the perf regression or accuracy regression
-    current_value = get_current_value(stdout_lines)
-    if current_value == 0 and "accuracy" in REPRO_CMDLINE:
+    if "accuracy" in REPRO_CMDLINE and any(max(v) == 0 for v in samples.values()):
         print("Accuracy test failed, exit with 1.")
-        exit(1)
-    smaller_value = min(baseline_signal, current_value)
-    larger_value = max(baseline_signal, current_value)
-    assert smaller_value > 0, "smaller_value should be positive, got zero."
-    ratio = (larger_value - smaller_value) / smaller_value * 100
-    if larger_value > smaller_value * (1 + REGRESSION_THRESHOLD):
-        print(
-            f"Regression detected: current value {current_value}, {larger_value} / {smaller_value} - 1 == {ratio}% , threshold {REGRESSION_THRESHOLD * 100}%)"
-        )
-        exit(1)
-    else:
-        print(
-            f"No regression detected: current value {current_value}, {larger_value} / {smaller_value} - 1 == {ratio}%, threshold {REGRESSION_THRESHOLD * 100}%)"
+        return 1
+    if verdicts:
+        return report(verdicts)
+
+    rc = 0
+    for spec in metrics:
+        rc |= compare_single(
+            baseline_samples[spec["name"]][-1],
+            samples[spec["name"]][-1],
+            spec["threshold"],
+            spec["direction"],
+            spec["name"],
         )
-        exit(0)
+    return rc
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,172 @@
+"""
+Statistical tests used by the regression detector to compare several samples of
+the repro against several samples of the baseline, so that a single noisy run
+doesn't send the bisect the wrong way.
+"""
+
+import math
+import random
+import statistics
+from typing import Any, Dict, List
+
+BOOTSTRAP_RESAMPLES = 2000
+# Use a fixed seed so that the same samples always give the same verdict
+BOOTSTRAP_SEED = 0
+STAT_TESTS = set(
+    [
+        "bootstrap",
+        "mannwhitney",
+    ]
+)
+
+
+def is_worse(change: float, threshold: float, direction: str = "both") -> bool:
+    """
+    Check if a relative change is a regression given whether higher or lower is
+    better, or any change when the direction is both
+    """
+    if direction == "higher":
+        return change < -threshold
+    if direction == "lower":
+        return change > threshold
+    return abs(change) > threshold
+
+
+def relative_change(baseline: List[float], current: List[float]) -> float:
+    baseline_median = statistics.median(baseline)
+    assert baseline_median > 0, "The baseline median should be positive."
+    return statistics.median(current) / baseline_median - 1
+
+
+def bootstrap_test(
+    baseline: List[float],
+    current: List[float],
+    threshold: float,
+    confidence: float = 0.95,
+    direction: str = "both",
+    resamples: int = BOOTSTRAP_RESAMPLES,
+) -> Dict[str, Any]:
+    """
+    Compute the confidence interval of the relative change of the median with
+    the bootstrap. The commit is bad when the whole interval is beyond the
+    threshold in the wrong direction, and good when none of it is
+    """
+    rng = random.Random(BOOTSTRAP_SEED)
+    changes = []
+    for _ in range(resamples):
+        b = statistics.median(rng.choices(baseline, k=len(baseline)))
+        c = statistics.median(rng.choices(current, k=len(current)))
+        changes.append(c / b - 1)
+    changes.sort()
+
+    alpha = 1 - confidence
+    low = changes[int(alpha / 2 * (resamples - 1))]
+    high = changes[int((1 - alpha / 2) * (resamples - 1))]
+
+    # With both directions, an interval from below -threshold to above threshold
+    # is not a clear regression
+    if is_worse(low, threshold, direction) and is_worse(high, threshold, direction) and (
+        direction != "both" or low * high > 0
+    ):
+        regression, decided = True, True
+    elif not is_worse(low, threshold, direction) and not is_worse(
+        high, threshold, direction
+    ):
+        regression, decided = False, True
+    else:
+        regression = is_worse(relative_change(baseline, current), threshold, direction)
+        decided = False
+
+    # The fraction of the bootstrap replicates that agree with the verdict
+    beyond = sum(1 for c in changes if is_worse(c, threshold, direction)) / resamples
+    return {
+        "test": "bootstrap",
+        "regression": regression,
+        "decided": decided,
+        "change": relative_change(baseline, current),
+        "interval": [low, high],
+        "confidence": beyond if regression else 1 - beyond,
+    }
+
+
+def mann_whitney_u(baseline: List[float], current: List[float]) -> float:
+    """
+    Return the two-sided p-value of the Mann-Whitney U test using the normal
+    approximation with the tie correction
+    """
+    n1, n2 = len(baseline), len(current)
+    values = sorted(
+        [(v, 0) for v in baseline] + [(v, 1) for v in current], key=lambda x: x[0]
+    )
+
+    # Average the ranks of the ties
+    ranks = [0.0] * len(values)
+    ties = 0.0
+    i = 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        ties += t**3 - t
+        i = j + 1
+
+    rank_sum = sum(rank for rank, (_, group) in zip(ranks, values) if group == 0)
+    u = rank_sum - n1 * (n1 + 1) / 2
+
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+
+    # With the continuity correction
+    z = (abs(u - n1 * n2 / 2) - 0.5) / math.sqrt(variance)
+    return min(1.0, math.erfc(max(z, 0) / math.sqrt(2)))
+
+
+def mann_whitney_test(
+    baseline: List[float],
+    current: List[float],
+    threshold: float,
+    confidence: float = 0.95,
+    direction: str = "both",
+) -> Dict[str, Any]:
+    """
+    The commit is bad when the samples are significantly different and the median
+    moves by more than the threshold in the wrong direction. A significance test
+    can't prove that there is no regression, so only a regression can stop the
+    sampling early
+    """
+    p_value = mann_whitney_u(baseline, current)
+    change = relative_change(baseline, current)
+    regression = p_value < 1 - confidence and is_worse(change, threshold, direction)
+    return {
+        "test": "mannwhitney",
+        "regression": regression,
+        "decided": regression,
+        "change": change,
+        "p_value": p_value,
+        "confidence": 1 - p_value if regression else p_value,
+    }
+
+
+def compare_samples(
+    baseline: List[float],
+    current: List[float],
+    threshold: float,
+    test: str = "bootstrap",
+    confidence: float = 0.95,
+    direction: str = "both",
+) -> Dict[str, Any]:
+    assert test in STAT_TESTS, f"Unknown statistical test {test}."
+    if test == "mannwhitney":
+        verdict = mann_whitney_test(baseline, current, threshold, confidence, direction)
+    else:
+        verdict = bootstrap_test(baseline, current, threshold, confidence, direction)
+    verdict["direction"] = direction
+    verdict["threshold"] = threshold
+    verdict["baseline_samples"] = len(baseline)
+    verdict["samples"] = len(current)
+    return verdict
@@ -0,0 +1,216 @@
+"""
+Run the repro on an isolated set of cores and refuse to measure when the host is
+too noisy. The state of the host, i.e. the CPU frequency governor, turbo, load
+average, and how busy the cores are, is recorded before and after the run so that
+it can be attached to the verdict.
+"""
+
+import os
+import shutil
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# How long to watch the cores to tell how busy they are
+CPU_BUSY_INTERVAL = 0.5
+
+
+def parse_cpulist(cpulist: str) -> List[int]:
+    """
+    Parse the kernel CPU list format, e.g. 0-3,8,10-11
+    """
+    cpus: List[int] = []
+    for part in cpulist.strip().split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return sorted(set(cpus))
+
+
+def format_cpulist(cpus: List[int]) -> str:
+    return ",".join(str(cpu) for cpu in cpus)
+
+
+def read_file(root: str, path: str) -> Optional[str]:
+    try:
+        with open(os.path.join(root, path.lstrip("/"))) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def get_cpu_times(root: str = "/") -> Dict[int, Tuple[int, int]]:
+    """
+    Return the busy and total time of every core from /proc/stat
+    """
+    stat = read_file(root, "/proc/stat") or ""
+    times = {}
+    for line in stat.splitlines():
+        fields = line.split()
+        if not fields or not fields[0].startswith("cpu") or fields[0] == "cpu":
+            continue
+        values = [int(v) for v in fields[1:]]
+        # idle and iowait
+        idle = values[3] + (values[4] if len(values) > 4 else 0)
+        times[int(fields[0][3:])] = (sum(values) - idle, sum(values))
+    return times
+
+
+def measure_cpu_busy(
+    cpus: List[int], root: str = "/", interval: float = CPU_BUSY_INTERVAL
+) -> float:
+    """
+    Return how busy the busiest of the cores is over the interval, from 0 to 1
+    """
+    before = get_cpu_times(root)
+    time.sleep(interval)
+    after = get_cpu_times(root)
+
+    busy = 0.0
+    for cpu in cpus:
+        if cpu not in before or cpu not in after:
+            continue
+        total = after[cpu][1] - before[cpu][1]
+        if total > 0:
+            busy = max(busy, (after[cpu][0] - before[cpu][0]) / total)
+    return busy
+
+
+def get_host_state(
+    cpus: List[int], root: str = "/", interval: float = CPU_BUSY_INTERVAL
+) -> Dict[str, Any]:
+    loadavg = (read_file(root, "/proc/loadavg") or "").split()
+    governors = Counter(
+        read_file(root, f"/sys/devices/system/cpu/cpu{cpu}/cpufreq/scaling_governor")
+        or "unknown"
+        for cpu in cpus
+    )
+
+    # intel_pstate has no_turbo, the other drivers have boost
+    turbo = None
+    no_turbo = read_file(root, "/sys/devices/system/cpu/intel_pstate/no_turbo")
+    boost = read_file(root, "/sys/devices/system/cpu/cpufreq/boost")
+    if no_turbo is not None:
+        turbo = no_turbo == "0"
+    elif boost is not None:
+        turbo = boost == "1"
+
+    return {
+        "timestamp": int(time.time()),
+        "cpus": format_cpulist(cpus),
+        "loadavg": [float(v) for v in loadavg[:3]],
+        "governors": dict(governors),
+        "turbo": turbo,
+        "cpu_busy": measure_cpu_busy(cpus, root, interval),
+    }
+
+
+class Isolation:
+    """
+    Pin the repro to the given cores, or the cores isolated from the scheduler with
+    cpus=isolated, and bind it to a NUMA node. The host is too noisy when the load
+    average is above max_load, or the busiest of the cores is busier than
+    max_cpu_busy before the run. After the run, only how busy the cores are is
+    checked, the load average still includes the load of the repro itself
+    """
+
+    def __init__(
+        self,
+        cpus: Optional[str] = None,
+        numa_node: Optional[int] = None,
+        max_load: Optional[float] = None,
+        max_cpu_busy: Optional[float] = None,
+        retries: int = 3,
+        retry_wait: float = 30.0,
+        root: str = "/",
+    ):
+        self.numa_node = numa_node
+        self.max_load = max_load
+        self.max_cpu_busy = max_cpu_busy
+        self.retries = retries
+        self.retry_wait = retry_wait
+        self.root = root
+
+        if cpus == "isolated":
+            cpus = read_file(root, "/sys/devices/system/cpu/isolated")
+            assert cpus, "No isolated CPUs on this host."
+        if cpus:
+            self.cpus = parse_cpulist(cpus)
+        elif numa_node is not None:
+            node_cpus = read_file(
+                root, f"/sys/devices/system/node/node{numa_node}/cpulist"
+            )
+            assert node_cpus, f"NUMA node {numa_node} doesn't exist."
+            self.cpus = parse_cpulist(node_cpus)
+        else:
+            self.cpus = sorted(os.sched_getaffinity(0))
+
+    def wrap(
+        self, cmdline: List[str]
+    ) -> Tuple[List[str], Optional[Callable[[], None]]]:
+        """
+        Return the command line and the function to run in the child before the
+        repro starts. numactl also binds the memory to the node when it's set,
+        otherwise the cores are set with sched_setaffinity
+        """
+        if self.numa_node is not None and shutil.which("numactl"):
+            return [
+                "numactl",
+                f"--cpunodebind={self.numa_node}",
+                f"--membind={self.numa_node}",
+                f"--physcpubind={format_cpulist(self.cpus)}",
+            ] + cmdline, None
+
+        cpus = set(self.cpus)
+        return cmdline, lambda: os.sched_setaffinity(0, cpus)
+
+    def check(self, after_run: bool = False) -> Tuple[List[str], Dict[str, Any]]:
+        """
+        Return the reasons why the host is too noisy, if any, and its state. The
+        cores are watched once the repro has exited, so their busy time is the
+        other processes, but the 1-minute load average is mostly the repro right
+        after the run, so it's only recorded then
+        """
+        state = get_host_state(self.cpus, self.root)
+        reasons = []
+        if (
+            not after_run
+            and self.max_load is not None
+            and state["loadavg"]
+            and state["loadavg"][0] > self.max_load
+        ):
+            reasons.append(
+                f"load average {state['loadavg'][0]} is above {self.max_load}"
+            )
+        if self.max_cpu_busy is not None and state["cpu_busy"] > self.max_cpu_busy:
+            reasons.append(
+                f"CPUs {state['cpus']} are {state['cpu_busy'] * 100:.0f}% busy, above {self.max_cpu_busy * 100:.0f}%"
+            )
+        non_performance = [g for g in state["governors"] if g != "performance"]
+        if non_performance:
+            # This is only a warning, not all hosts can change the governor
+            print(
+                f"WARNING: CPU frequency governors {non_performance} are not performance"
+            )
+        return reasons, state
+
+    def wait_until_quiet(self) -> Tuple[bool, Dict[str, Any]]:
+        """
+        Check the host up to retries + 1 times. Return if it's quiet enough to
+        measure and its last state
+        """
+        for attempt in range(self.retries + 1):
+            reasons, state = self.check()
+            if not reasons:
+                return True, state
+
+            print(f"The host is too noisy: {', '.join(reasons)}")
+            if attempt < self.retries:
+                print(f"Check again in {self.retry_wait} seconds")
+                time.sleep(self.retry_wait)
+        return False, state
@@ -0,0 +1,148 @@
+"""
+Run the repro under a watchdog that kills it when it runs over its wall-clock
+budget, when it stops writing to stdout for too long, or as soon as its output
+shows that it has failed. Each outcome has its own exit code, which the bisect
+treats as skip, except a failed accuracy check which is a regression.
+"""
+
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, List, Optional, Tuple
+
+# Same as coreutils timeout
+TIMEOUT_EXIT_CODE = 124
+STALL_EXIT_CODE = 123
+ERROR_PATTERN_EXIT_CODE = 122
+# The repro has failed the accuracy check, i.e. a regression, the same as the exit
+# code of the detector on a failed accuracy check
+ACCURACY_EXIT_CODE = 1
+# The errors that usually have nothing to do with the commit being bisected. This is
+# opt-in, an OOM or a crash can also be the regression, and the commits that hit
+# them would be skipped instead of marked bad
+KNOWN_ERROR_PATTERN = "|".join(
+    [
+        r"CUDA out of memory",
+        r"No space left on device",
+        r"ModuleNotFoundError: No module named",
+    ]
+)
+# The lines of the dynamo benchmarks and the accuracy metrics that fail the check
+DEFAULT_ACCURACY_PATTERN = r"\bfail_accuracy\b|^accuracy[:=,\s]+0(\.0+)?$"
+# Give the repro this long to exit after SIGTERM before it's killed
+KILL_GRACE_PERIOD = 10.0
+
+
+class Watchdog:
+    def __init__(
+        self,
+        timeout: Optional[float] = None,
+        stall_timeout: Optional[float] = None,
+        error_pattern: Optional[str] = None,
+        accuracy_pattern: Optional[str] = None,
+    ):
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.error_pattern = re.compile(error_pattern) if error_pattern else None
+        self.accuracy_pattern = (
+            re.compile(accuracy_pattern) if accuracy_pattern else None
+        )
+
+    def check_line(self, line: str) -> Optional[Tuple[int, str]]:
+        if self.accuracy_pattern and self.accuracy_pattern.search(line):
+            return ACCURACY_EXIT_CODE, f"the accuracy check failed: {line}"
+        if self.error_pattern and self.error_pattern.search(line):
+            return ERROR_PATTERN_EXIT_CODE, f"known error: {line}"
+        return None
+
+
+def read_lines(stream, lines: queue.Queue) -> None:
+    for line in stream:
+        lines.put(line.decode("utf-8", errors="replace").strip())
+    lines.put(None)
+
+
+def kill(p: subprocess.Popen) -> None:
+    """
+    Terminate the whole process group of the repro, e.g. the compile workers
+    """
+    try:
+        os.killpg(p.pid, signal.SIGTERM)
+        p.wait(timeout=KILL_GRACE_PERIOD)
+    except subprocess.TimeoutExpired:
+        os.killpg(p.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    p.wait()
+
+
+def run_watched(
+    cmdline: List[str],
+    cwd: Optional[str],
+    watchdog: Watchdog,
+    preexec_fn: Optional[Callable[[], None]] = None,
+) -> Tuple[int, List[str]]:
+    """
+    Run the repro and stream its stdout. Return its exit code, or the exit code of
+    the watchdog when it's killed, and its stdout lines
+    """
+    start = time.monotonic()
+    p = subprocess.Popen(
+        cmdline,
+        cwd=cwd,
+        stdout=subprocess.PIPE,
+        stderr=None,
+        preexec_fn=preexec_fn,
+        # So that the watchdog can kill all the processes of the repro at once
+        start_new_session=True,
+    )
+    lines: queue.Queue = queue.Queue()
+    reader = threading.Thread(target=read_lines, args=(p.stdout, lines), daemon=True)
+    reader.start()
+
+    stdout_lines: List[str] = []
+    last_output = start
+    outcome = None
+    while outcome is None:
+        now = time.monotonic()
+        deadlines = []
+        if watchdog.timeout is not None:
+            deadlines.append(start + watchdog.timeout)
+        if watchdog.stall_timeout is not None:
+            deadlines.append(last_output + watchdog.stall_timeout)
+        wait = max(0.0, min(deadlines) - now) if deadlines else None
+
+        try:
+            line = lines.get(timeout=wait)
+        except queue.Empty:
+            now = time.monotonic()
+            if watchdog.timeout is not None and now - start >= watchdog.timeout:
+                outcome = (
+                    TIMEOUT_EXIT_CODE,
+                    f"no result after {watchdog.timeout:.0f} seconds",
+                )
+            elif (
+                watchdog.stall_timeout is not None
+                and now - last_output >= watchdog.stall_timeout
+            ):
+                outcome = (
+                    STALL_EXIT_CODE,
+                    f"no output for {watchdog.stall_timeout:.0f} seconds",
+                )
+            continue
+
+        if line is None:
+            return p.wait(), stdout_lines
+        print(line)
+        stdout_lines.append(line)
+        last_output = time.monotonic()
+        outcome = watchdog.check_line(line)
+
+    rc, reason = outcome
+    print(f"Stop the repro, {reason}, exit with {rc}.")
+    kill(p)
+    return rc, stdout_lines
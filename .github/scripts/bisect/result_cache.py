@@ -0,0 +1,162 @@
+"""
+On-disk cache of the repro results by PyTorch commit, so that a restarted bisect
+or a commit that has already been measured, i.e. the pre-flight good and bad
+commits, doesn't need to run the repro again.
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import time
+from typing import Any, Dict, List, Optional
+
+# Bump this when the layout of the cache entries changes
+RESULT_CACHE_VERSION = 3
+# The environment variables that can change the result of the repro are part of
+# the cache key, the rest like GITHUB_* change on every run and are ignored
+ENV_PREFIXES = (
+    "CUDA",
+    "FUNCTIONAL",
+    "MKL",
+    "NCCL",
+    "OMP",
+    "PYTORCH",
+    "TORCH",
+    "TRITON",
+)
+# The cores and the NUMA node the repro is pinned to change its result too
+ISOLATION_ENV = set(
+    [
+        "REPRO_CPUS",
+        "REPRO_NUMA_NODE",
+    ]
+)
+
+
+def get_torch_sha(torch_src_dir: Optional[str]) -> Optional[str]:
+    if not torch_src_dir:
+        return None
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"],
+            cwd=torch_src_dir,
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def get_env_fingerprint(environ: Dict[str, str]) -> Dict[str, str]:
+    return {
+        k: v
+        for k, v in sorted(environ.items())
+        if k.startswith(ENV_PREFIXES) or k in ISOLATION_ENV
+    }
+
+
+class ResultCache:
+    """
+    Each entry is a JSON file named after the commit SHA and the hash of the repro
+    command line, environment, and metrics. When invalidate is set, the existing entries
+    are ignored and overwritten by the new results. Each entry also keeps the number
+    of samples it was measured with, i.e. REPRO_SAMPLES, and it's not reused when
+    more samples are asked for
+    """
+
+    def __init__(self, cache_dir: str, invalidate: bool = False):
+        self.cache_dir = cache_dir
+        self.invalidate = invalidate
+
+    def get_path(
+        self,
+        sha: str,
+        cmdline: str,
+        environ: Dict[str, str],
+        metrics: Optional[List[Dict[str, Any]]] = None,
+    ) -> str:
+        key = hashlib.sha256(
+            json.dumps(
+                {
+                    "cmdline": cmdline,
+                    "env": get_env_fingerprint(environ),
+                    # The thresholds don't change the samples
+                    "metrics": [
+                        {k: v for k, v in spec.items() if k != "threshold"}
+                        for spec in metrics or []
+                    ],
+                },
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{sha}-{key}.json")
+
+    def get(
+        self,
+        sha: str,
+        cmdline: str,
+        environ: Dict[str, str],
+        metrics: Optional[List[Dict[str, Any]]] = None,
+        repro_samples: int = 1,
+    ) -> Optional[Dict[str, Any]]:
+        if self.invalidate:
+            return None
+
+        path = self.get_path(sha, cmdline, environ, metrics)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Fail to load the cached result {path}, ignoring it: {e}")
+            return None
+
+        if entry.get("version") != RESULT_CACHE_VERSION:
+            return None
+        if entry.get("repro_samples", 1) < repro_samples:
+            print(
+                f"The cached result {path} has up to {entry.get('repro_samples', 1)} samples, fewer than {repro_samples}"
+            )
+            return None
+        return entry
+
+    def put(
+        self,
+        sha: str,
+        cmdline: str,
+        environ: Dict[str, str],
+        rc: int,
+        samples: Dict[str, List[float]],
+        verdicts: Optional[Dict[str, Any]] = None,
+        metrics: Optional[List[Dict[str, Any]]] = None,
+        host: Optional[Dict[str, Any]] = None,
+        duration: Optional[float] = None,
+        repro_samples: int = 1,
+    ) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_path(sha, cmdline, environ, metrics)
+        # Write to a temporary file first, so that a bisect killed in the middle
+        # doesn't leave a truncated entry behind
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(
+                {
+                    "version": RESULT_CACHE_VERSION,
+                    "sha": sha,
+                    "cmdline": cmdline,
+                    "env": get_env_fingerprint(environ),
+                    "timestamp": int(time.time()),
+                    "rc": rc,
+                    "samples": samples,
+                    # The maximum number of samples, the sampling can stop earlier
+                    "repro_samples": repro_samples,
+                    "verdicts": verdicts,
+                    # The state of the host before and after the run, if checked
+                    "host": host,
+                    # The duration of a run in seconds, if measured
+                    "duration": duration,
+                },
+                f,
+            )
+        os.replace(f"{path}.tmp", path)
@@ -14,9 +14,12 @@ required_envs=(
   VISION_SRC_DIR
   CUDA_HOME
   FUNCTIONAL
-  REPRO_CMDLINE
   USE_UV
 )
+# a multi-target bisect reads the repros from the TARGETS JSON file instead
+if [[ -z "${TARGETS:-}" ]]; then
+  required_envs+=(REPRO_CMDLINE)
+fi
 
 for env_name in "${required_envs[@]}"; do
   if [[ -z "${!env_name:-}" ]]; then
@@ -30,6 +33,19 @@ if [ ! -e ${DETECTOR} ]; then
     exit 1
 fi
 
+# the parallel builds and the wheel cache of the driver install the wheels that
+# BISECT_BUILD_CMD writes, build_pytorch.sh installs PyTorch in place without
+# writing any, so every commit would fail to build and be skipped. The driver is
+# used with TARGETS, and with the options that generate TARGETS further down
+uses_driver=0
+if [[ -n "${TARGETS:-}${BISECT_INCLUDE:-}${BISECT_EXCLUDE:-}" ]] || [[ "${BISECT_PARALLEL:-1}" -gt 1 ]]; then
+  uses_driver=1
+fi
+if { [[ "${BISECT_PARALLEL:-1}" -gt 1 ]] || [[ "${uses_driver}" -eq 1 && -n "${WHEEL_CACHE_DIR:-}" ]]; } && [[ -z "${BISECT_BUILD_CMD:-}" ]]; then
+  echo "BISECT_PARALLEL > 1 and WHEEL_CACHE_DIR need BISECT_BUILD_CMD to write wheels to dist/, e.g. python setup.py bdist_wheel" >&2
+  exit 1
+fi
+
 checkout_pytorch_commit() {
   local repo_dir="$1"
   local commit="$2"
@@ -40,28 +56,113 @@ checkout_pytorch_commit() {
   git submodule update --init --recursive
   cd -
 }
+export -f checkout_pytorch_commit
 
 readonly LOG_DIR="${WORKSPACE_DIR}/bisect_logs"
+# the results of the commits that have been measured are reused when the bisect
+# is restarted, set RESULT_CACHE_INVALIDATE=1 to measure them again
+export RESULT_CACHE_DIR="${RESULT_CACHE_DIR:-${LOG_DIR}/result_cache}"
+# every step below, and every run of the repro, is a span in the timeline
+export BISECT_TIMELINE="${BISECT_TIMELINE:-${LOG_DIR}/timeline.jsonl}"
 
 mkdir -p "${LOG_DIR}"
 
+# run a command in a span of the timeline: timed <phase> <commit> <command...>
+timed() {
+  local phase="$1"
+  local commit="$2"
+  shift 2
+  python "${SCRIPT_DIR}/bisect_timeline.py" run --phase "${phase}" --commit "${commit}" -- "$@"
+}
+
+summarize_timeline() {
+  python "${SCRIPT_DIR}/bisect_timeline.py" summarize "${BISECT_TIMELINE}" || true
+}
+
 # step 1: setup pytorch build environment
 tritonparse_dir=$(dirname $(python -c "import tritonparse; print(tritonparse.__file__)"))
-bash ${tritonparse_dir}/bisect/scripts/prepare_build_pytorch.sh
+timed setup "" bash ${tritonparse_dir}/bisect/scripts/prepare_build_pytorch.sh
+
+# the commits that only change the paths in BISECT_EXCLUDE, or none of the paths
+# in BISECT_INCLUDE, are pruned, and BISECT_PARALLEL > 1 builds several commits
+# at once, tritonparse can't do either so use the driver
+if [[ -z "${TARGETS:-}" ]] && { [[ -n "${BISECT_INCLUDE:-}${BISECT_EXCLUDE:-}" ]] || [[ "${BISECT_PARALLEL:-1}" -gt 1 ]]; }; then
+  TARGETS="${LOG_DIR}/targets.json"
+  python -c 'import json, os, sys; json.dump([{"name": "repro", "repro_cmdline": os.environ["REPRO_CMDLINE"]}], sys.stdout)' > "${TARGETS}"
+fi
+
+# bisect several regressions at once, every commit is built once for all of them.
+# With BISECT_PARALLEL or WHEEL_CACHE_DIR, BISECT_BUILD_CMD needs to write wheels
+# to dist/, e.g. python setup.py bdist_wheel
+if [[ -n "${TARGETS:-}" ]]; then
+  python "${SCRIPT_DIR}/bisect_driver.py" \
+    --repo-dir "${PYTORCH_SRC_DIR}" \
+    --good "${GOOD_COMMIT}" \
+    --bad "${BAD_COMMIT}" \
+    --targets "${TARGETS}" \
+    --build-cmd "${BISECT_BUILD_CMD:-bash ${tritonparse_dir}/bisect/scripts/build_pytorch.sh}" \
+    --checkout-submodules \
+    --parallel "${BISECT_PARALLEL:-1}" \
+    --wheel-cache "${WHEEL_CACHE_DIR:-}" \
+    --compiler-cache "${COMPILER_CACHE_DIR:-}" \
+    --include "${BISECT_INCLUDE:-}" \
+    --exclude "${BISECT_EXCLUDE:-}" \
+    --baseline-store "${BASELINE_STORE_DIR:-}" \
+    --baseline-max-age "${BASELINE_MAX_AGE:-7d}" \
+    --log-dir "${LOG_DIR}"
+  exit $?
+fi
 
-# step 2: build and run the good commit (baseline)
+# the driver prints its own summary, tritonparse doesn't
+trap summarize_timeline EXIT
+
+# step 2: build and run the good commit (baseline), unless the baseline of the
+# same good commit, repro, and host class recorded within BASELINE_MAX_AGE is in
+# BASELINE_STORE_DIR
 BASELINE_LOG="${LOG_DIR}/baseline.log"
-checkout_pytorch_commit "${PYTORCH_SRC_DIR}" "${GOOD_COMMIT}"
-bash ${tritonparse_dir}/bisect/scripts/build_pytorch.sh
+BASELINE_STORE_DIR="${BASELINE_STORE_DIR:-}"
 cd ${PYTORCH_SRC_DIR}
-eval ${REPRO_CMDLINE} 2>&1 | tee "${BASELINE_LOG}"
+store_args=(
+  --store-dir "${BASELINE_STORE_DIR}"
+  --commit "$(git rev-parse "${GOOD_COMMIT}^{commit}")"
+  --cmdline "${REPRO_CMDLINE}"
+  --log "${BASELINE_LOG}"
+)
+if [ "${FUNCTIONAL}" -eq 0 ] && { [ "${REPRO_SAMPLES:-1}" -gt 1 ] || [ -n "${METRICS:-}" ]; }; then
+  # record the samples of all the metrics of the baseline, the metrics could be
+  # in files that the next build overwrites. A functional repro has no metrics
+  export BASELINE_SAMPLES="${LOG_DIR}/baseline.json"
+  store_args+=(--samples "${BASELINE_SAMPLES}")
+fi
+
+if [[ -n "${BASELINE_STORE_DIR}" ]] && python "${SCRIPT_DIR}/baseline_store.py" get "${store_args[@]}" \
+    --max-age "${BASELINE_MAX_AGE:-7d}" --min-samples "${REPRO_SAMPLES:-1}" --env-file "${LOG_DIR}/baseline.env"; then
+  set -a
+  source "${LOG_DIR}/baseline.env"
+  set +a
+  echo "Skip building and running the good commit (${GOOD_COMMIT}), reuse its baseline recorded ${BASELINE_AGE} seconds ago."
+else
+  timed checkout "${GOOD_COMMIT}" bash -c 'checkout_pytorch_commit "$@"' _ "${PYTORCH_SRC_DIR}" "${GOOD_COMMIT}"
+  timed build "${GOOD_COMMIT}" bash ${tritonparse_dir}/bisect/scripts/build_pytorch.sh
+  if [[ -n "${BASELINE_SAMPLES:-}" ]]; then
+    timed baseline "${GOOD_COMMIT}" python "${DETECTOR}" --record-baseline "${BASELINE_SAMPLES}" 2>&1 | tee "${BASELINE_LOG}"
+  else
+    baseline_start=${SECONDS}
+    timed repro "${GOOD_COMMIT}" bash -c "${REPRO_CMDLINE}" 2>&1 | tee "${BASELINE_LOG}"
+    # the watchdog of the detector derives its timeout from this
+    export BASELINE_DURATION=$((SECONDS - baseline_start))
+  fi
+  if [[ -n "${BASELINE_STORE_DIR}" ]]; then
+    python "${SCRIPT_DIR}/baseline_store.py" put "${store_args[@]}" ${BASELINE_DURATION:+--duration "${BASELINE_DURATION}"}
+  fi
+fi
 
 # step 3: build and run the bad commit
-checkout_pytorch_commit "${PYTORCH_SRC_DIR}" "${BAD_COMMIT}"
-bash ${tritonparse_dir}/bisect/scripts/build_pytorch.sh
+timed checkout "${BAD_COMMIT}" bash -c 'checkout_pytorch_commit "$@"' _ "${PYTORCH_SRC_DIR}" "${BAD_COMMIT}"
+timed build "${BAD_COMMIT}" bash ${tritonparse_dir}/bisect/scripts/build_pytorch.sh
 # allow the regression detector to exit with error code
 set +e
-BASELINE_LOG="${BASELINE_LOG}" python "${DETECTOR}"
+BASELINE_LOG="${BASELINE_LOG}" timed preflight "${BAD_COMMIT}" python "${DETECTOR}"
 PREFLIGHT_RC=$?
 set -e
 
@@ -76,9 +177,10 @@ elif [ ${PREFLIGHT_RC} -ne 1 ] && [ ${FUNCTIONAL} -ne 1 ]; then
     echo "This may indicate a build or environment issue. Proceeding with bisect anyway."
 fi
 
-# kick off the bisect!
-BASELINE_LOG="${BASELINE_LOG}" USE_UV="${USE_UV}" \
-tritonparseoss bisect \
+# kick off the bisect! tritonparse only skips the commits on exit code 125, so
+# use it when the watchdog stops the repro
+BASELINE_LOG="${BASELINE_LOG}" USE_UV="${USE_UV}" WATCHDOG_EXIT_CODE=125 \
+timed bisect "" tritonparseoss bisect \
   --no-tui \
   --target torch \
   --torch-dir "${PYTORCH_SRC_DIR}" \
@@ -0,0 +1,75 @@
+import json
+import os
+import subprocess
+import sys
+
+from baseline_store import BaselineStore, parse_age
+
+STORE = os.path.join(os.path.dirname(__file__), "baseline_store.py")
+
+
+def test_parse_age():
+    assert parse_age("3600") == 3600
+    assert parse_age("30m") == 1800
+    assert parse_age("7d") == 7 * 86400
+
+
+def test_baseline_store(tmp_path):
+    store = BaselineStore(str(tmp_path), "linux.24xl.spr-metal")
+    environ = {"TORCHINDUCTOR_MAX_AUTOTUNE": "1", "GITHUB_RUN_ID": "1"}
+    baseline = {"cmdline": "python repro.py", "samples": {"value": [1.0, 1.1, 0.9]}}
+    path = store.put("abc", "python repro.py", environ, baseline=baseline)
+
+    entry = store.get("abc", "python repro.py", environ, max_age=60)
+    assert entry["baseline"] == baseline
+    assert entry["age"] < 60
+    assert "abc" in store.describe(entry)
+    # Only the environment that can change the result is part of the key
+    assert store.get("abc", "python repro.py", {**environ, "GITHUB_RUN_ID": "2"})
+    assert store.get("abc", "python repro.py", {}) is None
+    assert store.get("def", "python repro.py", environ) is None
+    assert BaselineStore(str(tmp_path), "linux.dgx.b200").get(
+        "abc", "python repro.py", environ
+    ) is None
+    assert store.get("abc", "python repro.py", environ, min_samples=5) is None
+
+    # Too old
+    with open(path) as f:
+        stored = json.load(f)
+    stored["timestamp"] -= 3600
+    with open(path, "w") as f:
+        json.dump(stored, f)
+    assert store.get("abc", "python repro.py", environ, max_age=1800) is None
+    assert store.get("abc", "python repro.py", environ, max_age=7200)
+
+
+def test_baseline_store_cli(tmp_path):
+    (tmp_path / "baseline.log").write_text("Running\n1.5x\n")
+
+    def run(command: str, *args) -> int:
+        return subprocess.call(
+            [
+                sys.executable,
+                STORE,
+                command,
+                "--store-dir",
+                str(tmp_path / "store"),
+                "--commit",
+                "abc",
+                "--cmdline",
+                "python repro.py",
+                "--log",
+                str(tmp_path / "baseline.log"),
+                *args,
+            ],
+            env={**os.environ, "BISECT_HOST_CLASS": "linux.dgx.b200"},
+        )
+
+    assert run("get") == 1
+    assert run("put", "--duration", "120") == 0
+    (tmp_path / "baseline.log").unlink()
+    assert run("get", "--env-file", str(tmp_path / "baseline.env")) == 0
+    assert (tmp_path / "baseline.log").read_text() == "Running\n1.5x\n"
+    assert "BASELINE_DURATION=120" in (tmp_path / "baseline.env").read_text()
+    # There are no samples, only the log
+    assert run("get", "--min-samples", "3") == 1
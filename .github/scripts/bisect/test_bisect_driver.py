@@ -0,0 +1,263 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from baseline_store import BaselineStore
+from bisect_builders import InPlaceBuilder, WorktreeBuilder
+from bisect_driver import MultiTargetBisect, list_commits
+from bisect_timeline import Timeline, load_spans
+
+
+def git(repo_dir, *args) -> str:
+    return subprocess.check_output(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=repo_dir,
+        text=True,
+    ).strip()
+
+
+def create_toy_repo(tmp_path, perf: list) -> str:
+    """
+    Each commit changes the performance of the targets in perf.json, the stub
+    build copies it to the build directory and logs the commit it builds
+    """
+    repo_dir = tmp_path / "pytorch"
+    repo_dir.mkdir()
+    git(repo_dir, "init", "-q")
+    for i, values in enumerate(perf):
+        (repo_dir / "perf.json").write_text(json.dumps(values))
+        git(repo_dir, "add", "perf.json")
+        git(repo_dir, "commit", "-q", "--allow-empty", "-m", f"commit {i}")
+    return str(repo_dir)
+
+
+def create_stubs(tmp_path) -> tuple:
+    build = tmp_path / "build.py"
+    build.write_text(
+        textwrap.dedent(
+            f"""
+            import os
+            import shutil
+
+            os.makedirs("build", exist_ok=True)
+            shutil.copy("perf.json", "build/perf.json")
+            with open({str(tmp_path / "builds.log")!r}, "a") as f:
+                f.write(os.environ["BISECT_COMMIT"] + "\\n")
+            """
+        )
+    )
+    repro = tmp_path / "repro.py"
+    repro.write_text(
+        textwrap.dedent(
+            """
+            import json
+            import sys
+
+            print("Running", sys.argv[1])
+            print(json.load(open("build/perf.json"))[sys.argv[1]])
+            """
+        )
+    )
+    return f"{sys.executable} {build}", f"{sys.executable} {repro}"
+
+
+def test_multi_target_bisect(tmp_path):
+    perf = [
+        {"a": 100 if i < 5 else 50, "b": 100 if i < 10 else 200, "c": 100}
+        for i in range(13)
+    ]
+    repo_dir = create_toy_repo(tmp_path, perf)
+    build_cmd, repro = create_stubs(tmp_path)
+    commits = git(repo_dir, "rev-list", "--reverse", "HEAD").split()
+
+    good, bad = commits[0], commits[-1]
+    assert list_commits(repo_dir, good, bad) == commits[1:]
+
+    targets = [
+        {"name": name, "repro_cmdline": f"{repro} {name}", "functional": False}
+        for name in ["a", "b", "c"]
+    ]
+    bisect = MultiTargetBisect(
+        repo_dir,
+        good,
+        commits[1:],
+        targets,
+        InPlaceBuilder(repo_dir, build_cmd),
+        str(tmp_path / "logs"),
+    )
+    results = bisect.run()
+
+    assert results["targets"]["a"]["status"] == "found"
+    assert results["targets"]["a"]["first_bad"] == commits[5]
+    assert results["targets"]["b"]["status"] == "found"
+    assert results["targets"]["b"]["first_bad"] == commits[10]
+    assert results["targets"]["c"]["status"] == "dropped"
+
+    # Every commit is built once and shared by the targets, that's fewer builds
+    # than bisecting the two regressions one after the other
+    with open(tmp_path / "builds.log") as f:
+        builds = f.read().split()
+    assert builds == results["built_commits"]
+    assert len(set(builds)) == len(builds)
+    assert len(builds) < 2 * (2 + 4)
+    assert os.path.exists(tmp_path / "logs" / "baselines" / "a.json")
+
+
+def test_functional_target(tmp_path):
+    perf = [{"a": 100 if i < 6 else 50} for i in range(9)]
+    repo_dir = create_toy_repo(tmp_path, perf)
+    build_cmd, _ = create_stubs(tmp_path)
+    commits = git(repo_dir, "rev-list", "--reverse", "HEAD").split()
+
+    # The repro passes or fails, there is no baseline to record
+    repro = tmp_path / "functional.py"
+    repro.write_text(
+        "import json, sys; sys.exit(json.load(open('build/perf.json'))['a'] < 100)"
+    )
+    bisect = MultiTargetBisect(
+        repo_dir,
+        commits[0],
+        commits[1:],
+        [{"name": "a", "repro_cmdline": f"{sys.executable} {repro}", "functional": 1}],
+        InPlaceBuilder(repo_dir, build_cmd),
+        str(tmp_path / "logs"),
+    )
+    assert bisect.needs_baselines() == []
+    results = bisect.run()
+    assert results["targets"]["a"]["status"] == "found"
+    assert results["targets"]["a"]["first_bad"] == commits[6]
+    assert not os.path.exists(tmp_path / "logs" / "baselines" / "a.json")
+
+
+def test_multi_target_bisect_skip(tmp_path):
+    perf = [{"a": 100 if i < 4 else 50} for i in range(9)]
+    repo_dir = create_toy_repo(tmp_path, perf)
+    build_cmd, repro = create_stubs(tmp_path)
+    commits = git(repo_dir, "rev-list", "--reverse", "HEAD").split()
+
+    # The commit before the regression doesn't build, so it can't be ruled out
+    broken = commits[3]
+    bisect = MultiTargetBisect(
+        repo_dir,
+        commits[0],
+        commits[1:],
+        [{"name": "a", "repro_cmdline": f"{repro} a"}],
+        InPlaceBuilder(repo_dir, f'test "$BISECT_COMMIT" != {broken} && {build_cmd}'),
+        str(tmp_path / "logs"),
+    )
+    results = bisect.run()
+    assert results["targets"]["a"]["status"] == "ambiguous"
+    assert results["targets"]["a"]["candidates"] == [commits[3], commits[4]]
+
+
+def test_parallel_bisect(tmp_path):
+    perf = [{"a": 100 if i < 11 else 50} for i in range(30)]
+    repo_dir = create_toy_repo(tmp_path, perf)
+    commits = git(repo_dir, "rev-list", "--reverse", "HEAD").split()
+
+    # The stub build writes a wheel with the performance of the commit, and the
+    # install copies it to where the repro reads it
+    build = tmp_path / "build_wheel.py"
+    build.write_text(
+        textwrap.dedent(
+            f"""
+            import os
+            import shutil
+
+            os.makedirs("dist", exist_ok=True)
+            shutil.copy("perf.json", "dist/toy-0.1-py3-none-any.whl")
+            with open({str(tmp_path / "builds.log")!r}, "a") as f:
+                f.write(os.environ["BISECT_COMMIT"] + " " + os.getcwd() + "\\n")
+            """
+        )
+    )
+    install = "mkdir -p build && cp $BISECT_WHEELS build/perf.json"
+    _, repro = create_stubs(tmp_path)
+
+    def run_bisect():
+        timeline = Timeline(str(tmp_path / "timeline.jsonl"))
+        builder = WorktreeBuilder(
+            repo_dir,
+            str(tmp_path / "worktrees"),
+            f"{sys.executable} {build}",
+            str(tmp_path / "wheels"),
+            install,
+            compiler_cache=str(tmp_path / "ccache"),
+            max_workers=3,
+            timeline=timeline,
+        )
+        bisect = MultiTargetBisect(
+            repo_dir,
+            commits[0],
+            commits[1:],
+            [{"name": "a", "repro_cmdline": f"{repro} a"}],
+            builder,
+            str(tmp_path / "logs"),
+            parallel=3,
+            timeline=timeline,
+        )
+        try:
+            return bisect.run()
+        finally:
+            builder.close()
+
+    results = run_bisect()
+    assert results["targets"]["a"]["first_bad"] == commits[11]
+    with open(tmp_path / "builds.log") as f:
+        builds = [line.split() for line in f.read().splitlines()]
+    assert len(builds) == results["builds"]
+    # The builds happen in the worktrees, not in the repo
+    assert all(cwd.startswith(str(tmp_path / "worktrees")) for _, cwd in builds)
+    assert len(set(commit for commit, _ in builds)) == len(builds)
+
+    # The concurrent builds are nested under the prefetch that started them, and
+    # the runs of the repro under the evaluation of the target
+    spans = {s["id"]: s for s in load_spans(str(tmp_path / "timeline.jsonl"))}
+    build_spans = [s for s in spans.values() if s["phase"] == "build"]
+    assert sorted(s["commit"] for s in build_spans) == sorted(c for c, _ in builds)
+    assert all(spans[s["parent"]]["phase"] == "prefetch" for s in build_spans)
+    repro_spans = [s for s in spans.values() if s["phase"] == "repro"]
+    assert repro_spans
+    assert all(spans[s["parent"]]["phase"] == "evaluate" for s in repro_spans)
+
+    # Bisecting the same range again reuses all the cached wheels
+    results = run_bisect()
+    assert results["targets"]["a"]["first_bad"] == commits[11]
+    assert results["builds"] == 0
+    # Some probes are built but not evaluated, when an older probe of the same
+    # step is already bad
+    assert set(results["cached_commits"]) <= set(commit for commit, _ in builds)
+    assert not os.path.exists(tmp_path / "worktrees" / "worktree-0")
+
+
+def test_reuse_stored_baselines(tmp_path):
+    perf = [{"a": 100 if i < 3 else 50} for i in range(6)]
+    repo_dir = create_toy_repo(tmp_path, perf)
+    build_cmd, repro = create_stubs(tmp_path)
+    commits = git(repo_dir, "rev-list", "--reverse", "HEAD").split()
+    store = BaselineStore(str(tmp_path / "store"), "toy")
+
+    def run_bisect():
+        bisect = MultiTargetBisect(
+            repo_dir,
+            commits[0],
+            commits[1:],
+            [{"name": "a", "repro_cmdline": f"{repro} a"}],
+            InPlaceBuilder(repo_dir, build_cmd),
+            str(tmp_path / "logs"),
+            baseline_store=store,
+            baseline_max_age=3600,
+        )
+        return bisect.run()
+
+    results = run_bisect()
+    assert commits[0] in results["built_commits"]
+    assert results["reused_baselines"] == {}
+
+    # The second bisect from the same good commit doesn't build it again
+    results = run_bisect()
+    assert results["targets"]["a"]["first_bad"] == commits[3]
+    assert commits[0] not in results["built_commits"]
+    assert list(results["reused_baselines"]) == ["a"]
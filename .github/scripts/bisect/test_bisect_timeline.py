@@ -0,0 +1,80 @@
+import os
+import sys
+
+from bisect_timeline import Timeline, get_critical_path, load_spans, summarize
+
+TIMELINE = os.path.join(os.path.dirname(__file__), "bisect_timeline.py")
+
+
+def test_timeline(tmp_path):
+    path = str(tmp_path / "timeline.jsonl")
+    timeline = Timeline(path)
+    with timeline.span("commit", "abc") as commit_span:
+        rc = timeline.call(
+            [sys.executable, "-c", "import sys; x = bytearray(64 << 20); sys.exit(3)"],
+            "build",
+            "abc",
+        )
+        # The child process writes its spans to the same timeline
+        timeline.call(
+            [
+                sys.executable,
+                TIMELINE,
+                "run",
+                "--phase",
+                "repro",
+                "--commit",
+                "abc",
+                "--",
+                sys.executable,
+                "-c",
+                "pass",
+            ],
+            "evaluate",
+            "abc",
+            attrs={"target": "bert"},
+        )
+    assert rc == 3
+
+    spans = {span["phase"]: span for span in load_spans(path)}
+    assert set(spans) == set(["commit", "build", "evaluate", "repro"])
+    assert spans["build"]["parent"] == commit_span["id"]
+    assert spans["build"]["rc"] == 3
+    assert spans["build"]["max_rss_kb"] > 64 << 10
+    assert spans["evaluate"]["target"] == "bert"
+    assert spans["repro"]["parent"] == spans["evaluate"]["id"]
+    assert spans["repro"]["rc"] == 0
+
+    # Nothing is written without a path
+    with Timeline().span("build"):
+        pass
+
+
+def test_summarize():
+    def span(id, phase, start, end, commit=None, parent=None):
+        return {
+            "id": id,
+            "parent": parent,
+            "phase": phase,
+            "commit": commit,
+            "start": start,
+            "end": end,
+            "duration": end - start,
+        }
+
+    spans = [
+        span("1", "prefetch", 0, 100),
+        # Two concurrent builds, the repro waits on the slower one
+        span("2", "build", 0, 60, "aaa", "1"),
+        span("3", "build", 0, 100, "bbb", "1"),
+        span("4", "commit", 100, 130, "bbb"),
+        span("5", "checkout", 100, 105, "bbb", "4"),
+        span("6", "repro", 105, 130, "bbb", "4"),
+    ]
+    path = get_critical_path(spans)
+    assert [s["id"] for s in path] == ["3", "5", "6"]
+
+    summary = summarize(spans)
+    assert "Total wall time 130s" in summary
+    assert "Critical path 130s over 3 spans" in summary
+    assert "bbb       130s: build 100s, repro 25s, checkout 5s" in summary
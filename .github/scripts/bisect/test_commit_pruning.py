@@ -0,0 +1,62 @@
+import os
+import subprocess
+
+from commit_pruning import get_changed_paths, is_relevant, prune_commits
+
+
+def git(repo_dir, *args) -> str:
+    return subprocess.check_output(
+        ["git", "-c", "user.name=a", "-c", "user.email=a@b", *args],
+        cwd=repo_dir,
+        text=True,
+    ).strip()
+
+
+def test_is_relevant():
+    exclude = ["docs/", ".github/", "*.md"]
+    assert not is_relevant(["docs/index.rst", "README.md"], [], exclude)
+    assert is_relevant(["docs/index.rst", "torch/nn/linear.py"], [], exclude)
+    include, exclude_inductor = ["torch/*"], ["torch/_inductor/"]
+    assert not is_relevant(["torch/_inductor/ir.py"], include, exclude_inductor)
+    assert is_relevant(["torch/csrc/Module.cpp"], include, exclude_inductor)
+    # Merges without any changed path are kept
+    assert is_relevant([], ["torch/*"], exclude)
+
+
+def test_prune_commits(tmp_path):
+    repo_dir = str(tmp_path)
+    git(repo_dir, "init", "-q")
+    changes = [
+        "README.md",
+        "docs/index.rst",
+        "torch/nn/linear.py",
+        ".github/workflows/pull.yml",
+        "torch/_inductor/ir.py",
+        "docs/conf.py",
+        "torch/nn/conv.py",
+        "docs/notes.rst",
+    ]
+    for path in changes:
+        os.makedirs(os.path.join(repo_dir, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(repo_dir, path), "a") as f:
+            f.write("change\n")
+        git(repo_dir, "add", path)
+        git(repo_dir, "commit", "-q", "-m", f"change {path}")
+    commits = git(repo_dir, "rev-list", "--reverse", "HEAD").split()
+
+    changed_paths = get_changed_paths(repo_dir, commits[0], commits[-1])
+    assert list(changed_paths.keys()) == commits[1:]
+    assert changed_paths[commits[2]] == ["torch/nn/linear.py"]
+
+    results = prune_commits(
+        changed_paths, [], ["docs/", ".github/", "*.md", "torch/_inductor/"]
+    )
+    # The bad commit is kept even though it only changes the docs
+    assert results["candidates"] == [commits[2], commits[6], commits[7]]
+    assert [p["commit"] for p in results["pruned"]] == [
+        commits[1],
+        commits[3],
+        commits[4],
+        commits[5],
+    ]
+    assert results["builds_saved"] == 1
@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from metric_extractors import extract_metrics, load_metrics
+from regression_stats import compare_samples
+
+
+def test_extract_metrics(tmp_path):
+    (tmp_path / "results.json").write_text(
+        json.dumps({"compile": [{"seconds": 12.5}, {"seconds": 30.0}]})
+    )
+    (tmp_path / "metrics.csv").write_text(
+        "name,peak_mem\nresnet50,1024\nbert,2048\n"
+    )
+    stdout_lines = [
+        "Running the benchmark",
+        "(batch_size, latency, speedup)",
+        "(8, 1.25ms, 1.20x)",
+        "name;peak_mem",
+        "resnet50; 900",
+        "Done",
+    ]
+
+    metrics = load_metrics(
+        json.dumps(
+            [
+                {
+                    "name": "speedup",
+                    "extractor": "regex",
+                    "pattern": r"(?P<speedup>[0-9.]+)x\)",
+                    "direction": "higher",
+                },
+                {
+                    "name": "latency",
+                    "extractor": "regex",
+                    "pattern": r"([0-9.]+)ms",
+                    "direction": "lower",
+                },
+                {
+                    "name": "compile_time",
+                    "extractor": "jsonpath",
+                    "file": "results.json",
+                    "path": "$.compile[-1].seconds",
+                    "direction": "lower",
+                    "threshold": 0.2,
+                },
+                {
+                    "name": "peak_memory",
+                    "extractor": "csv",
+                    "file": "metrics.csv",
+                    "column": "peak_mem",
+                    "where": {"name": "resnet50"},
+                },
+                {
+                    "name": "stdout_memory",
+                    "extractor": "csv",
+                    "column": "peak_mem",
+                    "delimiter": ";",
+                },
+            ]
+        ),
+        0.1,
+    )
+    assert [m["threshold"] for m in metrics] == [0.1, 0.1, 0.2, 0.1, 0.1]
+    assert extract_metrics(metrics, stdout_lines, str(tmp_path)) == {
+        "speedup": 1.2,
+        "latency": 1.25,
+        "compile_time": 30.0,
+        "peak_memory": 1024.0,
+        "stdout_memory": 900.0,
+    }
+
+    # The files of the baseline run are not available from its log
+    with pytest.raises(ValueError):
+        extract_metrics(metrics, stdout_lines, None)
+    # The default metric is the last line
+    assert extract_metrics(load_metrics(None, 0.1), ["a", "1.5x"], None) == {
+        "value": 1.5
+    }
+
+
+def test_direction():
+    baseline = [100.0, 101.0, 99.0, 100.5, 99.5]
+    faster = [130.0, 131.0, 129.0, 130.5, 129.5]
+    assert compare_samples(baseline, faster, 0.1, direction="both")["regression"]
+    assert compare_samples(baseline, faster, 0.1, direction="lower")["regression"]
+    verdict = compare_samples(baseline, faster, 0.1, direction="higher")
+    assert not verdict["regression"] and verdict["decided"]
@@ -0,0 +1,119 @@
+import os
+import random
+import subprocess
+import sys
+import textwrap
+
+from metric_extractors import load_metrics
+from regression_detector import collect_samples
+from regression_stats import compare_samples, mann_whitney_u
+
+
+def create_fake_repro(tmp_path, mean: float, noise: float) -> list:
+    """
+    A repro that prints some logs and then a noisy speedup on the last line. The
+    seed changes on every run so that the samples are different
+    """
+    counter = tmp_path / "counter"
+    repro = tmp_path / "repro.py"
+    repro.write_text(
+        textwrap.dedent(
+            f"""
+            import os
+            import random
+
+            counter = {str(counter)!r}
+            seed = int(open(counter).read()) if os.path.exists(counter) else 0
+            open(counter, "w").write(str(seed + 1))
+
+            print("Running the benchmark")
+            print(f"{{random.Random(seed).gauss({mean}, {mean * noise}):.4f}}x")
+            """
+        )
+    )
+    return [sys.executable, str(repro)]
+
+
+def test_mann_whitney_u():
+    assert mann_whitney_u([1.0, 2.0, 3.0], [1.0, 2.0, 3.0]) == 1.0
+    assert mann_whitney_u(list(range(10)), list(range(20, 30))) < 0.001
+    # All the values are the same
+    assert mann_whitney_u([1.0, 1.0], [1.0, 1.0]) == 1.0
+
+
+def test_compare_samples():
+    rng = random.Random(0)
+    baseline = [rng.gauss(100, 3) for _ in range(10)]
+    noisy = [rng.gauss(100, 3) for _ in range(10)]
+    slower = [rng.gauss(80, 3) for _ in range(10)]
+
+    for test in ["bootstrap", "mannwhitney"]:
+        verdict = compare_samples(baseline, noisy, 0.1, test)
+        assert not verdict["regression"]
+
+        verdict = compare_samples(baseline, slower, 0.1, test)
+        assert verdict["regression"] and verdict["decided"]
+        assert verdict["confidence"] > 0.95
+
+    verdict = compare_samples(baseline, noisy, 0.1, "bootstrap")
+    assert verdict["decided"]
+    low, high = verdict["interval"]
+    assert -0.1 <= low <= verdict["change"] <= high <= 0.1
+
+
+def test_collect_samples(tmp_path):
+    rng = random.Random(0)
+    baseline = {"value": [rng.gauss(2.0, 0.04) for _ in range(10)]}
+    metrics = load_metrics(None, 0.1)
+
+    # A clear regression stops the sampling early
+    cmdline = create_fake_repro(tmp_path, 1.5, 0.02)
+    rc, samples, verdict = collect_samples(
+        cmdline, str(tmp_path), 10, metrics, min_samples=3, baseline=baseline
+    )
+    assert rc == 0
+    assert len(samples["value"]) == 3
+    assert verdict["value"]["regression"] and verdict["value"]["decided"]
+
+    # So does a clear no regression with the bootstrap
+    os.remove(tmp_path / "counter")
+    cmdline = create_fake_repro(tmp_path, 2.0, 0.02)
+    rc, samples, verdict = collect_samples(
+        cmdline, str(tmp_path), 10, metrics, min_samples=3, baseline=baseline
+    )
+    assert rc == 0
+    assert 3 <= len(samples["value"]) < 10
+    assert not verdict["value"]["regression"] and verdict["value"]["decided"]
+
+    # Record the baseline without comparing
+    rc, samples, verdict = collect_samples(cmdline, str(tmp_path), 4)
+    assert rc == 0
+    assert len(samples["value"]) == 4 and verdict is None
+
+    # A failed run
+    rc, samples, verdict = collect_samples(
+        [sys.executable, "-c", "exit(3)"], str(tmp_path), 4, baseline=baseline
+    )
+    assert rc == 3 and not samples["value"]
+
+
+def test_record_baseline_functional(tmp_path):
+    # A functional repro passes or fails, it has no baseline to record
+    p = subprocess.run(
+        [
+            sys.executable,
+            os.path.join(os.path.dirname(__file__), "regression_detector.py"),
+            "--record-baseline",
+            str(tmp_path / "baseline.json"),
+        ],
+        env={
+            **os.environ,
+            "FUNCTIONAL": "1",
+            "REPRO_CMDLINE": f"{sys.executable} -c print('hello')",
+        },
+        capture_output=True,
+        text=True,
+    )
+    assert p.returncode == 2
+    assert "has no baseline" in p.stdout
+    assert not os.path.exists(tmp_path / "baseline.json")
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+
+from repro_isolation import Isolation, get_host_state, parse_cpulist
+
+
+def create_host(root, loadavg: str) -> None:
+    cpu_dir = root / "sys/devices/system/cpu"
+    for cpu, governor in enumerate(["performance", "powersave"]):
+        (cpu_dir / f"cpu{cpu}/cpufreq").mkdir(parents=True)
+        (cpu_dir / f"cpu{cpu}/cpufreq/scaling_governor").write_text(governor)
+    (cpu_dir / "intel_pstate").mkdir()
+    (cpu_dir / "intel_pstate/no_turbo").write_text("1\n")
+    (cpu_dir / "isolated").write_text("1\n")
+    (root / "sys/devices/system/node/node0").mkdir(parents=True)
+    (root / "sys/devices/system/node/node0/cpulist").write_text("0-1\n")
+    (root / "proc").mkdir()
+    (root / "proc/loadavg").write_text(f"{loadavg} 0.50 0.25 1/100 1234\n")
+    (root / "proc/stat").write_text(
+        "cpu  20 0 20 160 0 0 0 0 0 0\n"
+        "cpu0 10 0 10 80 0 0 0 0 0 0\n"
+        "cpu1 10 0 10 80 0 0 0 0 0 0\n"
+    )
+
+
+def test_parse_cpulist():
+    assert parse_cpulist("0-3,8,10-11\n") == [0, 1, 2, 3, 8, 10, 11]
+    assert parse_cpulist("") == []
+
+
+def test_host_state(tmp_path):
+    create_host(tmp_path, "0.75")
+    state = get_host_state([0, 1], str(tmp_path), interval=0)
+    assert state["cpus"] == "0,1"
+    assert state["loadavg"] == [0.75, 0.5, 0.25]
+    assert state["governors"] == {"performance": 1, "powersave": 1}
+    assert state["turbo"] is False
+    assert state["cpu_busy"] == 0.0
+
+    assert Isolation("isolated", root=str(tmp_path)).cpus == [1]
+    assert Isolation(numa_node=0, root=str(tmp_path)).cpus == [0, 1]
+
+
+def test_noisy_host(tmp_path):
+    create_host(tmp_path, "4.00")
+    isolation = Isolation(
+        "0", max_load=2.0, retries=1, retry_wait=0, root=str(tmp_path)
+    )
+    quiet, state = isolation.wait_until_quiet()
+    assert not quiet
+    assert state["loadavg"][0] == 4.0
+
+    isolation.max_load = 8.0
+    quiet, _ = isolation.wait_until_quiet()
+    assert quiet
+
+    # The load average after the run includes the repro itself
+    isolation.max_load = 2.0
+    reasons, _ = isolation.check(after_run=True)
+    assert not reasons
+
+
+def test_pinning():
+    cpu = min(os.sched_getaffinity(0))
+    cmdline, preexec_fn = Isolation(str(cpu)).wrap(
+        [sys.executable, "-c", "import os; print(sorted(os.sched_getaffinity(0)))"]
+    )
+    output = subprocess.check_output(cmdline, preexec_fn=preexec_fn, text=True)
+    assert output.strip() == f"[{cpu}]"
+
+
+def test_detector_on_noisy_host(tmp_path):
+    (tmp_path / "baseline.log").write_text("1.0x\n")
+    env = {
+        **os.environ,
+        "REPRO_CMDLINE": f"{sys.executable} -c print('1.0x')",
+        "BASELINE_LOG": str(tmp_path / "baseline.log"),
+        "FUNCTIONAL": "0",
+        "REPRO_NOISE_RETRIES": "0",
+    }
+    detector = os.path.join(os.path.dirname(__file__), "regression_detector.py")
+    # The load average can't be negative, so the host is always too noisy
+    assert (
+        subprocess.call([sys.executable, detector], env={**env, "REPRO_MAX_LOAD": "-1"})
+        == 125
+    )
+
+    output = subprocess.check_output(
+        [sys.executable, detector], env={**env, "REPRO_MAX_LOAD": "1000"}, text=True
+    )
+    assert "No regression detected" in output
+    assert "Host state:" in output
@@ -0,0 +1,107 @@
+import os
+import subprocess
+import sys
+import time
+
+from repro_watchdog import (
+    ACCURACY_EXIT_CODE,
+    DEFAULT_ACCURACY_PATTERN,
+    ERROR_PATTERN_EXIT_CODE,
+    KNOWN_ERROR_PATTERN,
+    STALL_EXIT_CODE,
+    TIMEOUT_EXIT_CODE,
+    Watchdog,
+    run_watched,
+)
+
+
+def run(script: str, watchdog: Watchdog):
+    start = time.monotonic()
+    rc, lines = run_watched([sys.executable, "-u", "-c", script], None, watchdog)
+    return rc, lines, time.monotonic() - start
+
+
+def test_watchdog():
+    rc, lines, _ = run("print('1.5x')", Watchdog(timeout=30, stall_timeout=30))
+    assert (rc, lines) == (0, ["1.5x"])
+    rc, _, _ = run("import sys; sys.exit(3)", Watchdog(timeout=30))
+    assert rc == 3
+
+    # A repro that keeps writing is stopped by the wall-clock budget
+    rc, lines, elapsed = run(
+        "import time\nwhile True:\n    print('compiling'); time.sleep(0.1)",
+        Watchdog(timeout=1, stall_timeout=30),
+    )
+    assert rc == TIMEOUT_EXIT_CODE
+    assert lines and elapsed < 15
+
+    rc, lines, elapsed = run(
+        "import time; print('start'); time.sleep(60)", Watchdog(stall_timeout=1)
+    )
+    assert (rc, lines) == (STALL_EXIT_CODE, ["start"])
+    assert elapsed < 15
+
+    # The failures stop the repro without waiting for the end of it
+    rc, _, elapsed = run(
+        "import time; print('torch.OutOfMemoryError: CUDA out of memory.'); time.sleep(60)",
+        Watchdog(error_pattern=KNOWN_ERROR_PATTERN),
+    )
+    assert rc == ERROR_PATTERN_EXIT_CODE
+    assert elapsed < 15
+    # An OOM could be the regression, so it's not skipped by default
+    rc, _, _ = run(
+        "import sys; print('torch.OutOfMemoryError: CUDA out of memory.'); sys.exit(1)",
+        Watchdog(timeout=30),
+    )
+    assert rc == 1
+    rc, _, elapsed = run(
+        "import time; print('cuda,inception_v3,128,fail_accuracy'); time.sleep(60)",
+        Watchdog(accuracy_pattern=DEFAULT_ACCURACY_PATTERN),
+    )
+    assert rc == ACCURACY_EXIT_CODE
+    assert elapsed < 15
+
+
+def test_detector_timeout(tmp_path):
+    (tmp_path / "baseline.log").write_text("1.0x\n")
+    (tmp_path / "repro.py").write_text("import time; time.sleep(60)")
+    env = {
+        **os.environ,
+        "REPRO_CMDLINE": f"{sys.executable} {tmp_path / 'repro.py'}",
+        "BASELINE_LOG": str(tmp_path / "baseline.log"),
+        "FUNCTIONAL": "0",
+        "REPRO_TIMEOUT": "1",
+    }
+    detector = os.path.join(os.path.dirname(__file__), "regression_detector.py")
+    assert subprocess.call([sys.executable, detector], env=env) == TIMEOUT_EXIT_CODE
+    # git bisect run only skips on 125
+    assert (
+        subprocess.call(
+            [sys.executable, detector], env={**env, "WATCHDOG_EXIT_CODE": "125"}
+        )
+        == 125
+    )
+
+
+def test_detector_error_pattern(tmp_path):
+    (tmp_path / "baseline.log").write_text("1.0x\n")
+    (tmp_path / "repro.py").write_text(
+        "import sys; print('torch.OutOfMemoryError: CUDA out of memory.'); sys.exit(1)"
+    )
+    env = {
+        **os.environ,
+        "REPRO_CMDLINE": f"{sys.executable} {tmp_path / 'repro.py'}",
+        "BASELINE_LOG": str(tmp_path / "baseline.log"),
+        "REPRO_WATCHDOG": "1",
+        "REPRO_ERROR_PATTERN": "known",
+    }
+    detector = os.path.join(os.path.dirname(__file__), "regression_detector.py")
+    assert (
+        subprocess.call([sys.executable, detector], env={**env, "FUNCTIONAL": "0"})
+        == ERROR_PATTERN_EXIT_CODE
+    )
+    # The failure is the regression of a functional bisect
+    assert (
+        subprocess.call([sys.executable, detector], env={**env, "FUNCTIONAL": "1"})
+        == 1
+    )
@@ -0,0 +1,123 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+from result_cache import get_env_fingerprint
+
+DETECTOR = os.path.join(os.path.dirname(__file__), "regression_detector.py")
+
+
+def run_detector(tmp_path, cmdline: str, *args, **env) -> int:
+    return subprocess.call(
+        [sys.executable, DETECTOR, *args],
+        env={
+            **os.environ,
+            "PYTORCH_SRC_DIR": str(tmp_path / "pytorch"),
+            "REPRO_CMDLINE": cmdline,
+            "BASELINE_LOG": str(tmp_path / "baseline.log"),
+            "RESULT_CACHE_DIR": str(tmp_path / "cache"),
+            "FUNCTIONAL": "0",
+            **env,
+        },
+    )
+
+
+def test_result_cache(tmp_path):
+    src_dir = tmp_path / "pytorch"
+    src_dir.mkdir()
+    subprocess.check_call(["git", "init", "-q"], cwd=src_dir)
+    subprocess.check_call(
+        [
+            "git",
+            "-c",
+            "user.name=a",
+            "-c",
+            "user.email=a@b",
+            "commit",
+            "-q",
+            "--allow-empty",
+            "-m",
+            "a",
+        ],
+        cwd=src_dir,
+    )
+
+    # The repro counts how many times it has been run
+    repro = tmp_path / "repro.py"
+    repro.write_text(
+        textwrap.dedent(
+            f"""
+            import os
+            counter = {str(tmp_path / "counter")!r}
+            runs = int(open(counter).read()) if os.path.exists(counter) else 0
+            open(counter, "w").write(str(runs + 1))
+            print("2.0x")
+            """
+        )
+    )
+    (tmp_path / "baseline.log").write_text("1.0x\n")
+    cmdline = f"{sys.executable} {repro}"
+
+    def runs() -> int:
+        return int((tmp_path / "counter").read_text())
+
+    assert run_detector(tmp_path, cmdline) == 1
+    assert runs() == 1
+    # The cached result gives the same verdict without running the repro
+    assert run_detector(tmp_path, cmdline) == 1
+    assert runs() == 1
+    # The verdict is computed again with the new baseline
+    (tmp_path / "baseline.log").write_text("2.0x\n")
+    assert run_detector(tmp_path, cmdline) == 0
+    assert runs() == 1
+
+    assert run_detector(tmp_path, cmdline, "--invalidate-cache") == 0
+    assert runs() == 2
+    assert run_detector(tmp_path, cmdline, RESULT_CACHE_INVALIDATE="1") == 0
+    assert runs() == 3
+    # A different environment is a different entry
+    assert run_detector(tmp_path, cmdline, TORCHINDUCTOR_MAX_AUTOTUNE="1") == 0
+    assert runs() == 4
+    assert len(os.listdir(tmp_path / "cache")) == 2
+
+    # The baseline samples are cached too
+    baseline = tmp_path / "baseline.json"
+    for _ in range(2):
+        assert (
+            run_detector(
+                tmp_path,
+                cmdline,
+                "--record-baseline",
+                str(baseline),
+                REPRO_SAMPLES="3",
+            )
+            == 0
+        )
+        # One cached sample is not enough, so the repro is run three more times
+        assert runs() == 7
+        assert json.loads(baseline.read_text())["samples"] == {"value": [2.0, 2.0, 2.0]}
+
+    # The cached result is reused with as many samples, not with more
+    assert (
+        run_detector(
+            tmp_path, cmdline, REPRO_SAMPLES="3", BASELINE_SAMPLES=str(baseline)
+        )
+        == 0
+    )
+    assert runs() == 7
+    assert (
+        run_detector(
+            tmp_path, cmdline, REPRO_SAMPLES="5", BASELINE_SAMPLES=str(baseline)
+        )
+        == 0
+    )
+    assert runs() >= 10
+
+
+def test_env_fingerprint():
+    # The pinning of the repro changes its result, when to measure doesn't
+    assert get_env_fingerprint(
+        {"REPRO_CPUS": "8-15", "REPRO_MAX_LOAD": "1", "TORCH_LOGS": "+dynamo"}
+    ) == {"REPRO_CPUS": "8-15", "TORCH_LOGS": "+dynamo"}
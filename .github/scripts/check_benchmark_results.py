@@ -1,13 +1,12 @@
 #!/usr/bin/env python3
 
-import glob
-import json
 import os
 import sys
 from argparse import Action, ArgumentParser, Namespace
 from logging import info, warning
 from typing import Any, Dict, List, Optional
-from json.decoder import JSONDecodeError
+
+from benchmark_results import load_benchmark_results, write_parse_cache
 
 
 class ValidateDir(Action):
@@ -35,6 +34,11 @@ def parse_args() -> Any:
         action=ValidateDir,
         help="the directory with the benchmark results",
     )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        help="the number of processes used to parse the benchmark results, default to the number of CPUs",
+    )
 
     parser.add_argument(
         "--strict",
@@ -42,88 +46,78 @@ def parse_args() -> Any:
         default=False,
         help="exit with code 1 when all benchmark results are zeroed",
     )
+    parser.add_argument(
+        "--parse-cache",
+        type=str,
+        help="write the parsed benchmark results to this file to be reused by upload_benchmark_results.py",
+    )
 
     return parser.parse_args()
 
 
-def read_benchmark_results(filepath: str) -> List[Dict[str, Any]]:
-    results = []
-    with open(filepath) as f:
-        try:
-            r = json.load(f)
-            # Handle the JSONEachRow case where there is only one record in the
-            # JSON file, it can still be loaded normally, but will need to be
-            # added into the list of benchmark results with the length of 1
-            if isinstance(r, dict):
-                results.append(r)
-            elif isinstance(r, list):
-                results = r
-
-        except JSONDecodeError:
-            f.seek(0)
-
-            # Try again in ClickHouse JSONEachRow format
-            for line in f:
-                try:
-                    r = json.loads(line)
-                    # Each row needs to be a dictionary in JSON format or a list
-                    if isinstance(r, dict):
-                        results.append(r)
-                    elif isinstance(r, list):
-                        results.extend(r)
-                    else:
-                        warning(f"Not a JSON dict or list {line}, skipping")
-                        continue
-
-                except JSONDecodeError:
-                    warning(f"Invalid JSON {line}, skipping")
-
-    return results
-
-
-def check_benchmark_results(benchmark_results_dir: str, strict: bool = False) -> Dict[str, List]:
-    all_results = {}
-
-    for file in glob.glob(f"{benchmark_results_dir}/*.json"):
-        filename = os.path.basename(file)
-        results = read_benchmark_results(file)
-
-        if not results or type(results) is not list:
-            warning(f"{file} is empty")
-            continue
-
-        values = []
-        # Check the benchmark values
-        for r in results:
-            if (
-                "benchmark" not in r
-                or "metric" not in r
-                or "benchmark_values" not in r["metric"]
-                or type(r["metric"]["benchmark_values"]) is not list
-            ):
-                continue
-            values.extend(r["metric"]["benchmark_values"])
-
-        if not values:
-            warning(f"Find no PyTorch benchmark results in {file}")
+def check_results(file: str, results: Any, strict: bool = False) -> bool:
+    """
+    Check that the file has some benchmark values and that they are not all
+    zeroed, which is how a failed vLLM run looks like
+    """
+    filename = os.path.basename(file)
+
+    if not results or type(results) is not list:
+        warning(f"{file} is empty")
+        return False
+
+    values = []
+    # Check the benchmark values
+    for r in results:
+        if (
+            "benchmark" not in r
+            or "metric" not in r
+            or "benchmark_values" not in r["metric"]
+            or type(r["metric"]["benchmark_values"]) is not list
+        ):
             continue
+        values.extend(r["metric"]["benchmark_values"])
+
+    if not values:
+        warning(f"Find no PyTorch benchmark results in {file}")
+        return False
+
+    # After https://github.com/vllm-project/vllm/pull/30975, vLLM bench serve now
+    # returns the value of 0 even when it fails. We need to check for this and
+    # fail the benchmark job accordingly instead of uploading 0 to the database
+    if all(v == 0 for v in values):
+        # Compilation time is expected to be 0 in eager mode, so allow it
+        lower_filename = filename.lower()
+        if "eager" in lower_filename and "compilation" in lower_filename:
+            info(f"Accepting zeroed compilation results in eager mode for {file}")
+        else:
+            warning(f"All PyTorch benchmark results in {file} are zeroed")
+            if strict:
+                sys.exit(1)
+        return False
+
+    return True
+
+
+def check_benchmark_results(
+    benchmark_results_dir: str,
+    strict: bool = False,
+    max_workers: Optional[int] = None,
+    parse_cache: Optional[str] = None,
+) -> Dict[str, List]:
+    all_results = {}
 
-        # After https://github.com/vllm-project/vllm/pull/30975, vLLM bench serve now
-        # returns the value of 0 even when it fails. We need to check for this and
-        # fail the benchmark job accordingly instead of uploading 0 to the database
-        if all(v == 0 for v in values):
-            # Compilation time is expected to be 0 in eager mode, so allow it
-            lower_filename = filename.lower()
-            if "eager" in lower_filename and "compilation" in lower_filename:
-                info(f"Accepting zeroed compilation results in eager mode for {file}")
-            else:
-                warning(f"All PyTorch benchmark results in {file} are zeroed")
-                if strict:
-                    sys.exit(1)
+    benchmark_results = load_benchmark_results(benchmark_results_dir, max_workers)
+    for file, results in benchmark_results.items():
+        if not check_results(file, results, strict):
             continue
 
         info(f"Loading benchmark results from {file}")
-        all_results[filename] = r
+        all_results[os.path.basename(file)] = results[-1]
+
+    # Only write the cache after all the results have been validated
+    if parse_cache:
+        write_parse_cache(parse_cache, benchmark_results)
 
     return all_results
 
@@ -132,7 +126,12 @@ def main() -> None:
     args = parse_args()
 
     # Extract and aggregate the benchmark results
-    if not check_benchmark_results(args.benchmark_results, strict=args.strict):
+    if not check_benchmark_results(
+        args.benchmark_results,
+        strict=args.strict,
+        max_workers=args.max_workers,
+        parse_cache=args.parse_cache,
+    ):
         warning(f"Find no benchmark results in {args.benchmark_results}")
         sys.exit(1)
 
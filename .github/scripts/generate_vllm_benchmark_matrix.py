@@ -1,13 +1,23 @@
 #!/usr/bin/env python
 
-import glob
-import json
+import datetime
 import logging
 import os
 from argparse import Action, ArgumentParser, Namespace
-from logging import warning
-from typing import Any, Dict, List, Optional
-
+from logging import info, warning
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from benchmark_budget import (
+    DEFAULT_MAX_STALENESS,
+    load_rotation_state,
+    parse_budget,
+    save_rotation_state,
+    select_within_budget,
+)
+from benchmark_history import get_duration, load_durations
+from vllm_benchmark_diff import get_affected_models
+from vllm_benchmark_index import get_platform_tests, load_index
+from vllm_benchmark_placement import place_model
 
 logging.basicConfig(level=logging.INFO)
 # Those are H100 runners from https://github.com/meta-pytorch/pytorch-gha-infra/blob/main/multi-tenant/inventory/manual_inventory
@@ -63,14 +73,15 @@ RUNNER_TO_PLATFORM_MAPPING = {
     "linux.hpu.gaudi3.8": "hpu",
 }
 
-# All the different names vLLM uses to refer to their benchmark configs
-VLLM_BENCHMARK_CONFIGS_PARAMETER = set(
-    [
-        "parameters",
-        "server_parameters",
-        "common_parameters",
-    ]
-)
+# The runners in use, in the order of RUNNER_TO_PLATFORM_MAPPING
+ACTIVE_RUNNERS = [
+    runner
+    for runner in RUNNER_TO_PLATFORM_MAPPING
+    if any(runner in tp_runners for tp_runners in TP_TO_RUNNER_MAPPING.values())
+]
+# How to place the benchmarks on the runners, either by the tensor parallel size
+# with TP_TO_RUNNER_MAPPING, or on the smallest runner whose memory fits them
+PLACEMENTS = ["tp", "memory"]
 
 # Model and runner skip logic, for example, just need to run DeepSeek on b200
 # and not h100. This also serves as a knob to tune CI behavior. TODO (huydhn):
@@ -163,6 +174,31 @@ PLATFORM_SKIPS = {
 # Lower case all the model names for consistency
 PLATFORM_SKIPS = {k.lower(): v for k, v in PLATFORM_SKIPS.items()}
 
+# When packing several models into the same job, the job needs to finish before
+# the 6-hour limit of GitHub Actions with some room to spare, in minutes
+DEFAULT_MAX_JOB_DURATION = 300
+# Every job pays for pulling the docker image, checking out vLLM, and mounting
+# the HF cache regardless of how many models it runs, in minutes
+DEFAULT_JOB_OVERHEAD = 15
+# The duration of the models that have never run on the runner, in minutes
+DEFAULT_MODEL_DURATION = 60
+# The declared duration of each test of the models that have never run on the
+# runner when estimating the cost of a job for the budget, in minutes
+DEFAULT_TEST_DURATION = 10
+
+# The priority of the models when the jobs don't all fit in the budget, the
+# models without one have priority 1. This is a knob like PLATFORM_SKIPS
+MODEL_PRIORITIES = {
+    "meta-llama/Llama-3.1-8B-Instruct": 3,
+    "meta-llama/Meta-Llama-3.1-8B-Instruct": 3,
+    "Qwen/Qwen3-8B": 3,
+    "openai/gpt-oss-20b": 3,
+    "openai/gpt-oss-120b": 2,
+    "deepseek-ai/DeepSeek-R1": 2,
+    "meta-llama/Llama-4-Maverick-17B-128E-Instruct-FP8": 2,
+}
+MODEL_PRIORITIES = {k.lower(): v for k, v in MODEL_PRIORITIES.items()}
+
 
 class ValidateDir(Action):
     def __call__(
@@ -203,8 +239,85 @@ def parse_args() -> Any:
         help="the comma-separated list of runners to run the benchmark",
         required=True,
     )
+    parser.add_argument(
+        "--placement",
+        type=str,
+        choices=PLACEMENTS,
+        default="tp",
+        help="place the benchmarks by their tensor parallel size, or on the smallest runner that fits them in memory, see vllm_benchmark_placement.py",
+    )
+    parser.add_argument(
+        "--base-ref",
+        type=str,
+        default="",
+        help="only benchmark the models whose configs have changed since this git ref, e.g. origin/main, when --models is not set",
+    )
+    parser.add_argument(
+        "--budget",
+        type=str,
+        default="",
+        help="the runner-hours to spend, either on every platform, e.g. 40, or per platform, e.g. cuda=40,rocm=20",
+    )
+    parser.add_argument(
+        "--rotation-state",
+        type=str,
+        default="",
+        help="the JSON file with when each job last ran, see benchmark_budget.py, required with --budget. The runners are ephemeral, so the workflow needs to restore and save it, e.g. with actions/cache or as an artifact",
+    )
+    parser.add_argument(
+        "--max-staleness",
+        type=int,
+        default=DEFAULT_MAX_STALENESS,
+        help="run every job at least once in this many days when there is a budget",
+    )
+    parser.add_argument(
+        "--test-duration",
+        type=float,
+        default=DEFAULT_TEST_DURATION,
+        help="the duration in minutes of each test of the models without any history, to estimate their cost",
+    )
+    parser.add_argument(
+        "--date",
+        type=datetime.date.fromisoformat,
+        default=datetime.datetime.now(datetime.timezone.utc).date(),
+        help="the date of the run for the rotation, default to today",
+    )
+    parser.add_argument(
+        "--pack",
+        action="store_true",
+        help="pack several models into the same job by their historical durations",
+    )
+    parser.add_argument(
+        "--history",
+        type=str,
+        default="",
+        help="the JSON or SQLite file with the durations of the past runs, see benchmark_history.py",
+    )
+    parser.add_argument(
+        "--max-job-duration",
+        type=float,
+        default=DEFAULT_MAX_JOB_DURATION,
+        help="the maximum predicted duration of a packed job in minutes",
+    )
+    parser.add_argument(
+        "--job-overhead",
+        type=float,
+        default=DEFAULT_JOB_OVERHEAD,
+        help="the setup time of a job in minutes, paid once per job",
+    )
+    parser.add_argument(
+        "--default-duration",
+        type=float,
+        default=DEFAULT_MODEL_DURATION,
+        help="the duration in minutes of the models without any history",
+    )
 
-    return parser.parse_args()
+    args = parser.parse_args()
+    # Without the state of the last runs, every run starts a new rotation and the
+    # low priority models never get their turn
+    if args.budget and not args.rotation_state:
+        parser.error("--budget requires --rotation-state")
+    return args
 
 
 def set_output(name: str, val: Any) -> None:
@@ -228,8 +341,26 @@ def set_output(name: str, val: Any) -> None:
         env.write(f"{name}={val}\n")
 
 
+def get_skipped_runners() -> Dict[str, Set[str]]:
+    """
+    Return the known runners that each model skips, a skip matches all the
+    runners that have it in their names
+    """
+    return {
+        model: set(
+            runner
+            for runner in RUNNER_TO_PLATFORM_MAPPING
+            if any(skip in runner for skip in skips)
+        )
+        for model, skips in PLATFORM_SKIPS.items()
+    }
+
+
 def generate_benchmark_matrix(
-    benchmark_configs_dir: str, models: List[str], runners: List[str]
+    benchmark_configs_dir: str,
+    models: List[str],
+    runners: List[str],
+    placement: str = "tp",
 ) -> Dict[str, Any]:
     """
     Parse all the JSON files in vLLM benchmark configs directory to get the
@@ -250,76 +381,206 @@ def generate_benchmark_matrix(
                 if r.lower() in k:
                     platforms.add(v)
 
+    # Match the runner names and the skips to the known runners once instead of
+    # for every model
+    selected_runners = set(
+        runner
+        for runner in RUNNER_TO_PLATFORM_MAPPING
+        if use_all_runners or any(r and r.lower() in runner for r in runners)
+    )
+    skipped_runners = get_skipped_runners()
+    selected_models = set(models)
+
+    index = load_index(benchmark_configs_dir)
     # Gather all possible benchmarks
     for platform in sorted(platforms):
-        selected_models = []
-        # Only need to parse serving config because it has all the models and
+        # Only need the serving configs because they have all the models and
         # their tensor_parallel_size field. The latter is used to find the runner
         # with the right capacity
-        for file in glob.glob(f"{benchmark_configs_dir}/{platform}/*serving*.json"):
-            with open(file) as f:
-                try:
-                    configs = json.load(f)
-                except json.JSONDecodeError as e:
-                    warning(f"Fail to load {file}: {e}")
-                    continue
-
-            for config in configs:
-                param = list(VLLM_BENCHMARK_CONFIGS_PARAMETER & set(config.keys()))
-                assert len(param) == 1
-
-                benchmark_config = config[param[0]]
-                if "model" not in benchmark_config:
-                    warning(f"Model name is not set in {benchmark_config}, skipping...")
+        for model, tests in get_platform_tests(index, platform).items():
+            # Only choose the selected model
+            if selected_models and model not in selected_models:
+                continue
+            tp = tests[0]["tp"]
+            assert tp in TP_TO_RUNNER_MAPPING
+
+            if placement == "memory":
+                runner, reasons = place_model(
+                    model,
+                    tests,
+                    [
+                        runner
+                        for runner in ACTIVE_RUNNERS
+                        if RUNNER_TO_PLATFORM_MAPPING[runner] == platform
+                        and runner in selected_runners
+                    ],
+                    skipped_runners.get(model),
+                )
+                info("\n".join(reasons))
+                model_runners = [runner] if runner else []
+            else:
+                model_runners = TP_TO_RUNNER_MAPPING[tp]
+
+            for runner in model_runners:
+                # Wrong platform
+                if RUNNER_TO_PLATFORM_MAPPING.get(runner) != platform:
                     continue
-                model = benchmark_config["model"].lower()
-
-                # Dedup
-                if model in selected_models:
+                if runner not in selected_runners:
                     continue
-                # and only choose the selected model
-                if models and model not in models:
+                # Check the skip logic
+                if runner in skipped_runners.get(model, ()):
                     continue
-                selected_models.append(model)
-
-                if "tensor_parallel_size" in benchmark_config:
-                    tp = benchmark_config["tensor_parallel_size"]
-                elif "tp" in benchmark_config:
-                    tp = benchmark_config["tp"]
-                else:
-                    tp = 8
-                assert tp in TP_TO_RUNNER_MAPPING
-
-                for runner in TP_TO_RUNNER_MAPPING[tp]:
-                    # Wrong platform
-                    if (
-                        runner not in RUNNER_TO_PLATFORM_MAPPING
-                        or RUNNER_TO_PLATFORM_MAPPING[runner] != platform
-                    ):
-                        continue
-
-                    found_runner = any([r and r.lower() in runner for r in runners])
-                    if not found_runner and not use_all_runners:
-                        continue
-
-                    # Check the skip logic
-                    if model in PLATFORM_SKIPS and any(
-                        [r in runner for r in PLATFORM_SKIPS[model]]
-                    ):
-                        continue
-
-                    benchmark_matrix["include"].append(
-                        {
-                            "runner": runner,
-                            # I opt to return a comma-separated list of models here
-                            # so that we could run multiple models on the same runner
-                            "models": model,
-                        }
-                    )
+
+                benchmark_matrix["include"].append(
+                    {
+                        "runner": runner,
+                        # I opt to return a comma-separated list of models here
+                        # so that we could run multiple models on the same runner
+                        "models": model,
+                    }
+                )
 
     return benchmark_matrix
 
 
+def filter_benchmark_matrix(
+    benchmark_matrix: Dict[str, Any], affected: Set[Tuple[str, str]]
+) -> Dict[str, Any]:
+    """
+    Keep only the entries of the affected (model, platform) pairs
+    """
+    return {
+        "include": [
+            entry
+            for entry in benchmark_matrix["include"]
+            if (entry["models"], RUNNER_TO_PLATFORM_MAPPING[entry["runner"]])
+            in affected
+        ],
+    }
+
+
+def get_test_counts(benchmark_configs_dir: str) -> Dict[Tuple[str, str], int]:
+    """
+    Return the number of tests of all types of each platform and model
+    """
+    index = load_index(benchmark_configs_dir)
+    platforms = set(record["platform"] for record in index["files"].values())
+    return {
+        (platform, model): len(tests)
+        for platform in platforms
+        for model, tests in get_platform_tests(index, platform, "").items()
+    }
+
+
+def estimate_costs(
+    benchmark_matrix: Dict[str, Any],
+    durations: Dict[Tuple[str, str], float],
+    test_counts: Dict[Tuple[str, str], int],
+    job_overhead: float = DEFAULT_JOB_OVERHEAD,
+    test_duration: float = DEFAULT_TEST_DURATION,
+) -> Dict[str, Any]:
+    """
+    Attach the estimated cost in runner-hours to each entry, from the historical
+    duration of its models, or from the number of their tests otherwise
+    """
+    entries = []
+    for entry in benchmark_matrix["include"]:
+        runner = entry["runner"]
+        platform = RUNNER_TO_PLATFORM_MAPPING[runner]
+        minutes = job_overhead
+        for model in entry["models"].split(","):
+            duration = get_duration(
+                durations, runner, model, RUNNER_TO_PLATFORM_MAPPING
+            )
+            if duration is not None:
+                minutes += duration / 60
+            else:
+                minutes += test_counts.get((platform, model), 1) * test_duration
+        entries.append({**entry, "cost": round(minutes / 60, 2)})
+    return {"include": entries}
+
+
+def pack_models(
+    durations: List[Tuple[str, float]], max_job_duration: float, job_overhead: float
+) -> List[Tuple[List[str], float]]:
+    """
+    Pack the models of a runner into as few jobs as possible that each finish
+    within max_job_duration, then balance the models across that many jobs to
+    minimize the longest one. Return the models and the predicted duration of
+    each job, the longest first
+    """
+    # The longest model first, and by name for a deterministic order
+    durations = sorted(durations, key=lambda item: (-item[1], item[0]))
+
+    # First fit decreasing gives the fewest jobs
+    first_fit: List[Tuple[List[str], float]] = []
+    for model, duration in durations:
+        for i, (job_models, job_duration) in enumerate(first_fit):
+            if job_duration + duration <= max_job_duration:
+                first_fit[i] = (job_models + [model], job_duration + duration)
+                break
+        else:
+            if job_overhead + duration > max_job_duration:
+                warning(
+                    f"{model} is predicted to take {duration:.0f} minutes, longer than the maximum job duration"
+                )
+            first_fit.append(([model], job_overhead + duration))
+
+    # Then the longest processing time first rule over the same number of jobs
+    # balances them, keep it if it doesn't go over the maximum job duration
+    balanced: List[Tuple[List[str], float]] = [([], job_overhead) for _ in first_fit]
+    for model, duration in durations:
+        i = min(range(len(balanced)), key=lambda j: (balanced[j][1], j))
+        balanced[i] = (balanced[i][0] + [model], balanced[i][1] + duration)
+
+    jobs = first_fit
+    if max(d for _, d in balanced) < max(d for _, d in first_fit) and all(
+        d <= max_job_duration or len(m) == 1 for m, d in balanced
+    ):
+        jobs = balanced
+    return sorted(jobs, key=lambda job: (-job[1], job[0]))
+
+
+def pack_benchmark_matrix(
+    benchmark_matrix: Dict[str, Any],
+    durations: Dict[Tuple[str, str], float],
+    max_job_duration: float = DEFAULT_MAX_JOB_DURATION,
+    job_overhead: float = DEFAULT_JOB_OVERHEAD,
+    default_duration: float = DEFAULT_MODEL_DURATION,
+) -> Dict[str, Any]:
+    """
+    Pack the models of each runner into jobs, a runner is only picked for the
+    models with the right tensor parallel size, so all its models fit on it. Each
+    job has its predicted duration in minutes
+    """
+    models_by_runner: Dict[str, List[Tuple[str, float]]] = {}
+    for entry in benchmark_matrix["include"]:
+        runner = entry["runner"]
+        for model in entry["models"].split(","):
+            duration = get_duration(
+                durations, runner, model, RUNNER_TO_PLATFORM_MAPPING
+            )
+            models_by_runner.setdefault(runner, []).append(
+                (model, default_duration if duration is None else duration / 60)
+            )
+
+    packed_matrix: Dict[str, Any] = {
+        "include": [],
+    }
+    for runner, runner_models in models_by_runner.items():
+        for job_models, job_duration in pack_models(
+            runner_models, max_job_duration, job_overhead
+        ):
+            packed_matrix["include"].append(
+                {
+                    "runner": runner,
+                    "models": ",".join(job_models),
+                    "predicted_duration": round(job_duration),
+                }
+            )
+    return packed_matrix
+
+
 def main() -> None:
     args = parse_args()
     models = [m.strip().lower() for m in args.models.split(",") if m.strip()]
@@ -328,9 +589,61 @@ def main() -> None:
         args.benchmark_configs_dir,
         models,
         runners,
+        args.placement,
     )
+    if args.base_ref and not models:
+        affected = get_affected_models(args.benchmark_configs_dir, args.base_ref)
+        if affected is not None:
+            jobs = len(benchmark_matrix["include"])
+            benchmark_matrix = filter_benchmark_matrix(benchmark_matrix, affected)
+            info(
+                f"Only {len(benchmark_matrix['include'])} out of {jobs} jobs are "
+                f"affected by the changes since {args.base_ref}"
+            )
+    durations = load_durations(args.history) if args.history else {}
+    if args.budget:
+        benchmark_matrix = estimate_costs(
+            benchmark_matrix,
+            durations,
+            get_test_counts(args.benchmark_configs_dir),
+            args.job_overhead,
+            args.test_duration,
+        )
+        state = load_rotation_state(args.rotation_state)
+        selected, dropped = select_within_budget(
+            benchmark_matrix["include"],
+            parse_budget(args.budget),
+            lambda entry: RUNNER_TO_PLATFORM_MAPPING[entry["runner"]],
+            MODEL_PRIORITIES,
+            state,
+            args.date,
+            args.max_staleness,
+        )
+        for entry in dropped:
+            info(f"Skip {entry['models']} on {entry['runner']} ({entry['cost']}h) today")
+        benchmark_matrix = {"include": selected}
+        save_rotation_state(args.rotation_state, state)
+    if args.pack:
+        jobs = len(benchmark_matrix["include"])
+        benchmark_matrix = pack_benchmark_matrix(
+            benchmark_matrix,
+            durations,
+            args.max_job_duration,
+            args.job_overhead,
+            args.default_duration,
+        )
+        predicted = [e["predicted_duration"] for e in benchmark_matrix["include"]]
+        info(
+            f"Pack {jobs} jobs into {len(predicted)}, the longest job is predicted to take "
+            f"{max(predicted, default=0)} minutes, {sum(predicted)} runner minutes in total"
+        )
+        if args.budget:
+            for entry in benchmark_matrix["include"]:
+                entry["cost"] = round(entry["predicted_duration"] / 60, 2)
     print(benchmark_matrix)
     set_output("benchmark_matrix", benchmark_matrix)
+    # GitHub doesn't accept an empty matrix, e.g. when a change affects no model
+    set_output("has_jobs", "true" if benchmark_matrix["include"] else "false")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare the size and the time to serialize and compress the regular v3 rows vs
+the compact encoding on a synthetic serving results directory
+
+Example usage:
+
+python .github/scripts/microbenchmarks/bench_compact_format.py --files 100 --records 200
+"""
+
+import gzip
+import io
+import os
+import sys
+import time
+from argparse import ArgumentParser
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from bench_load_benchmark_results import fake_records  # noqa: E402
+from upload_benchmark_results import (  # noqa: E402
+    aggregate,
+    aggregate_compact,
+    expand_compact,
+    get_benchmark_metadata,
+    get_runner_info,
+    write_json_each_row,
+)
+
+
+def parse_args() -> Any:
+    parser = ArgumentParser("Benchmark the compact upload format")
+    parser.add_argument("--files", type=int, default=100)
+    parser.add_argument("--records", type=int, default=200)
+    return parser.parse_args()
+
+
+def serialize(aggregated_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    raw = io.BytesIO()
+    write_json_each_row(raw, aggregated_results)
+    compressed = gzip.compress(raw.getvalue())
+    return {
+        "raw": len(raw.getvalue()),
+        "gzip": len(compressed),
+        "time": time.perf_counter() - start,
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    benchmark_results = {
+        f"serving_{i}.json": fake_records(i, args.records) for i in range(args.files)
+    }
+    metadata = get_benchmark_metadata(
+        "vllm-project/vllm", "main", "0" * 40, int(time.time()), "vLLM benchmark"
+    )
+    runner = get_runner_info("cuda", "NVIDIA H100 80GB HBM3")
+
+    rows = aggregate(metadata, runner, benchmark_results)
+    compact = aggregate_compact(metadata, runner, benchmark_results)
+    for name, records in [("v3", rows), ("compact", compact)]:
+        r = serialize(records)
+        print(
+            f"{name}: {r['raw'] / 1024 / 1024:.2f}MB raw, {r['gzip'] / 1024:.1f}KB gzip, {r['time']:.3f}s"
+        )
+
+    start = time.perf_counter()
+    assert list(expand_compact(compact)) == rows
+    print(f"expand compact: {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compare how long it takes to find the branch of a detached HEAD by walking the
+history of every branch vs using the commit to branch index, on a synthetic local
+git repo with many branches
+
+Example usage:
+
+python .github/scripts/microbenchmarks/bench_git_metadata.py --commits 5000 --branches 500
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Any
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import upload_benchmark_results  # noqa: E402
+from upload_benchmark_results import get_git_metadata  # noqa: E402
+
+
+def parse_args() -> Any:
+    parser = ArgumentParser("Benchmark get_git_metadata on a detached HEAD")
+    parser.add_argument("--commits", type=int, default=5000)
+    parser.add_argument("--branches", type=int, default=500)
+    parser.add_argument("--commits-per-branch", type=int, default=3)
+    return parser.parse_args()
+
+
+def create_repo(repo_dir: str, commits: int, branches: int, commits_per_branch: int) -> str:
+    """
+    Create the repo with git fast-import, which is much faster than committing one
+    by one. Return the SHA of the commit in the middle of main that is going to be
+    checked out as detached HEAD
+    """
+    stream = []
+    mark = 0
+    main_marks = []
+    for i in range(commits):
+        mark += 1
+        message = f"main commit {i}"
+        stream.append(
+            f"commit refs/heads/main\nmark :{mark}\n"
+            f"committer Bench <bench@example.com> {1700000000 + i} +0000\n"
+            f"data {len(message)}\n{message}\n"
+        )
+        if main_marks:
+            stream.append(f"from :{main_marks[-1]}\n")
+        stream.append("\n")
+        main_marks.append(mark)
+
+    # Branches fork from the first half of main, so none of them contains the
+    # detached HEAD and the whole history of all of them needs to be walked
+    for b in range(branches):
+        parent = main_marks[b % (commits // 2)]
+        for c in range(commits_per_branch):
+            mark += 1
+            message = f"branch {b} commit {c}"
+            stream.append(
+                f"commit refs/heads/feature-{b:05d}\nmark :{mark}\n"
+                f"committer Bench <bench@example.com> {1700000000 + commits + b * commits_per_branch + c} +0000\n"
+                f"data {len(message)}\n{message}\nfrom :{parent}\n\n"
+            )
+            parent = mark
+
+    subprocess.check_call(["git", "init", "-q", "-b", "main", repo_dir])
+    subprocess.run(
+        ["git", "fast-import", "--quiet"],
+        cwd=repo_dir,
+        input="".join(stream).encode(),
+        check=True,
+    )
+    subprocess.check_call(
+        ["git", "remote", "add", "origin", "https://github.com/example/bench.git"],
+        cwd=repo_dir,
+    )
+    head = subprocess.check_output(
+        ["git", "rev-parse", f"main~{commits // 2}"], cwd=repo_dir, text=True
+    ).strip()
+    subprocess.check_call(["git", "checkout", "-q", "--detach", head], cwd=repo_dir)
+    return head
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        repo_dir = os.path.join(tmpdir, "repo")
+        upload_benchmark_results.CACHE_DIR = os.path.join(tmpdir, "cache")
+        create_repo(repo_dir, args.commits, args.branches, args.commits_per_branch)
+
+        for name, depth in [
+            ("walk", 0),
+            ("index (cold)", upload_benchmark_results.BRANCH_SEARCH_DEPTH),
+            ("index (cached)", upload_benchmark_results.BRANCH_SEARCH_DEPTH),
+        ]:
+            start = time.perf_counter()
+            _, branch, _, _ = get_git_metadata(repo_dir, depth)
+            print(f"{name}: {branch} in {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Compare the time to load a synthetic directory of benchmark results serially with
+stdlib json vs with the shared loader in benchmark_results.py
+
+Example usage:
+
+python .github/scripts/microbenchmarks/bench_load_benchmark_results.py --files 500 --records 200
+"""
+
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import benchmark_results  # noqa: E402
+from benchmark_results import load_benchmark_results  # noqa: E402
+
+
+METRICS = [
+    "median_ttft_ms",
+    "p99_ttft_ms",
+    "median_tpot_ms",
+    "p99_tpot_ms",
+    "median_itl_ms",
+    "p99_itl_ms",
+    "requests_per_second",
+    "tokens_per_second",
+]
+
+
+def parse_args() -> Any:
+    parser = ArgumentParser("Benchmark loading benchmark results")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    return parser.parse_args()
+
+
+def fake_records(file_index: int, n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "benchmark": {
+                "name": "vLLM benchmark",
+                "extra_info": {
+                    "args": {
+                        "model": f"org/model-{file_index % 20}",
+                        "tensor_parallel_size": 1 + file_index % 4,
+                        "num_prompts": 200,
+                        "request_rate": i % 16,
+                    },
+                    "compilation_config": {"mode": 3, "cudagraph_mode": "FULL"},
+                },
+            },
+            "model": {"name": f"org/model-{file_index % 20}", "origins": ["hf"]},
+            "metric": {
+                "name": METRICS[i % len(METRICS)],
+                "benchmark_values": [i * 1.25 + file_index],
+                "extra_info": {"test_name": f"serving_{file_index}_{i}"},
+            },
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_read_benchmark_results(filepath: str) -> List[Dict[str, Any]]:
+    # What upload_benchmark_results and check_benchmark_results used to do
+    results = []
+    with open(filepath) as f:
+        try:
+            r = json.load(f)
+            if isinstance(r, dict):
+                results.append(r)
+            elif isinstance(r, list):
+                results = r
+
+        except json.JSONDecodeError:
+            f.seek(0)
+
+            for line in f:
+                try:
+                    r = json.loads(line)
+                    if isinstance(r, dict):
+                        results.append(r)
+                    elif isinstance(r, list):
+                        results.extend(r)
+                except json.JSONDecodeError:
+                    pass
+
+    return results
+
+
+def legacy_load(benchmark_results_dir: str) -> Dict[str, List]:
+    return {
+        file: legacy_read_benchmark_results(file)
+        for file in glob.glob(f"{benchmark_results_dir}/*.json")
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for i in range(args.files):
+            records = fake_records(i, args.records)
+            with open(os.path.join(tmpdir, f"serving_{i}.json"), "w") as f:
+                # Half of the files are in JSONEachRow format
+                if i % 2:
+                    f.write("\n".join(json.dumps(r) for r in records))
+                else:
+                    json.dump(records, f, indent=4)
+
+        orjson_available = benchmark_results.orjson_available
+        for name, load in [
+            ("legacy serial json", lambda: legacy_load(tmpdir)),
+            ("serial", lambda: load_benchmark_results(tmpdir, max_workers=1)),
+            ("parallel", lambda: load_benchmark_results(tmpdir)),
+        ]:
+            for use_orjson in sorted(set([False, orjson_available])):
+                if name.startswith("legacy") and use_orjson:
+                    continue
+                benchmark_results.orjson_available = use_orjson
+                timings = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    load()
+                    timings.append(time.perf_counter() - start)
+                suffix = " (orjson)" if use_orjson else ""
+                print(f"{name}{suffix}: {min(timings):.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Measure the startup time and the peak memory of importing upload_benchmark_results
+and probing the runner info, with and without the eager torch import that it used
+to do at module load
+
+Example usage:
+
+python .github/scripts/microbenchmarks/bench_runner_info.py --device-name cuda --device-type H100
+"""
+
+import importlib.util
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Any, Tuple
+
+SCRIPTS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def parse_args() -> Any:
+    parser = ArgumentParser("Benchmark the runner info probe")
+    parser.add_argument("--device-name", type=str, default="cpu")
+    parser.add_argument("--device-type", type=str, default="cpu")
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def run(code: str, env: dict) -> Tuple[float, int]:
+    """
+    Return the wall time and the peak RSS in MB of running the code in a new
+    Python process
+    """
+    start = time.perf_counter()
+    pid = subprocess.Popen([sys.executable, "-c", code], cwd=SCRIPTS_DIR, env=env).pid
+    _, _, rusage = os.wait4(pid, 0)
+    return time.perf_counter() - start, rusage.ru_maxrss // 1024
+
+
+def main() -> None:
+    args = parse_args()
+    probe = (
+        "import upload_benchmark_results; "
+        f"upload_benchmark_results.get_runner_info({args.device_name!r}, {args.device_type!r})"
+    )
+    eager_torch = "try:\n    import torch\nexcept ImportError:\n    pass\n"
+    if importlib.util.find_spec("torch") is None:
+        print("torch is not installed, the eager torch import costs nothing here")
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = {**os.environ, "BENCHMARK_UPLOAD_CACHE_DIR": tmpdir}
+        for name, code, clear_cache in [
+            # The cost of the rest of the module, e.g. boto3, without any probe
+            ("module import only", "import upload_benchmark_results", True),
+            ("eager torch import (before)", eager_torch + probe, True),
+            ("lazy probe, cold cache", probe, True),
+            ("lazy probe, warm cache", probe, False),
+        ]:
+            timings = []
+            for _ in range(args.repeat):
+                if clear_cache:
+                    for f in os.listdir(tmpdir):
+                        os.remove(os.path.join(tmpdir, f))
+                timings.append(run(code, env))
+            wall_time, rss = min(timings)
+            print(f"{name}: {wall_time:.3f}s, peak RSS {rss}MB")
+
+
+if __name__ == "__main__":
+    main()
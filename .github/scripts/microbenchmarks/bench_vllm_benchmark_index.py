@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Measure how long it takes to generate the vLLM benchmark matrix and to setup the
+configs of one job as the config tree grows, with a cold config index, i.e. all
+the files are parsed as before the index, a warm one, one after a fresh checkout
+that touches all the files, and one after changing a single file
+
+Example usage:
+
+python .github/scripts/microbenchmarks/bench_vllm_benchmark_index.py --tests 100,1000,5000
+"""
+
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Any, Callable, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import vllm_benchmark_index  # noqa: E402
+from generate_vllm_benchmark_matrix import (  # noqa: E402
+    generate_benchmark_matrix,
+    PLATFORM_SKIPS,
+    RUNNER_TO_PLATFORM_MAPPING,
+)
+from setup_vllm_benchmark import setup_benchmark_configs  # noqa: E402
+
+TEST_TYPES = ["serving", "latency", "throughput"]
+
+
+def parse_args() -> Any:
+    parser = ArgumentParser("Benchmark the vLLM benchmark config index")
+    parser.add_argument(
+        "--tests",
+        type=str,
+        default="100,1000,5000",
+        help="the comma-separated numbers of tests in the config tree",
+    )
+    parser.add_argument("--tests-per-file", type=int, default=50)
+    parser.add_argument("--models", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    return parser.parse_args()
+
+
+def create_tree(
+    configs_dir: str, tests: int, tests_per_file: int, models: List[str]
+) -> List[str]:
+    """
+    Spread the tests over the platforms and the test types, return the files
+    """
+    rng = random.Random(tests)
+    platforms = sorted(set(RUNNER_TO_PLATFORM_MAPPING.values()))
+    files = []
+    for i in range(max(1, tests // tests_per_file)):
+        platform = platforms[i % len(platforms)]
+        test_type = TEST_TYPES[(i // len(platforms)) % len(TEST_TYPES)]
+        os.makedirs(os.path.join(configs_dir, platform), exist_ok=True)
+        path = os.path.join(configs_dir, platform, f"{test_type}-tests-{i}.json")
+        # Each file covers a handful of models like the real configs
+        file_models = rng.sample(models, min(5, len(models)))
+        configs = []
+        for j in range(tests_per_file):
+            model = rng.choice(file_models)
+            configs.append(
+                {
+                    "test_name": f"{test_type}_{i}_{j}",
+                    "qps_list": [1, 4, 16, "inf"],
+                    "server_parameters": {
+                        "model": model,
+                        "tensor_parallel_size": rng.choice([1, 2, 4, 8]),
+                        "load_format": "dummy",
+                    },
+                    "client_parameters": {
+                        "model": model,
+                        "dataset_name": "random",
+                        "num_prompts": 200,
+                    },
+                }
+            )
+        with open(path, "w") as f:
+            json.dump(configs, f)
+        files.append(path)
+    return files
+
+
+def measure(fn: Callable[[], None], prepare: Callable[[], None], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        prepare()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    args = parse_args()
+    models = list(PLATFORM_SKIPS) + [f"org/model-{i}" for i in range(args.models)]
+
+    for tests in [int(t) for t in args.tests.split(",")]:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            configs_dir = os.path.join(tmpdir, "benchmarks")
+            cache_dir = os.path.join(tmpdir, "cache")
+            to_dir = os.path.join(tmpdir, "tests")
+            vllm_benchmark_index.CACHE_DIR = cache_dir
+            files = create_tree(configs_dir, tests, args.tests_per_file, models)
+
+            def generate() -> None:
+                generate_benchmark_matrix(configs_dir, [], [])
+
+            def setup() -> None:
+                shutil.rmtree(to_dir, ignore_errors=True)
+                os.makedirs(to_dir)
+                setup_benchmark_configs(configs_dir, to_dir, models[:1], "cuda")
+
+            def cold() -> None:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+            def touch_all() -> None:
+                for path in files:
+                    os.utime(path)
+
+            def change_one() -> None:
+                with open(files[0]) as f:
+                    configs = json.load(f)
+                configs[0]["qps_list"].append(random.random())
+                with open(files[0], "w") as f:
+                    json.dump(configs, f)
+
+            for name, fn in [("generate", generate), ("setup", setup)]:
+                timings = {
+                    "cold index": measure(fn, cold, args.repeat),
+                    "warm index": measure(fn, lambda: None, args.repeat),
+                    "all files touched": measure(fn, touch_all, args.repeat),
+                    "one file changed": measure(fn, change_one, args.repeat),
+                }
+                print(
+                    f"{name}, {tests} tests in {len(files)} files: "
+                    + ", ".join(f"{k} {t * 1000:.1f}ms" for k, t in timings.items())
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+
+import json
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import threading
+from logging import info
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# The number of rows inserted into the local store at a time
+SQLITE_BATCH_SIZE = 1000
+
+SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS benchmark_results (
+    id INTEGER PRIMARY KEY,
+    s3_path TEXT NOT NULL,
+    repo TEXT,
+    head_branch TEXT,
+    head_sha TEXT,
+    timestamp INTEGER,
+    workflow_id TEXT,
+    job_id TEXT,
+    benchmark_name TEXT,
+    model TEXT,
+    test_name TEXT,
+    device TEXT,
+    metric TEXT,
+    value REAL,
+    benchmark_values TEXT,
+    record TEXT
+);
+CREATE INDEX IF NOT EXISTS benchmark_results_by_test
+    ON benchmark_results (model, test_name, device, metric, timestamp);
+CREATE INDEX IF NOT EXISTS benchmark_results_by_sha
+    ON benchmark_results (head_sha, device);
+CREATE INDEX IF NOT EXISTS benchmark_results_by_s3_path
+    ON benchmark_results (s3_path);
+"""
+
+
+def batched(iterable: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class ResultSink(ABC):
+    """
+    A destination for the benchmark results. The results are given by file, i.e.
+    the same thing load() returns, and each sink decides how to aggregate and
+    batch them
+    """
+
+    name = ""
+    # The remote sinks are not written to on a dry run
+    remote = False
+
+    @abstractmethod
+    def write(
+        self,
+        s3_path: str,
+        benchmark_results: Dict[str, List[Dict[str, Any]]],
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteSink(ResultSink):
+    """
+    Keep the benchmark results in a local SQLite database indexed by model, test
+    name, device, and commit SHA, so that the history can be queried offline on
+    the runner. Writing to the same S3 path again replaces the previous results
+    like S3 does
+    """
+
+    name = "sqlite"
+
+    def __init__(
+        self,
+        db_path: str,
+        metadata: Dict[str, Any],
+        runner: Dict[str, Any],
+        batch_size: int = SQLITE_BATCH_SIZE,
+    ):
+        self.db_path = db_path
+        self.metadata = metadata
+        self.runner = runner
+        self.batch_size = batch_size
+        # The watch mode writes the files from several threads
+        self.lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(SQLITE_SCHEMA)
+
+    def _to_rows(
+        self, s3_path: str, benchmark_results: Dict[str, List[Dict[str, Any]]]
+    ) -> Iterator[tuple]:
+        for filename, results in benchmark_results.items():
+            # The benchmark results files are named after the tests
+            test_name = os.path.splitext(filename)[0]
+            for result in results:
+                benchmark_values = result.get("metric", {}).get("benchmark_values", [])
+                numeric_values = [
+                    v for v in benchmark_values if isinstance(v, (int, float))
+                ]
+                yield (
+                    s3_path,
+                    self.metadata.get("repo"),
+                    self.metadata.get("head_branch"),
+                    self.metadata.get("head_sha"),
+                    self.metadata.get("timestamp"),
+                    str(self.metadata.get("workflow_id")),
+                    str(self.metadata.get("job_id")),
+                    result.get("benchmark", {}).get("name"),
+                    result.get("model", {}).get("name"),
+                    test_name,
+                    self.runner.get("type"),
+                    result.get("metric", {}).get("name"),
+                    (
+                        sum(numeric_values) / len(numeric_values)
+                        if numeric_values
+                        else None
+                    ),
+                    json.dumps(benchmark_values),
+                    json.dumps(result),
+                )
+
+    def write(
+        self,
+        s3_path: str,
+        benchmark_results: Dict[str, List[Dict[str, Any]]],
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        count = 0
+        with self.lock, self.conn:
+            self.conn.execute(
+                "DELETE FROM benchmark_results WHERE s3_path = ?", (s3_path,)
+            )
+            for batch in batched(
+                self._to_rows(s3_path, benchmark_results), self.batch_size
+            ):
+                self.conn.executemany(
+                    """
+                    INSERT INTO benchmark_results (
+                        s3_path, repo, head_branch, head_sha, timestamp, workflow_id,
+                        job_id, benchmark_name, model, test_name, device, metric,
+                        value, benchmark_values, record
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    batch,
+                )
+                count += len(batch)
+        info(f"Write {count} benchmark results to {self.db_path}")
+
+    def get_history(
+        self,
+        model: str,
+        test_name: str,
+        device: str,
+        metric: str,
+        limit: int = 30,
+    ) -> List[Dict[str, Any]]:
+        """
+        Return the most recent values of a metric, newest first
+        """
+        cursor = self.conn.execute(
+            """
+            SELECT head_sha, timestamp, value FROM benchmark_results
+            WHERE model = ? AND test_name = ? AND device = ? AND metric = ?
+            ORDER BY timestamp DESC LIMIT ?
+            """,
+            (model, test_name, device, metric, limit),
+        )
+        return [
+            {"head_sha": head_sha, "timestamp": timestamp, "value": value}
+            for head_sha, timestamp, value in cursor.fetchall()
+        ]
+
+    def find_changes(
+        self, head_sha: str, device: str, threshold: float = 0.1, limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        Compare every metric of a commit with the median of the previous results of
+        the same test and return those that move by more than the threshold. The
+        direction is left to the caller because it depends on the metric
+        """
+        changes = []
+        for model, test_name, metric, timestamp, value in self.conn.execute(
+            """
+            SELECT model, test_name, metric, timestamp, value FROM benchmark_results
+            WHERE head_sha = ? AND device = ? AND value IS NOT NULL
+            """,
+            (head_sha, device),
+        ).fetchall():
+            history = sorted(
+                v
+                for (v,) in self.conn.execute(
+                    """
+                    SELECT value FROM benchmark_results
+                    WHERE model = ? AND test_name = ? AND device = ? AND metric = ?
+                        AND timestamp < ? AND value IS NOT NULL
+                    ORDER BY timestamp DESC LIMIT ?
+                    """,
+                    (model, test_name, device, metric, timestamp, limit),
+                ).fetchall()
+            )
+            if not history:
+                continue
+
+            baseline = history[len(history) // 2]
+            if baseline and abs(value - baseline) / abs(baseline) > threshold:
+                changes.append(
+                    {
+                        "model": model,
+                        "test_name": test_name,
+                        "metric": metric,
+                        "baseline": baseline,
+                        "value": value,
+                        "change": (value - baseline) / abs(baseline),
+                    }
+                )
+        return changes
+
+    def close(self) -> None:
+        self.conn.close()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import ctypes
+import ctypes.util
+import glob
+import os
+import select
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging import info, warning
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from benchmark_results import read_benchmark_results
+
+# From sys/inotify.h
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+
+class DirectoryWatcher:
+    """
+    Wait for something to change in a directory. This uses inotify when it's
+    available and falls back to sleeping for the whole timeout otherwise, so the
+    caller always needs to scan the directory to find out what has changed
+    """
+
+    def __init__(self, path: str):
+        self.fd: Optional[int] = None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return
+
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+                os.close(fd)
+                return
+            self.fd = fd
+        except (AttributeError, OSError, TypeError) as e:
+            warning(f"inotify is not available, polling {path} instead: {e}")
+
+    def wait(self, timeout: float) -> None:
+        if self.fd is None:
+            time.sleep(timeout)
+            return
+
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return
+
+        # Drain the events, they are not needed because the directory is scanned
+        try:
+            while os.read(self.fd, 65536):
+                pass
+        except BlockingIOError:
+            pass
+
+    def close(self) -> None:
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+
+class ResultsWatcher:
+    """
+    Watch a benchmark results directory and upload every JSON file in the background
+    as soon as it has been completely written, i.e. it has not been modified for
+    settle_seconds and it can be parsed. A file that is modified again after it
+    has been uploaded is uploaded again
+    """
+
+    def __init__(
+        self,
+        benchmark_results_dir: str,
+        is_valid: Callable[[str, List[Dict[str, Any]]], bool],
+        upload_file: Callable[[str, List[Dict[str, Any]]], None],
+        max_workers: int = 4,
+        poll_interval: float = 5.0,
+        settle_seconds: float = 2.0,
+    ):
+        self.benchmark_results_dir = benchmark_results_dir
+        self.is_valid = is_valid
+        self.upload_file = upload_file
+        self.poll_interval = poll_interval
+        self.settle_seconds = settle_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        # The size and mtime of the files when they were uploaded or found invalid
+        self.uploaded: Dict[str, Tuple[int, int]] = {}
+        self.invalid: Dict[str, Tuple[int, int]] = {}
+        self.futures: Dict[str, Future] = {}
+        # The size and mtime of the files whose last upload has failed, they are
+        # removed when the file is uploaded again successfully
+        self.failed: Dict[str, Tuple[int, int]] = {}
+        self.lock = threading.Lock()
+
+    def scan(self, final: bool = False) -> bool:
+        """
+        Submit the files that are ready to be uploaded. Return True if some files
+        are still being written
+        """
+        pending = False
+        now = time.time()
+        for file in sorted(glob.glob(f"{self.benchmark_results_dir}/*.json")):
+            try:
+                stat = os.stat(file)
+            except FileNotFoundError:
+                continue
+
+            key = (stat.st_size, stat.st_mtime_ns)
+            if self.uploaded.get(file) == key or self.invalid.get(file) == key:
+                continue
+
+            if not final and now - stat.st_mtime < self.settle_seconds:
+                pending = True
+                continue
+
+            try:
+                results = read_benchmark_results(file)
+            except FileNotFoundError:
+                continue
+            except (OSError, UnicodeDecodeError) as e:
+                warning(f"Fail to read {file}: {e}")
+                self.invalid[file] = key
+                continue
+
+            if not self.is_valid(file, results):
+                # This could be a partially written file, it will be checked again
+                # when it changes
+                self.invalid[file] = key
+                continue
+
+            with self.lock:
+                self.uploaded[file] = key
+            self.invalid.pop(file, None)
+            self.futures[file] = self.executor.submit(self._upload, file, key, results)
+
+        return pending
+
+    def _upload(
+        self, file: str, key: Tuple[int, int], results: List[Dict[str, Any]]
+    ) -> None:
+        try:
+            self.upload_file(file, results)
+            succeeded = True
+        except Exception as e:
+            warning(f"Fail to upload {file}: {e}")
+            succeeded = False
+
+        with self.lock:
+            # The outcome of an older version of the file doesn't matter anymore
+            if self.uploaded.get(file) != key:
+                return
+            if succeeded:
+                self.failed.pop(file, None)
+            else:
+                self.failed[file] = key
+
+    def run(self, stop: threading.Event) -> bool:
+        """
+        Keep uploading until the stop event is set, then upload what is left and
+        wait for all the uploads to finish. Return True if everything has been
+        uploaded successfully
+        """
+        watcher = DirectoryWatcher(self.benchmark_results_dir)
+        info(f"Watch {self.benchmark_results_dir} for new benchmark results")
+        try:
+            while not stop.is_set():
+                pending = self.scan()
+                # Come back sooner to check on the files that are being written
+                watcher.wait(
+                    min(self.poll_interval, self.settle_seconds)
+                    if pending
+                    else self.poll_interval
+                )
+        finally:
+            watcher.close()
+
+        info("Stop watching, upload the remaining benchmark results")
+        self.scan(final=True)
+        self.executor.shutdown(wait=True)
+
+        for file in self.invalid:
+            warning(f"Find no PyTorch benchmark results in {file}")
+        info(
+            f"Upload {len(self.futures) - len(self.failed)} benchmark results files, {len(self.failed)} failed"
+        )
+        return not self.failed and bool(self.futures)
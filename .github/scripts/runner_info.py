@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+from logging import info, warning
+from typing import Any, Dict, List, Optional
+from json.decoder import JSONDecodeError
+
+import psutil
+
+CACHE_DIR = os.environ.get(
+    "BENCHMARK_UPLOAD_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "pytorch-integration-testing"),
+)
+PROBE_TIMEOUT = 60
+# The GPUs that a job sees depend on these, so they are part of the cache key
+VISIBLE_DEVICES_ENV = ["CUDA_VISIBLE_DEVICES", "HIP_VISIBLE_DEVICES"]
+
+
+def run_probe(cmd: list) -> Optional[str]:
+    if not shutil.which(cmd[0]):
+        return None
+
+    try:
+        return subprocess.check_output(
+            cmd, text=True, stderr=subprocess.DEVNULL, timeout=PROBE_TIMEOUT
+        )
+    except (subprocess.SubprocessError, OSError) as e:
+        warning(f"Fail to run {' '.join(cmd)}: {e}")
+        return None
+
+
+def get_visible_devices(env_vars: List[str]) -> Optional[List[str]]:
+    """
+    Return the devices listed in the first of these environment variables that is
+    set, or None if none of them is, i.e. all the devices are visible
+    """
+    for env_var in env_vars:
+        visible_devices = os.environ.get(env_var)
+        if visible_devices is not None:
+            return [d.strip() for d in visible_devices.split(",") if d.strip()]
+    return None
+
+
+def filter_visible_devices(
+    gpus: List[Dict[str, Any]], visible_devices: Optional[List[str]]
+) -> List[Dict[str, Any]]:
+    """
+    Keep the GPUs that torch would see, in the same order, so that the count and
+    the first device are the same. A visible device is either an index or a UUID,
+    or a prefix of one. Like CUDA, the devices after an invalid one are ignored
+    """
+    if visible_devices is None:
+        return gpus
+
+    visible = []
+    for device in visible_devices:
+        if device.isdigit():
+            matches = [gpu for gpu in gpus if gpu["index"] == device]
+        else:
+            matches = [
+                gpu
+                for gpu in gpus
+                if gpu.get("uuid") and gpu["uuid"].lower().startswith(device.lower())
+            ]
+        if len(matches) != 1:
+            break
+        visible.append(matches[0])
+    return visible
+
+
+def probe_nvidia_smi() -> Optional[Dict[str, Any]]:
+    output = run_probe(
+        [
+            "nvidia-smi",
+            "--query-gpu=index,uuid,name,memory.total",
+            "--format=csv,noheader,nounits",
+        ]
+    )
+    if not output:
+        return None
+
+    try:
+        gpus = []
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            index, uuid, name, memory = [v.strip() for v in line.split(",")]
+            # The memory is in MiB
+            gpus.append(
+                {"index": index, "uuid": uuid, "name": name, "memory": float(memory)}
+            )
+    except ValueError as e:
+        warning(f"Fail to parse nvidia-smi output {output}: {e}")
+        return None
+
+    # nvidia-smi lists all the GPUs of the host whatever CUDA_VISIBLE_DEVICES is
+    gpus = filter_visible_devices(gpus, get_visible_devices(["CUDA_VISIBLE_DEVICES"]))
+    if not gpus:
+        return None
+
+    return {
+        "name": "cuda",
+        "gpu_info": gpus[0]["name"],
+        "gpu_count": len(gpus),
+        "avail_gpu_mem_in_gb": int(gpus[0]["memory"] / 1024),
+    }
+
+
+def get_vram_in_gb(vram_size: Any) -> int:
+    # Depending on the version, amd-smi returns either {"value": 196592, "unit": "MB"}
+    # or "196592 MB"
+    if isinstance(vram_size, dict):
+        value, unit = vram_size["value"], vram_size.get("unit", "MB")
+    else:
+        value, _, unit = str(vram_size).partition(" ")
+    value = float(value)
+    if unit.upper() in ("GB", "GIB"):
+        return int(value)
+    return int(value / 1024)
+
+
+def probe_rocminfo() -> List[str]:
+    """
+    Return the marketing names of the GPU agents, the same names that torch gets
+    from HIP. The market_name of amd-smi can be different, e.g. MI300X-O
+    """
+    output = run_probe(["rocminfo"])
+    if not output:
+        return []
+
+    names = []
+    for agent in output.split("*******")[1:]:
+        fields = {}
+        for line in agent.splitlines():
+            key, sep, value = line.partition(":")
+            if sep:
+                fields.setdefault(key.strip(), value.strip())
+        if fields.get("Device Type") == "GPU" and fields.get("Marketing Name"):
+            names.append(fields["Marketing Name"])
+    return names
+
+
+def probe_amd_smi() -> Optional[Dict[str, Any]]:
+    output = run_probe(["amd-smi", "static", "--asic", "--vram", "--json"])
+    if not output:
+        return None
+
+    try:
+        data = json.loads(output)
+        if isinstance(data, dict):
+            data = data["gpu_data"]
+        vram = [get_vram_in_gb(gpu["vram"]["size"]) for gpu in data]
+    except (JSONDecodeError, KeyError, TypeError, ValueError) as e:
+        warning(f"Fail to parse amd-smi output {output}: {e}")
+        return None
+
+    names = probe_rocminfo()
+    if not names or len(names) != len(vram):
+        warning("Fail to match the GPUs of amd-smi with the names from rocminfo")
+        return None
+    # The GPUs are indexed in the order of rocminfo like HIP does. Only the indices
+    # are matched, torch is used when the visible devices are UUIDs
+    gpus = [
+        {"index": str(i), "name": name, "memory": memory}
+        for i, (name, memory) in enumerate(zip(names, vram))
+    ]
+
+    # HIP also respects CUDA_VISIBLE_DEVICES when HIP_VISIBLE_DEVICES isn't set
+    gpus = filter_visible_devices(
+        gpus, get_visible_devices(["HIP_VISIBLE_DEVICES", "CUDA_VISIBLE_DEVICES"])
+    )
+    if not gpus:
+        return None
+
+    return {
+        "name": "rocm",
+        "gpu_info": gpus[0]["name"],
+        "gpu_count": len(gpus),
+        "avail_gpu_mem_in_gb": gpus[0]["memory"],
+    }
+
+
+def probe_torch() -> Optional[Dict[str, Any]]:
+    try:
+        import torch
+    except ImportError:
+        return None
+
+    if not torch.cuda.is_available():
+        return None
+
+    if torch.version.hip:
+        name = "rocm"
+    elif torch.version.cuda:
+        name = "cuda"
+    return {
+        "name": name,
+        "gpu_info": torch.cuda.get_device_name(),
+        "gpu_count": torch.cuda.device_count(),
+        "avail_gpu_mem_in_gb": int(
+            torch.cuda.get_device_properties(0).total_memory / (1024 * 1024 * 1024)
+        ),
+    }
+
+
+# The cheap probes of each device, torch is only imported when they can't tell
+# what the GPUs are
+DEVICE_PROBES = {
+    "cuda": probe_nvidia_smi,
+    "rocm": probe_amd_smi,
+}
+
+
+def probe_gpu(device_name: str) -> Optional[Dict[str, Any]]:
+    """
+    Try the cheap probe of the device first and only import torch as the last
+    resort. The other devices have no GPU info, the same as when torch was used
+    """
+    if device_name not in DEVICE_PROBES:
+        return None
+    return DEVICE_PROBES[device_name]() or probe_torch()
+
+
+def get_boot_id() -> str:
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def get_runner_info(
+    device_name: str, device_type: str, use_cache: bool = True
+) -> Dict[str, Any]:
+    """
+    Probe the hardware of this runner. The result is cached per host, boot, and
+    visible devices, so that repeated invocations in the same job don't need to
+    probe again
+    """
+    hostname = socket.gethostname()
+    visible_devices = json.dumps([os.environ.get(e) for e in VISIBLE_DEVICES_ENV])
+    cache_key = f"{hostname}:{get_boot_id()}:{device_name}:{device_type}:{visible_devices}"
+    cache_key = hashlib.sha256(cache_key.encode()).hexdigest()
+    cache_file = os.path.join(CACHE_DIR, f"runner-info-{cache_key}.json")
+
+    if use_cache and os.path.exists(cache_file):
+        try:
+            with open(cache_file) as f:
+                runner = json.load(f)
+            info(f"Load runner info from {cache_file}")
+            return runner
+        except (JSONDecodeError, OSError) as e:
+            warning(f"Fail to load {cache_file}: {e}")
+
+    gpu = probe_gpu(device_name)
+    if gpu:
+        name = gpu["name"]
+        type = gpu["gpu_info"]
+        gpu_info = gpu["gpu_info"]
+        gpu_count = gpu["gpu_count"]
+        avail_gpu_mem_in_gb = gpu["avail_gpu_mem_in_gb"]
+    else:
+        name = device_name
+        type = device_type
+        gpu_info = ""
+        gpu_count = 0
+        avail_gpu_mem_in_gb = 0
+
+    runner = {
+        "name": name,
+        "type": type,
+        "cpu_info": platform.processor(),
+        "cpu_count": psutil.cpu_count(),
+        "avail_mem_in_gb": int(psutil.virtual_memory().total / (1024 * 1024 * 1024)),
+        "gpu_info": gpu_info,
+        "gpu_count": gpu_count,
+        "avail_gpu_mem_in_gb": avail_gpu_mem_in_gb,
+        "extra_info": {
+            "hostname": hostname,
+        },
+    }
+
+    if use_cache:
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(cache_file, "w") as f:
+                json.dump(runner, f)
+        except OSError as e:
+            warning(f"Fail to cache the runner info in {cache_file}: {e}")
+
+    return runner
@@ -3,23 +3,19 @@
 import copy
 import os
 import json
-import glob
 import logging
 from logging import warning
 from argparse import Action, ArgumentParser, Namespace
 from typing import Any, Dict, List, Optional
 
+from vllm_benchmark_index import (
+    VLLM_BENCHMARK_CONFIGS_PARAMETER,
+    get_config_files,
+    load_index,
+)
 
-logging.basicConfig(level=logging.INFO)
 
-# All the different names vLLM uses to refer to their benchmark configs
-VLLM_BENCHMARK_CONFIGS_PARAMETER = set(
-    [
-        "parameters",
-        "server_parameters",
-        "common_parameters",
-    ]
-)
+logging.basicConfig(level=logging.INFO)
 
 # Parameter keys where compilation_config overrides are applied
 COMPILATION_CONFIG_PARAMETER_KEYS = ["parameters", "server_parameters"]
@@ -147,10 +143,13 @@ def setup_benchmark_configs(
     include_inductor_graph_partition: bool = False,
 ) -> None:
     """
-    Setup the benchmark configs to run on this runner.
+    Setup the benchmark configs to run on this runner. Only the files that have
+    the models, according to the config index, are parsed
     """
-    for file in glob.glob(f"{from_benchmark_configs_dir}/{device}/*.json"):
-        filename = os.path.basename(file)
+    selected_models = set(models)
+    index = load_index(from_benchmark_configs_dir)
+    for filename in get_config_files(index, device, selected_models):
+        file = os.path.join(from_benchmark_configs_dir, device, filename)
         benchmark_configs = []
 
         with open(file) as f:
@@ -170,7 +169,7 @@ def setup_benchmark_configs(
                 continue
             model = benchmark_config["model"].lower()
 
-            if model not in models:
+            if model not in selected_models:
                 continue
 
             if compilation_config:
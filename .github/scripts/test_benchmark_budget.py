@@ -0,0 +1,68 @@
+import datetime
+
+from benchmark_budget import (
+    load_rotation_state,
+    parse_budget,
+    save_rotation_state,
+    select_within_budget,
+)
+
+
+def get_platform(entry: dict) -> str:
+    return entry["runner"].split("-")[0]
+
+
+def test_parse_budget():
+    assert parse_budget("40") == {"*": 40}
+    assert parse_budget("cuda=40, rocm=20.5") == {"cuda": 40, "rocm": 20.5}
+    assert parse_budget("") == {}
+
+
+def test_select_within_budget():
+    entries = [
+        {"runner": "cuda-1", "models": "a", "cost": 1},
+        {"runner": "cuda-1", "models": "b", "cost": 1},
+        {"runner": "cuda-1", "models": "c", "cost": 1},
+        {"runner": "cuda-1", "models": "d", "cost": 1},
+        # No budget on this platform, so it always runs
+        {"runner": "rocm-1", "models": "a", "cost": 10},
+    ]
+    priorities = {"a": 3}
+    state = load_rotation_state("/nonexistent/rotation.json")
+    day = datetime.date(2026, 10, 1)
+
+    runs = []
+    for _ in range(9):
+        selected, dropped = select_within_budget(
+            entries, {"cuda": 2}, get_platform, priorities, state, day, 3
+        )
+        assert sum(e["cost"] for e in selected if e["runner"] == "cuda-1") <= 2
+        assert {"runner": "rocm-1", "models": "a", "cost": 10} in selected
+        assert len(selected) + len(dropped) == len(entries)
+        runs.append(sorted(e["models"] for e in selected if e["runner"] == "cuda-1"))
+        day += datetime.timedelta(days=1)
+
+    # The high priority model first
+    assert runs[0] == ["a", "b"]
+    # Every model runs at least every 3 days, and the high priority one most often
+    for model in ["a", "b", "c", "d"]:
+        days = [i for i, run in enumerate(runs) if model in run]
+        assert days[0] <= 2
+        assert all(j - i <= 3 for i, j in zip(days, days[1:]))
+    assert sum("a" in run for run in runs) > sum("b" in run for run in runs)
+
+
+def test_rotation_state(tmp_path):
+    path = str(tmp_path / "state" / "rotation.json")
+    entries = [{"runner": "cuda-1", "models": "a", "cost": 1}]
+    day = datetime.date(2026, 10, 1)
+
+    state = load_rotation_state(path)
+    select_within_budget(entries, {"*": 1}, get_platform, {}, state, day)
+    save_rotation_state(path, state)
+    assert load_rotation_state(path)["last_run"] == {"cuda-1|a": "2026-10-01"}
+
+    # The same state and date give the same selection
+    first = select_within_budget(entries * 2, {"*": 1}, get_platform, {}, state, day)
+    second = select_within_budget(entries * 2, {"*": 1}, get_platform, {}, state, day)
+    assert first == second
@@ -0,0 +1,40 @@
+import json
+import sqlite3
+
+from benchmark_history import get_duration, load_durations
+
+
+def test_load_durations(tmp_path):
+    history = tmp_path / "history.json"
+    history.write_text(
+        json.dumps(
+            [
+                {"runner": "linux.dgx.b200", "model": "Qwen/Qwen3-8B", "duration": 600},
+                {"runner": "linux.dgx.b200", "model": "qwen/qwen3-8b", "duration": 900},
+                {"runner": "linux.dgx.b200", "model": "qwen/qwen3-8b", "duration": 700},
+                {"runner": "linux.dgx.b200", "model": "facebook/opt-125m"},
+            ]
+        )
+    )
+    durations = load_durations(str(history))
+    assert durations == {("linux.dgx.b200", "qwen/qwen3-8b"): 700}
+
+    runner_to_platform = {"linux.dgx.b200": "cuda", "mt-l-x86iamx-22-225-h100": "cuda"}
+    h100 = "mt-l-x86iamx-22-225-h100"
+    assert get_duration(durations, h100, "qwen/qwen3-8b", runner_to_platform) == 700
+    gnr = "linux.24xl.gnr"
+    assert get_duration(durations, gnr, "qwen/qwen3-8b", runner_to_platform) is None
+
+    history = tmp_path / "history.db"
+    conn = sqlite3.connect(history)
+    conn.execute(
+        "CREATE TABLE benchmark_durations (runner TEXT, model TEXT, duration REAL, timestamp INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO benchmark_durations VALUES (?, ?, ?, ?)",
+        [("linux.dgx.b200", "qwen/qwen3-8b", 100.0 * i, i) for i in range(20)],
+    )
+    conn.commit()
+    conn.close()
+    # Only the 10 most recent runs count
+    assert load_durations(str(history)) == {("linux.dgx.b200", "qwen/qwen3-8b"): 1450}
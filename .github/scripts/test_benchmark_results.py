@@ -0,0 +1,103 @@
+import json
+import os
+
+import benchmark_results
+from benchmark_results import (
+    load_benchmark_results,
+    read_benchmark_results,
+    write_parse_cache,
+)
+
+
+def test_read_benchmark_results(tmp_path):
+    records = [
+        {"benchmark": {"name": "vLLM benchmark"}, "metric": {"benchmark_values": [i]}}
+        for i in range(3)
+    ]
+    files = {
+        "list.json": json.dumps(records, indent=4),
+        "dict.json": json.dumps(records[0], indent=4),
+        "single_row.json": json.dumps(records[0]),
+        "json_each_row.json": "\n".join(json.dumps(r) for r in records) + "\n\n",
+        "json_each_row_list.json": "\n".join(json.dumps([r]) for r in records),
+        "invalid_row.json": "\n".join(
+            [json.dumps(records[0]), "{invalid", "1", json.dumps(records[1])]
+        ),
+        "nan.json": json.dumps([{"metric": {"benchmark_values": [float("nan")]}}]),
+        "empty.json": "",
+    }
+    for filename, content in files.items():
+        with open(tmp_path / filename, "w") as f:
+            f.write(content)
+
+    for orjson_available in set([False, benchmark_results.orjson_available]):
+        benchmark_results.orjson_available = orjson_available
+
+        assert read_benchmark_results(tmp_path / "list.json") == records
+        assert read_benchmark_results(tmp_path / "dict.json") == records[:1]
+        assert read_benchmark_results(tmp_path / "single_row.json") == records[:1]
+        assert read_benchmark_results(tmp_path / "json_each_row.json") == records
+        assert read_benchmark_results(tmp_path / "json_each_row_list.json") == records
+        assert read_benchmark_results(tmp_path / "invalid_row.json") == records[:2]
+        assert str(read_benchmark_results(tmp_path / "nan.json")) == str(
+            [{"metric": {"benchmark_values": [float("nan")]}}]
+        )
+        assert read_benchmark_results(tmp_path / "empty.json") == []
+
+
+def test_load_benchmark_results(tmp_path, monkeypatch):
+    monkeypatch.setattr(benchmark_results, "PARALLEL_LOAD_MIN_FILES", 2)
+    for i in range(10):
+        with open(tmp_path / f"{i}.json", "w") as f:
+            json.dump([{"benchmark": {"name": "vLLM benchmark"}, "id": i}], f)
+
+    serial = load_benchmark_results(str(tmp_path), max_workers=1)
+    parallel = load_benchmark_results(str(tmp_path), max_workers=2)
+    assert list(serial.items()) == list(parallel.items())
+    assert sorted(os.path.basename(f) for f in serial) == sorted(
+        f"{i}.json" for i in range(10)
+    )
+
+
+def test_parse_cache(tmp_path, monkeypatch):
+    results_dir = tmp_path / "results"
+    results_dir.mkdir()
+    for i in range(3):
+        with open(results_dir / f"{i}.json", "w") as f:
+            json.dump([{"benchmark": {"name": "vLLM benchmark"}, "id": i}], f)
+
+    parse_cache = str(tmp_path / "parse_cache.pickle")
+    expected = load_benchmark_results(str(results_dir))
+    write_parse_cache(parse_cache, expected)
+
+    parsed_files = []
+    read_benchmark_results = benchmark_results.read_benchmark_results
+
+    def counting_read_benchmark_results(filepath):
+        parsed_files.append(os.path.basename(filepath))
+        return read_benchmark_results(filepath)
+
+    monkeypatch.setattr(
+        benchmark_results, "read_benchmark_results", counting_read_benchmark_results
+    )
+
+    # Nothing has changed
+    assert load_benchmark_results(str(results_dir), parse_cache=parse_cache) == expected
+    assert parsed_files == []
+
+    # One file is updated and a new file is added
+    with open(results_dir / "1.json", "w") as f:
+        json.dump([{"benchmark": {"name": "vLLM benchmark"}, "id": 10}], f)
+    with open(results_dir / "3.json", "w") as f:
+        json.dump([{"benchmark": {"name": "vLLM benchmark"}, "id": 3}], f)
+    results = load_benchmark_results(str(results_dir), parse_cache=parse_cache)
+    assert sorted(parsed_files) == ["1.json", "3.json"]
+    assert results[str(results_dir / "1.json")][0]["id"] == 10
+    assert results[str(results_dir / "3.json")][0]["id"] == 3
+
+    # A corrupted cache is ignored
+    parsed_files.clear()
+    with open(parse_cache, "wb") as f:
+        f.write(b"corrupted")
+    assert len(load_benchmark_results(str(results_dir), parse_cache=parse_cache)) == 4
+    assert len(parsed_files) == 4
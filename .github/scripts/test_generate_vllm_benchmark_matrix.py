@@ -2,7 +2,14 @@ import os
 import json
 
 from expecttest import assert_expected_inline
-from generate_vllm_benchmark_matrix import generate_benchmark_matrix
+from generate_vllm_benchmark_matrix import (
+    estimate_costs,
+    filter_benchmark_matrix,
+    generate_benchmark_matrix,
+    get_test_counts,
+    pack_benchmark_matrix,
+    pack_models,
+)
 
 BENCHMARK_CONFIG_DIRS = os.path.join(
     os.path.dirname(__file__), "..", "..", "vllm-benchmarks", "benchmarks"
@@ -543,3 +550,115 @@ def test_generate_benchmark_matrix():
   "include": []
 }""",
     )
+
+
+def test_generate_benchmark_matrix_memory_placement():
+    models = ["qwen/qwen3-8b", "openai/gpt-oss-120b", "deepseek-ai/deepseek-r1"]
+    output = json.dumps(
+        generate_benchmark_matrix(BENCHMARK_CONFIG_DIRS, models, [], "memory"),
+        indent=2,
+    )
+    assert_expected_inline(
+        output,
+        """\
+{
+  "include": [
+    {
+      "runner": "mt-l-x86iamx-22-225-h100",
+      "models": "qwen/qwen3-8b"
+    },
+    {
+      "runner": "mt-l-x86iamx-88-900-h100-4",
+      "models": "openai/gpt-oss-120b"
+    },
+    {
+      "runner": "linux.dgx.b200.8",
+      "models": "deepseek-ai/deepseek-r1"
+    },
+    {
+      "runner": "linux.rocm.gpu.gfx942.1",
+      "models": "qwen/qwen3-8b"
+    }
+  ]
+}""",
+    )
+
+
+def test_filter_benchmark_matrix():
+    benchmark_matrix = generate_benchmark_matrix(BENCHMARK_CONFIG_DIRS, [], [])
+    affected = set([("qwen/qwen3-8b", "cuda"), ("google/gemma-3-27b-it", "rocm")])
+    output = json.dumps(filter_benchmark_matrix(benchmark_matrix, affected), indent=2)
+    assert_expected_inline(
+        output,
+        """\
+{
+  "include": [
+    {
+      "runner": "mt-l-x86iamx-22-225-h100",
+      "models": "qwen/qwen3-8b"
+    }
+  ]
+}""",
+    )
+
+
+def test_estimate_costs():
+    models = ["qwen/qwen3-8b", "google/gemma-3-4b-it"]
+    benchmark_matrix = generate_benchmark_matrix(BENCHMARK_CONFIG_DIRS, models, ["h100"])
+    test_counts = get_test_counts(BENCHMARK_CONFIG_DIRS)
+    assert test_counts[("cuda", "qwen/qwen3-8b")] > 1
+    durations = {("mt-l-x86iamx-22-225-h100", "qwen/qwen3-8b"): 45 * 60}
+    costs = {
+        entry["models"]: entry["cost"]
+        for entry in estimate_costs(benchmark_matrix, durations, test_counts, 15, 10)[
+            "include"
+        ]
+    }
+    # From the history, or from the number of tests otherwise
+    assert costs["qwen/qwen3-8b"] == 1
+    assert costs["google/gemma-3-4b-it"] == round(
+        (15 + 10 * test_counts[("cuda", "google/gemma-3-4b-it")]) / 60, 2
+    )
+
+
+def test_pack_models():
+    # Fewest jobs within 100 minutes, then balanced across them
+    jobs = pack_models([("a", 60), ("b", 50), ("c", 30), ("d", 20), ("e", 10)], 100, 5)
+    assert len(jobs) == 2
+    assert sorted(sorted(models) for models, _ in jobs) == [["a", "c"], ["b", "d", "e"]]
+    assert [duration for _, duration in jobs] == [95, 85]
+
+    # A model longer than the cap gets a job of its own
+    jobs = pack_models([("a", 200), ("b", 10), ("c", 10)], 100, 5)
+    assert jobs == [(["a"], 205), (["b", "c"], 25)]
+
+
+def test_pack_benchmark_matrix():
+    models = ["facebook/opt-125m", "qwen/qwen3-8b", "google/gemma-3-4b-it"]
+    benchmark_matrix = generate_benchmark_matrix(BENCHMARK_CONFIG_DIRS, models, ["h100"])
+    durations = {
+        ("mt-l-x86iamx-22-225-h100", "qwen/qwen3-8b"): 90 * 60,
+        # Only known on another runner of the same platform
+        ("linux.dgx.b200", "google/gemma-3-4b-it"): 30 * 60,
+    }
+    output = json.dumps(
+        pack_benchmark_matrix(benchmark_matrix, durations, 150, 10, 45), indent=2
+    )
+    assert_expected_inline(
+        output,
+        """\
+{
+  "include": [
+    {
+      "runner": "mt-l-x86iamx-22-225-h100",
+      "models": "qwen/qwen3-8b",
+      "predicted_duration": 100
+    },
+    {
+      "runner": "mt-l-x86iamx-22-225-h100",
+      "models": "facebook/opt-125m,google/gemma-3-4b-it",
+      "predicted_duration": 85
+    }
+  ]
+}""",
+    )
@@ -0,0 +1,98 @@
+import sqlite3
+
+import pytest
+
+from result_sinks import ResultSink, SQLiteSink
+from upload_benchmark_results import RemoteSink, write_to_sinks
+
+
+def fake_result(model: str, metric: str, values: list) -> dict:
+    return {
+        "benchmark": {"name": "vLLM benchmark"},
+        "model": {"name": model},
+        "metric": {"name": metric, "benchmark_values": values},
+    }
+
+
+def test_sqlite_sink(tmp_path):
+    db_path = str(tmp_path / "benchmark_results.db")
+    runner = {"name": "cuda", "type": "NVIDIA H100"}
+
+    for i, (head_sha, value) in enumerate([("a", 10.0), ("b", 11.0), ("c", 15.0)]):
+        metadata = {"repo": "vllm-project/vllm", "head_sha": head_sha, "timestamp": i}
+        sink = SQLiteSink(db_path, metadata, runner, batch_size=1)
+        s3_path = f"v3/vllm-project/vllm/main/{head_sha}/cuda/benchmark_results.json"
+        sink.write(
+            s3_path,
+            {
+                "latency_llama8B_tp1.json": [
+                    fake_result("meta-llama/Llama-3.1-8B", "latency", [value, value]),
+                    fake_result("meta-llama/Llama-3.1-8B", "throughput", [1.0, "NaN"]),
+                ]
+            },
+        )
+        # Writing to the same path again replaces the previous results
+        sink.write(
+            s3_path,
+            {
+                "latency_llama8B_tp1.json": [
+                    fake_result("meta-llama/Llama-3.1-8B", "latency", [value]),
+                    fake_result("meta-llama/Llama-3.1-8B", "throughput", [1.0]),
+                ]
+            },
+        )
+        sink.close()
+
+    sink = SQLiteSink(db_path, {}, runner)
+    history = sink.get_history(
+        "meta-llama/Llama-3.1-8B", "latency_llama8B_tp1", "NVIDIA H100", "latency"
+    )
+    assert [(h["head_sha"], h["value"]) for h in history] == [
+        ("c", 15.0),
+        ("b", 11.0),
+        ("a", 10.0),
+    ]
+
+    changes = sink.find_changes("c", "NVIDIA H100", threshold=0.2)
+    assert [(c["metric"], c["baseline"], c["value"]) for c in changes] == [
+        ("latency", 11.0, 15.0)
+    ]
+    assert not sink.find_changes("b", "NVIDIA H100", threshold=0.2)
+    sink.close()
+
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM benchmark_results").fetchone() == (6,)
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT value FROM benchmark_results WHERE model = ? AND test_name = ? AND device = ? AND metric = ? ORDER BY timestamp",
+        ("m", "t", "d", "latency"),
+    ).fetchall()
+    assert "benchmark_results_by_test" in str(plan)
+    conn.close()
+
+
+def test_dry_run(tmp_path, monkeypatch):
+    with pytest.raises(TypeError):
+        ResultSink()
+
+    uploads = []
+    monkeypatch.setattr(
+        "upload_benchmark_results.upload_results",
+        lambda s3_path, *args, **kwargs: uploads.append(s3_path),
+    )
+    db_path = str(tmp_path / "benchmark_results.db")
+    runner = {"name": "cuda", "type": "NVIDIA H100"}
+    sinks = [RemoteSink("api", {}, runner), SQLiteSink(db_path, {}, runner)]
+    results = {"latency.json": [fake_result("facebook/opt-125m", "latency", [1.0])]}
+
+    # Only the local sinks are written to on a dry run
+    write_to_sinks(sinks, "dry_run.json", results, dry_run=True)
+    write_to_sinks(sinks, "upload.json", results, dry_run=False)
+    assert uploads == ["upload.json"]
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT s3_path FROM benchmark_results").fetchall() == [
+        ("dry_run.json",),
+        ("upload.json",),
+    ]
+    conn.close()
+    for sink in sinks:
+        sink.close()
@@ -0,0 +1,83 @@
+import json
+import os
+import threading
+import time
+
+from results_watcher import ResultsWatcher
+
+
+def test_results_watcher(tmp_path):
+    uploaded = []
+    lock = threading.Lock()
+
+    def is_valid(file, results):
+        return bool(results) and "benchmark" in results[0]
+
+    def upload_file(file, results):
+        if os.path.basename(file) == "failed.json" or results[0]["id"] == 4:
+            raise RuntimeError("Boom")
+        with lock:
+            uploaded.append((os.path.basename(file), results[0]["id"]))
+
+    watcher = ResultsWatcher(
+        str(tmp_path),
+        is_valid,
+        upload_file,
+        max_workers=2,
+        poll_interval=0.05,
+        settle_seconds=0.1,
+    )
+    stop = threading.Event()
+    outcome = []
+    thread = threading.Thread(target=lambda: outcome.append(watcher.run(stop)))
+    thread.start()
+
+    def write(filename, content):
+        with open(tmp_path / filename, "w") as f:
+            f.write(content)
+
+    def wait_for(n):
+        deadline = time.time() + 10
+        while len(uploaded) < n and time.time() < deadline:
+            time.sleep(0.02)
+        assert len(uploaded) == n
+
+    write("0.json", json.dumps([{"benchmark": {}, "id": 0}]))
+    wait_for(1)
+
+    # A partially written file is not uploaded until it's complete
+    write("1.json", '[{"benchmark": {}, "id": 1}')
+    time.sleep(0.3)
+    assert len(uploaded) == 1
+    write("1.json", json.dumps([{"benchmark": {}, "id": 1}]))
+    wait_for(2)
+
+    # A file that fails to upload is uploaded again when it changes
+    write("retry.json", json.dumps([{"benchmark": {}, "id": 4}]))
+    deadline = time.time() + 10
+    while not watcher.failed and time.time() < deadline:
+        time.sleep(0.02)
+    assert list(watcher.failed) == [str(tmp_path / "retry.json")]
+    write("retry.json", json.dumps([{"benchmark": {}, "id": 5}]))
+    wait_for(3)
+    assert not watcher.failed
+
+    # Other files are ignored, and so are the files that can't be read
+    write("notes.txt", "hello")
+    with open(tmp_path / "binary.json", "wb") as f:
+        f.write(b"\xff\xfe")
+    write("failed.json", json.dumps([{"benchmark": {}, "id": 2}]))
+    # This one is written right before stopping, it's flushed at exit
+    write("3.json", json.dumps([{"benchmark": {}, "id": 3}]))
+    stop.set()
+    thread.join(timeout=10)
+
+    assert sorted(uploaded) == [
+        ("0.json", 0),
+        ("1.json", 1),
+        ("3.json", 3),
+        ("retry.json", 5),
+    ]
+    assert list(watcher.failed) == [str(tmp_path / "failed.json")]
+    assert str(tmp_path / "binary.json") in watcher.invalid
+    assert outcome == [False]
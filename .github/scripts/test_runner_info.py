@@ -0,0 +1,111 @@
+import json
+import os
+import stat
+import sys
+
+import runner_info
+from runner_info import get_runner_info
+
+
+def create_fake_tool(bin_dir, name: str, output: str) -> None:
+    path = os.path.join(bin_dir, name)
+    with open(path, "w") as f:
+        f.write(f"#!{sys.executable}\nprint({output!r})\n")
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+
+def test_get_runner_info(tmp_path, monkeypatch):
+    monkeypatch.setattr(runner_info, "CACHE_DIR", str(tmp_path / "cache"))
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", str(bin_dir))
+    monkeypatch.delenv("CUDA_VISIBLE_DEVICES", raising=False)
+    monkeypatch.delenv("HIP_VISIBLE_DEVICES", raising=False)
+
+    # No GPU
+    runner = get_runner_info("cpu", "Intel Xeon", use_cache=False)
+    assert runner["name"] == "cpu" and runner["type"] == "Intel Xeon"
+    assert runner["gpu_count"] == 0
+    assert "torch" not in sys.modules
+
+    create_fake_tool(
+        bin_dir,
+        "nvidia-smi",
+        "0, GPU-1234, NVIDIA H100 80GB HBM3, 81559\n"
+        "1, GPU-5678, NVIDIA H100 80GB HBM3, 81559",
+    )
+    runner = get_runner_info("cuda", "H100")
+    assert runner["name"] == "cuda"
+    assert runner["type"] == runner["gpu_info"] == "NVIDIA H100 80GB HBM3"
+    assert runner["gpu_count"] == 2
+    assert runner["avail_gpu_mem_in_gb"] == 79
+
+    # The cached probe is reused
+    os.remove(bin_dir / "nvidia-smi")
+    assert get_runner_info("cuda", "H100") == runner
+    assert get_runner_info("cuda", "H100", use_cache=False)["gpu_count"] == 0
+
+    asic = {"market_name": "MI300X-O"}
+    create_fake_tool(
+        bin_dir,
+        "rocminfo",
+        "*******\nAgent 1\n*******\n  Name: AMD EPYC\n  Marketing Name: AMD EPYC\n"
+        "  Device Type: CPU\n*******\nAgent 2\n*******\n  Name: gfx942\n"
+        "  Marketing Name: AMD Instinct MI300X\n  Device Type: GPU\n",
+    )
+    for amd_smi_output in [
+        [{"gpu": 0, "asic": asic, "vram": {"size": {"value": 196592, "unit": "MB"}}}],
+        {"gpu_data": [{"gpu": 0, "asic": asic, "vram": {"size": "196592 MB"}}]},
+    ]:
+        create_fake_tool(bin_dir, "amd-smi", json.dumps(amd_smi_output))
+        runner = get_runner_info("rocm", "MI300X", use_cache=False)
+        assert runner["name"] == "rocm"
+        # The same name as torch, not the market name of amd-smi
+        assert runner["gpu_info"] == "AMD Instinct MI300X"
+        assert runner["gpu_count"] == 1
+        assert runner["avail_gpu_mem_in_gb"] == 191
+
+    # The probes only run on their devices
+    assert get_runner_info("cuda", "H100", use_cache=False)["gpu_count"] == 0
+    assert get_runner_info("cpu", "Intel Xeon", use_cache=False)["gpu_count"] == 0
+
+
+def test_visible_devices(tmp_path, monkeypatch):
+    monkeypatch.setattr(runner_info, "CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.delenv("HIP_VISIBLE_DEVICES", raising=False)
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    monkeypatch.setenv("PATH", str(bin_dir))
+    create_fake_tool(
+        bin_dir,
+        "nvidia-smi",
+        "0, GPU-1234, NVIDIA A100-SXM4-40GB, 40960\n"
+        "1, GPU-5678, NVIDIA H100 80GB HBM3, 81559\n"
+        "2, GPU-9abc, NVIDIA H100 80GB HBM3, 81559",
+    )
+
+    for visible_devices, gpu_count, gpu_info in [
+        (None, 3, "NVIDIA A100-SXM4-40GB"),
+        ("1,2", 2, "NVIDIA H100 80GB HBM3"),
+        ("GPU-9a", 1, "NVIDIA H100 80GB HBM3"),
+        # The devices after an invalid one are ignored
+        ("2,7,0", 1, "NVIDIA H100 80GB HBM3"),
+    ]:
+        if visible_devices is None:
+            monkeypatch.delenv("CUDA_VISIBLE_DEVICES", raising=False)
+        else:
+            monkeypatch.setenv("CUDA_VISIBLE_DEVICES", visible_devices)
+        runner = get_runner_info("cuda", "H100", use_cache=False)
+        assert runner["gpu_count"] == gpu_count
+        assert runner["gpu_info"] == gpu_info
+
+    # The jobs that see different devices on the same host don't share the cache
+    for visible_devices, gpu_count in [("0", 1), ("1,2", 2), ("0", 1)]:
+        monkeypatch.setenv("CUDA_VISIBLE_DEVICES", visible_devices)
+        assert get_runner_info("cuda", "H100")["gpu_count"] == gpu_count
+
+    # No visible GPU
+    monkeypatch.setenv("CUDA_VISIBLE_DEVICES", "")
+    runner = get_runner_info("cuda", "H100", use_cache=False)
+    assert runner["name"] == "cuda" and runner["type"] == "H100"
+    assert runner["gpu_count"] == 0
@@ -0,0 +1,397 @@
+import gzip
+import json
+import os
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+import pytest
+
+import upload_benchmark_results
+from upload_benchmark_results import (
+    aggregate,
+    aggregate_compact,
+    expand_compact,
+    get_benchmark_metadata,
+    get_git_metadata,
+    upload,
+    upload_s3,
+    upload_via_api,
+    watch,
+)
+from result_sinks import ResultSink
+from upload_manifest import UploadManifest
+
+
+class FakeMultipartUpload:
+    def __init__(self, s3_object: "FakeS3Object"):
+        self.s3_object = s3_object
+        self.parts: Dict[int, bytes] = {}
+        self.aborted = False
+
+    def Part(self, part_number: int) -> Any:
+        upload = self
+
+        class FakePart:
+            def upload(self, Body: bytes) -> Dict[str, Any]:
+                upload.parts[part_number] = Body
+                return {"ETag": f"etag-{part_number}"}
+
+        return FakePart()
+
+    def complete(self, MultipartUpload: Dict[str, Any]) -> None:
+        part_numbers = [p["PartNumber"] for p in MultipartUpload["Parts"]]
+        assert part_numbers == sorted(self.parts.keys())
+        self.s3_object.body = b"".join(self.parts[n] for n in part_numbers)
+
+    def abort(self) -> None:
+        self.aborted = True
+
+
+class FakeS3Object:
+    def __init__(self, bucket: str, key: str):
+        self.bucket = bucket
+        self.key = key
+        self.body = b""
+        self.put_count = 0
+        self.multipart_uploads: List[FakeMultipartUpload] = []
+
+    def put(self, Body: bytes, **kwargs: Any) -> None:
+        self.put_count += 1
+        self.body = Body
+
+    def initiate_multipart_upload(self, **kwargs: Any) -> FakeMultipartUpload:
+        upload = FakeMultipartUpload(self)
+        self.multipart_uploads.append(upload)
+        return upload
+
+
+class FakeS3Resource:
+    def __init__(self):
+        self.objects: Dict[str, FakeS3Object] = {}
+
+    def Object(self, bucket: str, key: str) -> FakeS3Object:
+        self.objects[key] = FakeS3Object(bucket, key)
+        return self.objects[key]
+
+
+def fake_results(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "benchmark": {"name": "vLLM benchmark", "extra_info": {"seed": i}},
+            "model": {"name": f"model-{i % 7}"},
+            "metric": {"name": "median_ttft_ms", "benchmark_values": [i * 1.5]},
+        }
+        for i in range(n)
+    ]
+
+
+def test_upload_s3(monkeypatch):
+    s3 = FakeS3Resource()
+    monkeypatch.setattr(upload_benchmark_results.boto3, "resource", lambda _: s3)
+
+    # Small payload is sent with a single put request
+    results = fake_results(10)
+    upload_s3("v3/small.json", results)
+    s3_object = s3.objects["v3/small.json"]
+    assert s3_object.put_count == 1
+    assert not s3_object.multipart_uploads
+    assert gzip.decompress(s3_object.body).decode() == "\n".join(
+        [json.dumps(r) for r in results]
+    )
+
+    # Large payload is streamed in multiple parts
+    results = fake_results(5000)
+    upload_s3("v3/large.json", iter(results), part_size=4096)
+    s3_object = s3.objects["v3/large.json"]
+    assert s3_object.put_count == 0
+    assert len(s3_object.multipart_uploads) == 1
+    assert len(s3_object.multipart_uploads[0].parts) > 1
+    assert all(
+        len(p) == 4096 for p in list(s3_object.multipart_uploads[0].parts.values())[:-1]
+    )
+    assert gzip.decompress(s3_object.body).decode() == "\n".join(
+        [json.dumps(r) for r in results]
+    )
+
+
+def test_upload_s3_abort(monkeypatch):
+    s3 = FakeS3Resource()
+    monkeypatch.setattr(upload_benchmark_results.boto3, "resource", lambda _: s3)
+
+    def failing_results():
+        yield from fake_results(5000)
+        raise RuntimeError("Boom")
+
+    with pytest.raises(RuntimeError):
+        upload_s3("v3/failed.json", failing_results(), part_size=4096)
+
+    s3_object = s3.objects["v3/failed.json"]
+    assert s3_object.multipart_uploads[0].aborted
+    assert not s3_object.body
+
+
+def git(repo_dir: str, *args: str) -> str:
+    return subprocess.check_output(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+        cwd=repo_dir,
+        text=True,
+    ).strip()
+
+
+def test_get_git_metadata_detached_head(tmp_path, monkeypatch):
+    monkeypatch.setattr(upload_benchmark_results, "CACHE_DIR", str(tmp_path / "cache"))
+    repo_dir = str(tmp_path / "repo")
+    os.makedirs(repo_dir)
+    git(repo_dir, "init", "-q", "-b", "main")
+    git(repo_dir, "remote", "add", "origin", "https://github.com/example/repo.git")
+
+    def commit(message: str) -> str:
+        # Keep the commit order deterministic
+        commit.timestamp += 1
+        monkeypatch.setenv("GIT_COMMITTER_DATE", f"{commit.timestamp} +0000")
+        git(repo_dir, "commit", "-q", "--allow-empty", "-m", message)
+        return git(repo_dir, "rev-parse", "HEAD")
+
+    commit.timestamp = 1700000000
+
+    for i in range(5):
+        commit(f"main {i}")
+    branch_shas = {}
+    for b in range(3):
+        git(repo_dir, "checkout", "-q", "-b", f"old-{b}", f"main~{4 - b}")
+        branch_shas[f"old-{b}"] = commit(f"old {b}")
+    git(repo_dir, "checkout", "-q", "-b", "feature", "main")
+    branch_shas["feature"] = commit("feature")
+
+    for depth in [0, 100, 100]:
+        for branch, sha in branch_shas.items():
+            git(repo_dir, "checkout", "-q", "--detach", sha)
+            assert get_git_metadata(repo_dir, depth)[:3] == (
+                "example/repo",
+                branch,
+                sha,
+            )
+
+    # The commit is older than the search depth
+    git(repo_dir, "checkout", "-q", "--detach", branch_shas["old-0"])
+    assert get_git_metadata(repo_dir, 2)[1] == "main"
+
+
+def test_expand_compact():
+    metadata = get_benchmark_metadata(
+        "vllm-project/vllm", "main", "abc", 1700000000, "vLLM benchmark"
+    )
+    runner = {"name": "cuda", "type": "NVIDIA H100", "gpu_count": 1}
+    benchmark_results = {
+        "serving.json": fake_results(3),
+        "latency.json": fake_results(2),
+    }
+
+    compact = aggregate_compact(metadata, runner, benchmark_results)
+    assert len(compact) == 6
+    assert "runners" not in compact[1] and "head_sha" not in compact[1]
+    assert list(expand_compact(compact)) == aggregate(
+        metadata, runner, benchmark_results
+    )
+
+    # Concatenated compact blobs from different runners
+    other_runner = {**runner, "name": "rocm"}
+    compact += aggregate_compact(metadata, other_runner, {"serving.json": fake_results(1)})
+    expanded = list(expand_compact(compact))
+    assert len(expanded) == 6
+    assert expanded[-1]["runners"] == [other_runner]
+
+    with pytest.raises(ValueError):
+        list(expand_compact(fake_results(1)))
+
+
+class FakeUploaderHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        s3_path = body["s3_path"]
+
+        time.sleep(server.latency)
+        with server.lock:
+            server.attempts[s3_path] = server.attempts.get(s3_path, 0) + 1
+            attempt = server.attempts[s3_path]
+
+        # Throttle or fail the first attempts of every request
+        if attempt <= server.failures:
+            self.send_response(429 if attempt % 2 else 503)
+            self.send_header("Retry-After", "0")
+            self.end_headers()
+            return
+
+        with server.lock:
+            server.uploaded[s3_path] = body["content"]
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(b"OK")
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_uploader(monkeypatch):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeUploaderHandler)
+    server.latency = 0.01
+    server.failures = 2
+    server.attempts = {}
+    server.uploaded = {}
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(
+        upload_benchmark_results,
+        "UPLOADER_URL",
+        f"http://127.0.0.1:{server.server_address[1]}",
+    )
+    monkeypatch.setattr(upload_benchmark_results, "UPLOADER_BACKOFF_SECONDS", 0.001)
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def test_upload_via_api(fake_uploader):
+    results = fake_results(1000)
+    upload_via_api("v3/results.json", iter(results), max_workers=4, shard_size=8192)
+
+    uploaded = fake_uploader.uploaded
+    assert len(uploaded) > 1
+    assert all(attempts == 3 for attempts in fake_uploader.attempts.values())
+    assert "v3/results.json" in uploaded and "v3/results_part1.json" in uploaded
+
+    rows = []
+    for index in range(len(uploaded)):
+        s3_path = "v3/results.json" if index == 0 else f"v3/results_part{index}.json"
+        assert len(uploaded[s3_path]) <= 8192
+        rows.extend(json.loads(row) for row in uploaded[s3_path].split("\n"))
+    assert rows == results
+
+
+def test_upload_via_api_failure(fake_uploader):
+    fake_uploader.failures = 100
+    with pytest.raises(RuntimeError):
+        upload_via_api("v3/results.json", fake_results(10))
+
+
+def test_upload_dedup_manifest(fake_uploader, monkeypatch, tmp_path):
+    fake_uploader.failures = 0
+    monkeypatch.setattr(upload_benchmark_results, "UPLOADER_USERNAME", "username")
+    monkeypatch.setattr(upload_benchmark_results, "UPLOADER_PASSWORD", "password")
+    shard_json_each_row = upload_benchmark_results.shard_json_each_row
+    monkeypatch.setattr(
+        upload_benchmark_results,
+        "shard_json_each_row",
+        lambda results, _: shard_json_each_row(results, 8192),
+    )
+    manifest_file = str(tmp_path / "manifest.json")
+
+    def upload_results(results, fingerprint):
+        manifest = UploadManifest(manifest_file)
+        upload(
+            "vllm-project/vllm",
+            "main",
+            "abc",
+            results,
+            "H100",
+            "",
+            dry_run=False,
+            manifest=manifest,
+            fingerprint=fingerprint,
+        )
+        return manifest.bytes_avoided
+
+    def total_attempts():
+        return sum(fake_uploader.attempts.values())
+
+    results = fake_results(200)
+    assert upload_results(results, "first") == 0
+    uploaded = total_attempts()
+    assert uploaded > 1
+
+    # Rerun with the same benchmark results
+    bytes_avoided = upload_results(results, "first")
+    assert bytes_avoided == sum(len(c) for c in fake_uploader.uploaded.values())
+    assert total_attempts() == uploaded
+
+    # Only the last shard has changed
+    results[-1]["metric"]["benchmark_values"] = [0]
+    assert upload_results(results, "second") > 0
+    assert total_attempts() == uploaded + 1
+    assert upload_results(results, "second") > 0
+    assert total_attempts() == uploaded + 1
+
+    # A rerun of the job only changes the volatile metadata, so the fingerprint
+    # doesn't match but all the shards are skipped
+    def with_metadata(run_attempt):
+        metadata = {"run_attempt": run_attempt, "job_id": run_attempt}
+        return aggregate(metadata, {"name": "cuda"}, {"serving.json": results})
+
+    upload_results(with_metadata(1), "third")
+    uploaded = total_attempts()
+    assert upload_results(with_metadata(2), "fourth") > 0
+    assert total_attempts() == uploaded
+
+    # The same results are still uploaded to another destination
+    s3_uploads = []
+    s3 = FakeS3Resource()
+    monkeypatch.setattr(upload_benchmark_results.boto3, "resource", lambda _: s3)
+    monkeypatch.setattr(
+        s3,
+        "Object",
+        lambda bucket, key: s3_uploads.append(key) or FakeS3Object(bucket, key),
+    )
+    s3_path = "v3/vllm-project/vllm/main/abc/H100/benchmark_results.json"
+    manifest = UploadManifest(manifest_file)
+    for run_attempt in [1, 2]:
+        upload_benchmark_results.upload_results(
+            s3_path,
+            with_metadata(run_attempt),
+            dry_run=False,
+            manifest=manifest,
+            fingerprint="fourth",
+            destination="s3",
+        )
+    assert s3_uploads == [s3_path]
+
+
+def test_watch_zeroed_results(tmp_path, monkeypatch):
+    monkeypatch.setattr("signal.signal", lambda *args: None)
+    results_dir = tmp_path / "results"
+    results_dir.mkdir()
+    for filename, values in [("zeroed.json", [0, 0]), ("ok.json", [1.0, 0])]:
+        (results_dir / filename).write_text(
+            json.dumps(
+                [{"benchmark": {}, "metric": {"name": "x", "benchmark_values": values}}]
+            )
+        )
+    stop_file = tmp_path / "stop"
+    stop_file.write_text("")
+
+    written = []
+
+    class FakeSink(ResultSink):
+        name = "fake"
+
+        def write(self, s3_path, benchmark_results, fingerprint=None):
+            written.extend(benchmark_results)
+
+    # The zeroed results of a failed run are not uploaded
+    assert watch(
+        str(results_dir),
+        "benchmark_results.json",
+        {},
+        [FakeSink()],
+        dry_run=False,
+        poll_interval=0.05,
+        stop_file=str(stop_file),
+    )
+    assert written == ["ok.json"]
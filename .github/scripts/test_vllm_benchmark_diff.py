@@ -0,0 +1,95 @@
+import json
+import subprocess
+
+from vllm_benchmark_diff import diff_configs, get_affected_models
+
+
+def git(repo_dir: str, *args: str) -> str:
+    return subprocess.check_output(
+        ["git", "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+        cwd=repo_dir,
+        text=True,
+    ).strip()
+
+
+def serving_config(model: str, tp: int, num_prompts: int = 200) -> dict:
+    return {
+        "test_name": f"serving_{model}_tp{tp}",
+        "server_parameters": {"model": model, "tensor_parallel_size": tp},
+        "client_parameters": {"model": model, "num_prompts": num_prompts},
+    }
+
+
+def test_diff_configs():
+    old = [serving_config("Qwen/Qwen3-8B", 1), serving_config("facebook/opt-125m", 1)]
+    # Reordered and reformatted, nothing has changed
+    reformatted = json.loads(json.dumps(list(reversed(old)), indent=4))
+    assert diff_configs(old, reformatted) == set()
+
+    new = [
+        serving_config("Qwen/Qwen3-8B", 1, num_prompts=500),
+        serving_config("facebook/opt-125m", 1),
+    ]
+    assert diff_configs(old, new) == {"qwen/qwen3-8b"}
+    assert diff_configs(old, old + [serving_config("foo/bar", 8)]) == {"foo/bar"}
+    assert diff_configs([], old) == {"qwen/qwen3-8b", "facebook/opt-125m"}
+
+
+def test_affected_models(tmp_path):
+    repo_dir = str(tmp_path)
+    git(repo_dir, "init", "-q", "-b", "main")
+    configs_dir = tmp_path / "vllm-benchmarks/benchmarks"
+    (configs_dir / "cuda").mkdir(parents=True)
+    (configs_dir / "rocm").mkdir()
+    (tmp_path / ".github/scripts").mkdir(parents=True)
+    serving = configs_dir / "cuda/serving-tests.json"
+    serving.write_text(
+        json.dumps(
+            [serving_config("Qwen/Qwen3-8B", 1), serving_config("facebook/opt-125m", 1)]
+        )
+    )
+    (configs_dir / "rocm/serving-tests.json").write_text(
+        json.dumps([serving_config("Qwen/Qwen3-8B", 1)])
+    )
+    (tmp_path / ".github/scripts/setup_vllm_benchmark.py").write_text("")
+    git(repo_dir, "add", ".")
+    git(repo_dir, "commit", "-q", "-m", "base")
+    git(repo_dir, "checkout", "-q", "-b", "pr")
+
+    # Only the formatting has changed
+    serving.write_text(
+        json.dumps(
+            [serving_config("Qwen/Qwen3-8B", 1), serving_config("facebook/opt-125m", 1)],
+            indent=4,
+        )
+    )
+    git(repo_dir, "commit", "-q", "-am", "reformat")
+    assert get_affected_models(str(configs_dir), "main") == set()
+
+    serving.write_text(
+        json.dumps(
+            [serving_config("Qwen/Qwen3-8B", 2), serving_config("facebook/opt-125m", 1)]
+        )
+    )
+    (configs_dir / "rocm/latency-tests.json").write_text(
+        json.dumps([{"test_name": "latency", "parameters": {"model": "foo/bar"}}])
+    )
+    (tmp_path / "README.md").write_text("docs")
+    git(repo_dir, "add", ".")
+    git(repo_dir, "commit", "-q", "-m", "change")
+    assert get_affected_models(str(configs_dir), "main") == {
+        ("qwen/qwen3-8b", "cuda"),
+        ("foo/bar", "rocm"),
+    }
+
+    # The tests are shared by nothing
+    (tmp_path / ".github/scripts/test_setup_vllm_benchmark.py").write_text("")
+    git(repo_dir, "add", ".")
+    assert get_affected_models(str(configs_dir), "main") is not None
+
+    # The base ref isn't in the clone, e.g. a shallow clone of the pull request
+    assert get_affected_models(str(configs_dir), "0" * 40) is None
+
+    # An uncommitted change to a shared script runs everything
+    (tmp_path / ".github/scripts/setup_vllm_benchmark.py").write_text("# change")
+    assert get_affected_models(str(configs_dir), "main") is None
@@ -0,0 +1,103 @@
+import json
+import os
+
+import vllm_benchmark_index
+from setup_vllm_benchmark import setup_benchmark_configs
+from vllm_benchmark_index import get_config_files, get_platform_models, load_index
+
+
+def write_configs(path, configs) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(configs))
+
+
+def serving_config(model: str, tp: int) -> dict:
+    return {
+        "test_name": f"serving_{model}_tp{tp}",
+        "server_parameters": {"model": model, "tensor_parallel_size": tp},
+    }
+
+
+def test_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(vllm_benchmark_index, "CACHE_DIR", str(tmp_path / "cache"))
+    configs_dir = tmp_path / "benchmarks"
+    write_configs(
+        configs_dir / "cuda/serving-tests.json",
+        [
+            serving_config("Qwen/Qwen3-8B", 1),
+            serving_config("facebook/opt-125m", 1),
+            # Only the first config of a model sets its TP
+            serving_config("Qwen/Qwen3-8B", 2),
+        ],
+    )
+    write_configs(
+        configs_dir / "cuda/latency-tests.json",
+        [{"test_name": "latency", "parameters": {"model": "foo/bar", "tp": 4}}],
+    )
+    (configs_dir / "rocm").mkdir()
+    (configs_dir / "rocm/serving-tests.json").write_text("not json")
+
+    index = load_index(str(configs_dir))
+    assert get_platform_models(index, "cuda") == {
+        "qwen/qwen3-8b": 1,
+        "facebook/opt-125m": 1,
+    }
+    assert get_platform_models(index, "cuda", "latency") == {"foo/bar": 4}
+    assert get_platform_models(index, "rocm") == {}
+    assert index["models"]["foo/bar"] == {"cuda": {"latency-tests.json": 4}}
+    assert get_config_files(index, "cuda", {"foo/bar"}) == ["latency-tests.json"]
+    assert os.listdir(tmp_path / "cache")
+
+
+def test_index_invalidation(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(vllm_benchmark_index, "CACHE_DIR", str(tmp_path / "cache"))
+    configs_dir = tmp_path / "benchmarks"
+    serving = configs_dir / "cuda/serving-tests.json"
+    write_configs(serving, [serving_config("Qwen/Qwen3-8B", 1)])
+    write_configs(
+        configs_dir / "cuda/latency-tests.json",
+        [{"test_name": "latency", "parameters": {"model": "Qwen/Qwen3-8B"}}],
+    )
+
+    caplog.set_level("INFO")
+    load_index(str(configs_dir))
+    assert "Parse 2 out of 2" in caplog.text
+
+    # Nothing has changed
+    caplog.clear()
+    load_index(str(configs_dir))
+    assert "Parse 0 out of 2" in caplog.text
+
+    # Touched but the same content, e.g. a fresh checkout
+    caplog.clear()
+    stat = os.stat(serving)
+    os.utime(serving, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_index(str(configs_dir))
+    assert "Parse 0 out of 2" in caplog.text
+
+    caplog.clear()
+    write_configs(serving, [serving_config("Qwen/Qwen3-8B", 4)])
+    os.utime(serving, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+    index = load_index(str(configs_dir))
+    assert "Parse 1 out of 2" in caplog.text
+    assert get_platform_models(index, "cuda") == {"qwen/qwen3-8b": 4}
+
+
+def test_setup_benchmark_configs(tmp_path, monkeypatch):
+    monkeypatch.setattr(vllm_benchmark_index, "CACHE_DIR", str(tmp_path / "cache"))
+    configs_dir = tmp_path / "benchmarks"
+    write_configs(
+        configs_dir / "cuda/serving-tests.json",
+        [serving_config("Qwen/Qwen3-8B", 1), serving_config("facebook/opt-125m", 1)],
+    )
+    write_configs(
+        configs_dir / "cuda/latency-tests.json",
+        [{"test_name": "latency", "parameters": {"model": "foo/bar"}}],
+    )
+    to_dir = tmp_path / "tests"
+    to_dir.mkdir()
+
+    setup_benchmark_configs(str(configs_dir), str(to_dir), ["qwen/qwen3-8b"], "cuda")
+    assert os.listdir(to_dir) == ["serving-tests.json"]
+    configs = json.loads((to_dir / "serving-tests.json").read_text())
+    assert [c["test_name"] for c in configs] == ["serving_Qwen/Qwen3-8B_tp1"]
@@ -0,0 +1,79 @@
+from vllm_benchmark_placement import (
+    estimate_memory,
+    get_bytes_per_parameter,
+    get_model_parameters,
+    place_model,
+)
+
+H100 = "mt-l-x86iamx-22-225-h100"
+H100_4 = "mt-l-x86iamx-88-900-h100-4"
+H100_8 = "mt-l-bx86iamx-176-1800-h100-8"
+B200 = "linux.dgx.b200"
+B200_8 = "linux.dgx.b200.8"
+
+
+def make_test(model: str, tp: int = 1, **kwargs) -> dict:
+    return {"test_name": model, "model": model, "tp": tp, **kwargs}
+
+
+def test_estimate_memory():
+    assert get_model_parameters("qwen/qwen3-8b") == 8
+    assert get_model_parameters("qwen/qwen3-30b-a3b") == 30.5
+    assert get_model_parameters("meta-llama/llama-3.1-70b-instruct") == 70
+    assert get_model_parameters("facebook/opt-125m") == 0.125
+    assert get_model_parameters("foo/bar") is None
+
+    assert get_bytes_per_parameter(make_test("qwen/qwen3-8b")) == 2
+    assert get_bytes_per_parameter(make_test("qwen/qwen3-8b", dtype="float32")) == 4
+    # The dtype of the config doesn't change the size of a quantized checkpoint
+    int4 = make_test("pytorch/gemma-3-27b-it-int4", dtype="bfloat16")
+    assert get_bytes_per_parameter(int4) == 0.5
+    fp8 = make_test("deepseek-ai/deepseek-r1", dtype="bfloat16")
+    assert get_bytes_per_parameter(fp8) == 1
+
+    short = estimate_memory(make_test("qwen/qwen3-8b", max_model_len=2048))
+    long = estimate_memory(make_test("qwen/qwen3-8b", max_model_len=32768))
+    assert short["weights"] == long["weights"] == 16
+    assert short["kv_cache"] * 16 == long["kv_cache"]
+    assert estimate_memory(make_test("foo/bar")) is None
+
+
+def test_place_model():
+    runners = [H100, H100_4, H100_8, B200, B200_8]
+
+    # The smallest runner that fits
+    model = "qwen/qwen3-8b"
+    runner, reasons = place_model(model, [make_test(model)], runners)
+    assert runner == H100
+    assert not any("WASTED" in reason for reason in reasons)
+
+    # There is no 2xH100 runner, so half of the 4xH100 one is idle
+    model = "mistralai/mixtral-8x7b-instruct-v0.1"
+    runner, reasons = place_model(model, [make_test(model, 2)], runners)
+    assert runner == H100_4
+    assert "WASTED: 2 out of 4 devices are idle" in reasons[-1]
+
+    # Too big for the H100s
+    model = "deepseek-ai/deepseek-r1"
+    runner, reasons = place_model(model, [make_test(model, 8)], runners)
+    assert runner == B200_8
+    assert any(reason.startswith(f"  {H100_8}: only") for reason in reasons)
+
+    # A small model with a large TP
+    model = "google/gemma-3-27b-it"
+    runner, reasons = place_model(model, [make_test(model, 8)], [B200, B200_8])
+    assert runner == B200_8
+    assert reasons[-1].endswith("it would fit with TP 1")
+
+    # All the tests of the model need to fit
+    model = "meta-llama/llama-3.1-8b-instruct"
+    runner, _ = place_model(model, [make_test(model, 1), make_test(model, 2)], runners)
+    assert runner == H100_4
+
+    runner, reasons = place_model(model, [make_test(model)], [H100], set([H100]))
+    assert runner is None
+    assert reasons[1:] == [f"  {H100}: skipped by PLATFORM_SKIPS", "  no runner fits"]
+
+    # Only the device count is checked when the size is unknown
+    runner, _ = place_model("foo/bar", [make_test("foo/bar", 4)], runners)
+    assert runner == H100_4
@@ -2,29 +2,37 @@
 
 import itertools
 import requests
-import glob
 import gzip
+import hashlib
 import json
 import logging
 import os
-import platform
-import socket
+import random
+import signal
 import sys
+import threading
 import time
 from argparse import Action, ArgumentParser, Namespace
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from logging import info, warning
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from json.decoder import JSONDecodeError
 
 import boto3
-import psutil
 
-try:
-    import torch
-
-    torch_available = True
-except ImportError:
-    torch_available = False
+from benchmark_results import load_benchmark_results
+from check_benchmark_results import check_results
+from result_sinks import ResultSink, SQLiteSink
+from results_watcher import ResultsWatcher
+from runner_info import get_runner_info
+from upload_manifest import (
+    UploadManifest,
+    get_file_hashes,
+    get_shard_hash,
+    get_upload_fingerprint,
+    get_upload_key,
+    update_content_hash,
+)
 
 from git import Repo
 
@@ -34,6 +42,38 @@ S3_BUCKET = "ossci-benchmarks"
 UPLOADER_URL = "https://kvvka55vt7t2dzl6qlxys72kra0xtirv.lambda-url.us-east-1.on.aws"
 UPLOADER_USERNAME = os.environ.get("UPLOADER_USERNAME")
 UPLOADER_PASSWORD = os.environ.get("UPLOADER_PASSWORD")
+# Lambda function URLs reject payloads larger than 6MB, so keep each request well
+# below that after the content is escaped into the JSON body
+UPLOADER_SHARD_SIZE = 4 * 1024 * 1024
+UPLOADER_MAX_WORKERS = 4
+UPLOADER_MAX_RETRIES = 5
+UPLOADER_BACKOFF_SECONDS = 1.0
+UPLOADER_TIMEOUT = 300
+UPLOADER_RETRYABLE_STATUS_CODES = set([429, 500, 502, 503, 504])
+# S3 requires all parts of a multipart upload except the last one to be at least
+# 5MB. This is also the upper bound of compressed data that is kept in memory
+S3_MULTIPART_PART_SIZE = 8 * 1024 * 1024
+# The compact encoding is uploaded under its own prefix, so that it's not mixed up
+# with the regular v3 rows
+COMPACT_SCHEMA_VERSION = "v3_compact"
+# The number of most recent commits across all branches to index when looking for
+# the branch of a detached HEAD. Set it to 0 to walk the whole history of every
+# branch instead
+BRANCH_SEARCH_DEPTH = 10000
+WATCH_POLL_INTERVAL = 5.0
+CACHE_DIR = os.environ.get(
+    "BENCHMARK_UPLOAD_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "pytorch-integration-testing"),
+)
+SQLITE_DB = os.path.join(CACHE_DIR, "benchmark_results.db")
+# The remote sink picks the API or S3 the same way as before
+REMOTE_SINKS = set(
+    [
+        "remote",
+        "api",
+        "s3",
+    ]
+)
 
 
 class ValidateDir(Action):
@@ -78,6 +118,12 @@ def parse_args() -> Any:
         type=str,
         help="the commit SHA the benchmark runs on",
     )
+    parser.add_argument(
+        "--branch-search-depth",
+        type=int,
+        default=BRANCH_SEARCH_DEPTH,
+        help="the number of recent commits to index when finding the branch of a detached HEAD, 0 to search the whole history",
+    )
 
     # Benchmark info
     parser.add_argument(
@@ -93,6 +139,16 @@ def parse_args() -> Any:
         action=ValidateDir,
         help="the directory with the benchmark results",
     )
+    parser.add_argument(
+        "--max-workers",
+        type=int,
+        help="the number of processes used to parse the benchmark results, default to the number of CPUs",
+    )
+    parser.add_argument(
+        "--parse-cache",
+        type=str,
+        help="reuse the parsed benchmark results written by check_benchmark_results.py for unchanged files",
+    )
 
     # Device info
     parser.add_argument(
@@ -114,15 +170,116 @@ def parse_args() -> Any:
         type=str,
         help="the optional name of model to add to S3 path",
     )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="upload the shared metadata and runner info once in a header record instead of repeating them in every row",
+    )
+    parser.add_argument(
+        "--upload-workers",
+        type=int,
+        default=UPLOADER_MAX_WORKERS,
+        help="the number of concurrent requests when uploading via the API",
+    )
+    parser.add_argument(
+        "--dedup-manifest",
+        type=str,
+        help="a local JSON file or an s3:// path to keep track of what has been uploaded, so that reruns skip unchanged uploads and shards",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep uploading new benchmark results as they are written until SIGTERM, SIGINT, or --watch-stop-file",
+    )
+    parser.add_argument(
+        "--watch-poll-interval",
+        type=float,
+        default=WATCH_POLL_INTERVAL,
+        help="how often to check for new benchmark results in watch mode when inotify is not available",
+    )
+    parser.add_argument(
+        "--watch-stop-file",
+        type=str,
+        help="stop watching once this file exists",
+    )
+    parser.add_argument(
+        "--sinks",
+        type=str,
+        default="remote",
+        help="the comma-separated list of destinations: remote (api if its credentials are set, s3 otherwise), api, s3, sqlite",
+    )
+    parser.add_argument(
+        "--sqlite-db",
+        type=str,
+        default=SQLITE_DB,
+        help="the local SQLite database used by the sqlite sink",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
+        help="only write to the local sinks, i.e. sqlite",
     )
 
     return parser.parse_args()
 
 
-def get_git_metadata(repo_dir: str) -> Tuple[str, str]:
+def build_commit_branch_index(repo: Repo, depth: int) -> Dict[str, str]:
+    """
+    Map the most recent commits across all branches to the first branch that
+    reaches them. This is done in one git log pass instead of walking the history
+    of every branch one by one
+    """
+    refs = repo.git.for_each_ref(
+        "--format=%(refname)", "refs/heads", "refs/remotes", "refs/tags"
+    ).splitlines()
+    if not refs:
+        return {}
+
+    index = {}
+    for line in repo.git.log(
+        "--source", "--format=%H %S", f"--max-count={depth}", *refs
+    ).splitlines():
+        hexsha, _, refname = line.partition(" ")
+        for prefix in ("refs/heads/", "refs/remotes/", "refs/tags/"):
+            if refname.startswith(prefix):
+                refname = refname[len(prefix) :]
+                break
+        index.setdefault(hexsha, refname)
+    return index
+
+
+def find_branch(repo: Repo, hexsha: str, depth: int) -> Optional[str]:
+    """
+    Find the branch of the commit using the commit to branch index, which is
+    cached on disk by repo and HEAD so that it is built only once per checkout
+    """
+    cache_key = hashlib.sha256(
+        f"{os.path.realpath(repo.working_dir)}:{hexsha}:{depth}".encode()
+    ).hexdigest()
+    cache_file = os.path.join(CACHE_DIR, f"branch-index-{cache_key}.json")
+
+    if os.path.exists(cache_file):
+        info(f"Load commit to branch index from {cache_file}")
+        with open(cache_file) as f:
+            try:
+                return json.load(f).get(hexsha)
+            except JSONDecodeError as e:
+                warning(f"Fail to load {cache_file}: {e}")
+
+    index = build_commit_branch_index(repo, depth)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(cache_file, "w") as f:
+            json.dump(index, f)
+    except OSError as e:
+        warning(f"Fail to cache the commit to branch index in {cache_file}: {e}")
+
+    return index.get(hexsha)
+
+
+def get_git_metadata(
+    repo_dir: str, branch_search_depth: int = BRANCH_SEARCH_DEPTH
+) -> Tuple[str, str]:
     repo = Repo(repo_dir)
     # Git metadata, an example remote URL is https://github.com/vllm-project/vllm.git
     # and we want the vllm-project/vllm part
@@ -141,11 +298,16 @@ def get_git_metadata(repo_dir: str) -> Tuple[str, str]:
         )
     except TypeError as e:
         # This is a detached HEAD, try to find out where the commit comes from
-        for head in itertools.chain(repo.heads, repo.refs):
-            info(f"Check commits from {head.name}")
-            for commit in repo.iter_commits(head):
-                if commit.hexsha == hexsha:
-                    return repo_name, head.name, hexsha, committed_date
+        if branch_search_depth > 0:
+            branch = find_branch(repo, hexsha, branch_search_depth)
+            if branch:
+                return repo_name, branch, hexsha, committed_date
+        else:
+            for head in itertools.chain(repo.heads, repo.refs):
+                info(f"Check commits from {head.name}")
+                for commit in repo.iter_commits(head):
+                    if commit.hexsha == hexsha:
+                        return repo_name, head.name, hexsha, committed_date
 
         warning(f"Found no branch name, default to main: {e}")
         # We couldn't find the branch name
@@ -173,88 +335,31 @@ def get_benchmark_metadata(
     }
 
 
-def get_runner_info(device_name: str, device_type: str) -> Dict[str, Any]:
-    if torch_available and torch.cuda.is_available():
-        if torch.version.hip:
-            name = "rocm"
-        elif torch.version.cuda:
-            name = "cuda"
-        type = torch.cuda.get_device_name()
-        gpu_info = torch.cuda.get_device_name()
-        gpu_count = torch.cuda.device_count()
-        avail_gpu_mem_in_gb = int(
-            torch.cuda.get_device_properties(0).total_memory / (1024 * 1024 * 1024)
-        )
-    else:
-        name = device_name
-        type = device_type
-        gpu_info = ""
-        gpu_count = 0
-        avail_gpu_mem_in_gb = 0
+def is_valid(file: str, r: List[Dict[str, Any]]) -> bool:
+    if not r:
+        warning(f"{file} is empty")
+        return False
 
-    return {
-        "name": name,
-        "type": type,
-        "cpu_info": platform.processor(),
-        "cpu_count": psutil.cpu_count(),
-        "avail_mem_in_gb": int(psutil.virtual_memory().total / (1024 * 1024 * 1024)),
-        "gpu_info": gpu_info,
-        "gpu_count": gpu_count,
-        "avail_gpu_mem_in_gb": avail_gpu_mem_in_gb,
-        "extra_info": {
-            "hostname": socket.gethostname(),
-        },
-    }
+    if type(r) is not list or "benchmark" not in r[0]:
+        warning(f"Find no PyTorch benchmark results in {file}")
+        return False
 
+    return True
 
-def read_benchmark_results(filepath: str) -> List[Dict[str, Any]]:
-    results = []
-    with open(filepath) as f:
-        try:
-            r = json.load(f)
-            # Handle the JSONEachRow case where there is only one record in the
-            # JSON file, it can still be loaded normally, but will need to be
-            # added into the list of benchmark results with the length of 1
-            if isinstance(r, dict):
-                results.append(r)
-            elif isinstance(r, list):
-                results = r
-
-        except JSONDecodeError:
-            f.seek(0)
-
-            # Try again in ClickHouse JSONEachRow format
-            for line in f:
-                try:
-                    r = json.loads(line)
-                    # Each row needs to be a dictionary in JSON format or a list
-                    if isinstance(r, dict):
-                        results.append(r)
-                    elif isinstance(r, list):
-                        results.extend(r)
-                    else:
-                        warning(f"Not a JSON dict or list {line}, skipping")
-                        continue
-
-                except JSONDecodeError:
-                    warning(f"Invalid JSON {line}, skipping")
 
-    return results
-
-
-def load(benchmark_results_dir: str) -> Dict[str, List]:
+def load(
+    benchmark_results_dir: str,
+    max_workers: Optional[int] = None,
+    parse_cache: Optional[str] = None,
+) -> Dict[str, List]:
     results = {}
 
-    for file in glob.glob(f"{benchmark_results_dir}/*.json"):
+    for file, r in load_benchmark_results(
+        benchmark_results_dir, max_workers, parse_cache
+    ).items():
         filename = os.path.basename(file)
-        r = read_benchmark_results(file)
-
-        if not r:
-            warning(f"{file} is empty")
-            continue
 
-        if type(r) is not list or "benchmark" not in r[0]:
-            warning(f"Find no PyTorch benchmark results in {file}")
+        if not is_valid(file, r):
             continue
 
         info(f"Loading benchmark results from {file}")
@@ -275,20 +380,206 @@ def aggregate(
     return aggregated_results
 
 
-def upload_s3(s3_path: str, data: str) -> None:
-    boto3.resource("s3").Object(
-        f"{S3_BUCKET}",
-        f"{s3_path}",
-    ).put(
-        Body=gzip.compress(data.encode()),
-        ContentEncoding="gzip",
-        ContentType="application/json",
+def aggregate_compact(
+    metadata: Dict[str, Any], runner: Dict[str, Any], benchmark_results: Dict[str, List]
+) -> List[Dict[str, Any]]:
+    """
+    The compact encoding has one header record with the metadata and the runner
+    shared by all results, followed by the results as they are. Use expand_compact
+    to get back the same rows as aggregate
+    """
+    aggregated_results: List[Dict[str, Any]] = [
+        {
+            "schema_version": COMPACT_SCHEMA_VERSION,
+            "metadata": metadata,
+            "runners": [runner],
+        }
+    ]
+    for _, results in benchmark_results.items():
+        aggregated_results.extend(results)
+    return aggregated_results
+
+
+def is_compact_header(record: Dict[str, Any]) -> bool:
+    return record.get("schema_version") == COMPACT_SCHEMA_VERSION and "metadata" in record
+
+
+def expand_compact(records: Iterable[Dict[str, Any]]) -> Iterable[Dict[str, Any]]:
+    """
+    Turn the compact encoding back into v3 rows. A header applies to all the rows
+    after it until the next header, so concatenated compact blobs are fine too
+    """
+    header = None
+    for record in records:
+        if is_compact_header(record):
+            header = record
+            continue
+
+        if header is None:
+            raise ValueError("Find a compact benchmark result before any header")
+
+        r: Dict[str, Any] = {**header["metadata"], **record}
+        r["runners"] = header["runners"]
+        yield r
+
+
+class S3MultipartWriter:
+    """
+    A write-only file-like object that buffers at most one part in memory and
+    sends it to S3 as soon as it is full. If the whole payload fits into one
+    part, it is uploaded with a single put request instead
+    """
+
+    def __init__(self, s3_object: Any, part_size: int = S3_MULTIPART_PART_SIZE):
+        self.s3_object = s3_object
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.multipart_upload: Any = None
+        self.parts: List[Dict[str, Any]] = []
+        # Keep track of what is sent for the upload manifest
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.buffer.extend(data)
+        self.sha256.update(data)
+        self.size += len(data)
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(bytes(self.buffer[: self.part_size]))
+            del self.buffer[: self.part_size]
+        return len(data)
+
+    def flush(self) -> None:
+        # Parts are only sent when they are full or when the upload completes
+        pass
+
+    def _upload_part(self, body: bytes) -> None:
+        if self.multipart_upload is None:
+            self.multipart_upload = self.s3_object.initiate_multipart_upload(
+                ContentEncoding="gzip",
+                ContentType="application/json",
+            )
+
+        part_number = len(self.parts) + 1
+        r = self.multipart_upload.Part(part_number).upload(Body=body)
+        self.parts.append({"ETag": r["ETag"], "PartNumber": part_number})
+
+    def complete(self) -> None:
+        if self.multipart_upload is None:
+            self.s3_object.put(
+                Body=bytes(self.buffer),
+                ContentEncoding="gzip",
+                ContentType="application/json",
+            )
+        else:
+            if self.buffer:
+                self._upload_part(bytes(self.buffer))
+            self.multipart_upload.complete(MultipartUpload={"Parts": self.parts})
+        self.buffer = bytearray()
+
+    def abort(self) -> None:
+        if self.multipart_upload is not None:
+            self.multipart_upload.abort()
+
+
+def write_json_each_row(f: Any, results: Iterable[Dict[str, Any]]) -> None:
+    """
+    Serialize the results one record at a time in JSONEachRow format, so that
+    the whole JSON text is never materialized in memory
+    """
+    for i, r in enumerate(results):
+        if i:
+            f.write(b"\n")
+        f.write(json.dumps(r).encode())
+
+
+def upload_s3(
+    s3_path: str,
+    results: Iterable[Dict[str, Any]],
+    part_size: int = S3_MULTIPART_PART_SIZE,
+    manifest: Optional[UploadManifest] = None,
+) -> List[str]:
+    writer = S3MultipartWriter(
+        boto3.resource("s3").Object(
+            f"{S3_BUCKET}",
+            f"{s3_path}",
+        ),
+        part_size,
     )
+    # The compressed bytes change with the volatile metadata and the gzip header,
+    # so the manifest keeps the hash of the rows instead
+    content_hash = hashlib.sha256()
 
+    def hash_rows(results: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        for r in results:
+            update_content_hash(content_hash, r)
+            yield r
 
-def upload_via_api(
+    try:
+        with gzip.GzipFile(fileobj=writer, mode="wb") as gz:
+            write_json_each_row(gz, hash_rows(results) if manifest else results)
+        writer.complete()
+    except Exception:
+        writer.abort()
+        raise
+
+    if manifest:
+        manifest.record_shard(
+            get_upload_key("s3", s3_path),
+            s3_path,
+            content_hash.hexdigest(),
+            writer.size,
+        )
+    return [s3_path]
+
+
+def create_uploader_session(max_workers: int) -> requests.Session:
+    """
+    Keep the connections to the uploader alive and share them across the workers
+    """
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def shard_json_each_row(
+    results: Iterable[Dict[str, Any]], shard_size: int = UPLOADER_SHARD_SIZE
+) -> Iterator[str]:
+    """
+    Split the results in JSONEachRow format into shards of at most shard_size
+    bytes. A shard always has at least one row even if it is larger than that
+    """
+    rows: List[str] = []
+    size = 0
+    for r in results:
+        row = json.dumps(r)
+        if rows and size + len(row) > shard_size:
+            yield "\n".join(rows)
+            rows, size = [], 0
+        rows.append(row)
+        # Count the new line between the rows
+        size += len(row) + 1
+
+    if rows:
+        yield "\n".join(rows)
+
+
+def get_shard_path(s3_path: str, index: int) -> str:
+    # The first shard keeps the original path, so nothing changes when the results
+    # fit into one request
+    if index == 0:
+        return s3_path
+    base, ext = os.path.splitext(s3_path)
+    return f"{base}_part{index}{ext}"
+
+
+def post_with_retry(
+    session: requests.Session,
     s3_path: str,
     data: str,
+    max_retries: int = UPLOADER_MAX_RETRIES,
 ) -> None:
     json_data = {
         "username": UPLOADER_USERNAME,
@@ -299,33 +590,313 @@ def upload_via_api(
 
     headers = {"content-type": "application/json"}
 
-    r = requests.post(UPLOADER_URL, json=json_data, headers=headers)
-    info(r.content)
+    error = ""
+    for attempt in range(max_retries + 1):
+        retry_after = None
+        try:
+            r = session.post(
+                UPLOADER_URL, json=json_data, headers=headers, timeout=UPLOADER_TIMEOUT
+            )
+        except (requests.ConnectionError, requests.Timeout) as e:
+            error = str(e)
+        else:
+            if r.status_code not in UPLOADER_RETRYABLE_STATUS_CODES:
+                r.raise_for_status()
+                info(f"Upload {s3_path}: {r.content}")
+                return
 
+            error = f"HTTP {r.status_code} {r.content}"
+            retry_after = r.headers.get("Retry-After")
 
-def upload(
+        if attempt == max_retries:
+            break
+
+        # Exponential backoff with jitter unless the server says how long to wait
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = UPLOADER_BACKOFF_SECONDS * (2**attempt) * (1 + random.random())
+        warning(f"Fail to upload {s3_path} ({error}), retry in {delay:.1f}s")
+        time.sleep(delay)
+
+    raise RuntimeError(
+        f"Fail to upload {s3_path} after {max_retries + 1} attempts: {error}"
+    )
+
+
+def upload_via_api(
+    s3_path: str,
+    results: Iterable[Dict[str, Any]],
+    max_workers: int = UPLOADER_MAX_WORKERS,
+    shard_size: int = UPLOADER_SHARD_SIZE,
+    manifest: Optional[UploadManifest] = None,
+) -> List[str]:
+    """
+    Upload the results in size-bounded shards concurrently. Only a few shards are
+    in flight at any time to keep the memory usage bounded. The shards that are
+    already in the upload manifest with the same content are skipped
+    """
+
+    def upload_shard(shard_path: str, data: str, sha256: str) -> None:
+        post_with_retry(session, shard_path, data)
+        if manifest:
+            manifest.record_shard(upload_key, shard_path, sha256, len(data))
+
+    upload_key = get_upload_key("api", s3_path)
+
+    session = create_uploader_session(max_workers)
+    shard_paths = []
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: Set[Future] = set()
+        for index, data in enumerate(shard_json_each_row(results, shard_size)):
+            shard_path = get_shard_path(s3_path, index)
+            shard_paths.append(shard_path)
+
+            sha256 = ""
+            if manifest:
+                sha256 = get_shard_hash(data)
+                if manifest.is_shard_uploaded(upload_key, shard_path, sha256):
+                    info(f"Skip {shard_path}, it has been uploaded before")
+                    continue
+
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+
+            pending.add(executor.submit(upload_shard, shard_path, data, sha256))
+
+        for future in pending:
+            future.result()
+
+    return shard_paths
+
+
+def get_s3_path(
     repo_name: str,
     head_branch: str,
     head_sha: str,
-    aggregated_results: List[Dict[str, Any]],
     device_type: str,
     model: str,
+    compact: bool = False,
+) -> str:
+    model_suffix = f"_{model}" if model else ""
+    schema_version = COMPACT_SCHEMA_VERSION if compact else "v3"
+    return f"{schema_version}/{repo_name}/{head_branch}/{head_sha}/{device_type}/benchmark_results{model_suffix}.json"
+
+
+def get_file_s3_path(s3_path: str, filename: str) -> str:
+    """
+    In watch mode, each benchmark results file is uploaded on its own
+    """
+    base, ext = os.path.splitext(s3_path)
+    return f"{base}_{os.path.splitext(filename)[0]}{ext}"
+
+
+def upload_results(
+    s3_path: str,
+    aggregated_results: Iterable[Dict[str, Any]],
     dry_run: bool = True,
+    upload_workers: int = UPLOADER_MAX_WORKERS,
+    manifest: Optional[UploadManifest] = None,
+    fingerprint: Optional[str] = None,
+    destination: Optional[str] = None,
 ) -> None:
-    model_suffix = f"_{model}" if model else ""
-    s3_path = f"v3/{repo_name}/{head_branch}/{head_sha}/{device_type}/benchmark_results{model_suffix}.json"
+    """
+    Upload to the API or directly to S3. When the destination is not set, the API
+    is used if its credentials are set
+    """
+    if not destination:
+        destination = "api" if UPLOADER_USERNAME and UPLOADER_PASSWORD else "s3"
 
     info(f"Upload benchmark results to {s3_path}")
     if not dry_run:
-        # Write in JSONEachRow format
-        data = "\n".join([json.dumps(r) for r in aggregated_results])
+        upload_key = get_upload_key(destination, s3_path)
+        if manifest and fingerprint and manifest.is_uploaded(upload_key, fingerprint):
+            info(
+                f"Skip {s3_path}, the same benchmark results have been uploaded to {destination} before"
+            )
+            manifest.report()
+            return
 
-        if UPLOADER_USERNAME and UPLOADER_PASSWORD:
-            # If the username and password are set, try to use the API (preferable)
-            upload_via_api(s3_path, data)
+        try:
+            if destination == "api":
+                shard_paths = upload_via_api(
+                    s3_path, aggregated_results, upload_workers, manifest=manifest
+                )
+            else:
+                # The results are compressed and sent in parts as they are serialized
+                shard_paths = upload_s3(s3_path, aggregated_results, manifest=manifest)
+
+            if manifest:
+                manifest.record_upload(upload_key, fingerprint, shard_paths)
+        finally:
+            # Also keep the shards that made it when the upload fails
+            if manifest:
+                manifest.save()
+                manifest.report()
+
+
+class RemoteSink(ResultSink):
+    """
+    Aggregate the benchmark results into v3 rows, or the compact encoding, and
+    upload them to the API or S3
+    """
+
+    remote = True
+
+    def __init__(
+        self,
+        name: str,
+        metadata: Dict[str, Any],
+        runner: Dict[str, Any],
+        compact: bool = False,
+        upload_workers: int = UPLOADER_MAX_WORKERS,
+        manifest: Optional[UploadManifest] = None,
+    ):
+        self.name = name
+        self.metadata = metadata
+        self.runner = runner
+        self.compact = compact
+        self.upload_workers = upload_workers
+        self.manifest = manifest
+
+    def write(
+        self,
+        s3_path: str,
+        benchmark_results: Dict[str, List[Dict[str, Any]]],
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        if self.compact:
+            aggregated_results = aggregate_compact(
+                self.metadata, self.runner, benchmark_results
+            )
         else:
-            # Otherwise, try to upload directly to the bucket
-            upload_s3(s3_path, data)
+            aggregated_results = aggregate(self.metadata, self.runner, benchmark_results)
+
+        upload_results(
+            s3_path,
+            aggregated_results,
+            dry_run=False,
+            upload_workers=self.upload_workers,
+            manifest=self.manifest,
+            fingerprint=fingerprint,
+            destination=None if self.name == "remote" else self.name,
+        )
+
+
+def create_sinks(
+    sink_names: List[str],
+    metadata: Dict[str, Any],
+    runner: Dict[str, Any],
+    compact: bool = False,
+    upload_workers: int = UPLOADER_MAX_WORKERS,
+    manifest: Optional[UploadManifest] = None,
+    sqlite_db: str = SQLITE_DB,
+) -> List[ResultSink]:
+    sinks: List[ResultSink] = []
+    for name in sink_names:
+        if name in REMOTE_SINKS:
+            sinks.append(
+                RemoteSink(name, metadata, runner, compact, upload_workers, manifest)
+            )
+        elif name == SQLiteSink.name:
+            sinks.append(SQLiteSink(sqlite_db, metadata, runner))
+        else:
+            raise ValueError(f"Unknown sink {name}")
+    return sinks
+
+
+def write_to_sinks(
+    sinks: List[ResultSink],
+    s3_path: str,
+    benchmark_results: Dict[str, List[Dict[str, Any]]],
+    dry_run: bool = True,
+    fingerprint: Optional[str] = None,
+) -> None:
+    for sink in sinks:
+        # A dry run still writes to the local sinks
+        if dry_run and sink.remote:
+            info(f"Write benchmark results for {s3_path} to {sink.name} (dry run)")
+            continue
+        sink.write(s3_path, benchmark_results, fingerprint)
+
+
+def upload(
+    repo_name: str,
+    head_branch: str,
+    head_sha: str,
+    aggregated_results: List[Dict[str, Any]],
+    device_type: str,
+    model: str,
+    dry_run: bool = True,
+    compact: bool = False,
+    upload_workers: int = UPLOADER_MAX_WORKERS,
+    manifest: Optional[UploadManifest] = None,
+    fingerprint: Optional[str] = None,
+) -> None:
+    upload_results(
+        get_s3_path(repo_name, head_branch, head_sha, device_type, model, compact),
+        aggregated_results,
+        dry_run,
+        upload_workers,
+        manifest,
+        fingerprint,
+    )
+
+
+def watch(
+    benchmark_results_dir: str,
+    s3_path: str,
+    metadata: Dict[str, Any],
+    sinks: List[ResultSink],
+    dry_run: bool = True,
+    upload_workers: int = UPLOADER_MAX_WORKERS,
+    manifest: Optional[UploadManifest] = None,
+    poll_interval: float = WATCH_POLL_INTERVAL,
+    stop_file: Optional[str] = None,
+) -> bool:
+    """
+    Upload the benchmark results while the benchmark is still running, each file
+    is uploaded as soon as it's written. This runs until SIGTERM or SIGINT is
+    received or the stop file shows up
+    """
+    stop = threading.Event()
+    for signum in [signal.SIGTERM, signal.SIGINT]:
+        signal.signal(signum, lambda *_: stop.set())
+
+    if stop_file:
+
+        def wait_for_stop_file() -> None:
+            while not stop.wait(poll_interval):
+                if os.path.exists(stop_file):
+                    stop.set()
+
+        threading.Thread(target=wait_for_stop_file, daemon=True).start()
+
+    def upload_file(file: str, results: List[Dict[str, Any]]) -> None:
+        filename = os.path.basename(file)
+        file_s3_path = get_file_s3_path(s3_path, filename)
+
+        fingerprint = None
+        if manifest:
+            fingerprint = get_upload_fingerprint(
+                file_s3_path,
+                metadata,
+                get_file_hashes(benchmark_results_dir, [filename]),
+            )
+        write_to_sinks(sinks, file_s3_path, {filename: results}, dry_run, fingerprint)
+
+    # The same checks as check_benchmark_results.py, which isn't run before the
+    # files are uploaded in watch mode, so that the zeroed results of the failed
+    # runs are kept out of the database
+    return ResultsWatcher(
+        benchmark_results_dir,
+        lambda file, results: is_valid(file, results) and check_results(file, results),
+        upload_file,
+        max_workers=upload_workers,
+        poll_interval=poll_interval,
+    ).run(stop)
 
 
 def main() -> None:
@@ -335,7 +906,9 @@ def main() -> None:
             warning("No need to set --head-branch and --head-sha when using --repo")
             sys.exit(1)
 
-        repo_name, head_branch, head_sha, timestamp = get_git_metadata(args.repo)
+        repo_name, head_branch, head_sha, timestamp = get_git_metadata(
+            args.repo, args.branch_search_depth
+        )
     else:
         if not args.head_branch or not args.head_sha:
             warning(
@@ -356,22 +929,70 @@ def main() -> None:
     )
     runner = get_runner_info(args.device_name, args.device_type.replace("_", " "))
 
-    # Extract and aggregate the benchmark results
-    aggregated_results = aggregate(metadata, runner, load(args.benchmark_results))
-    if not aggregated_results:
-        warning(f"Find no benchmark results in {args.benchmark_results}")
-        sys.exit(1)
-
-    upload(
+    s3_path = get_s3_path(
         repo_name,
         head_branch,
         head_sha,
-        aggregated_results,
         args.device_type,
         args.model,
-        args.dry_run,
+        args.compact,
+    )
+    sink_names = [m.strip().lower() for m in args.sinks.split(",") if m.strip()]
+
+    manifest = None
+    if args.dedup_manifest or args.watch:
+        manifest = UploadManifest(
+            args.dedup_manifest or os.path.join(CACHE_DIR, "upload-manifest.json")
+        )
+    sinks = create_sinks(
+        sink_names,
+        metadata,
+        runner,
+        args.compact,
+        # In watch mode, the files are already uploaded concurrently, so send
+        # their shards one at a time
+        1 if args.watch else args.upload_workers,
+        manifest,
+        args.sqlite_db,
     )
 
+    try:
+        if args.watch:
+            succeeded = watch(
+                args.benchmark_results,
+                s3_path,
+                metadata,
+                sinks,
+                args.dry_run,
+                args.upload_workers,
+                manifest,
+                args.watch_poll_interval,
+                args.watch_stop_file,
+            )
+            manifest.save()
+            info(f"Write the upload manifest to {manifest.location}")
+            sys.exit(0 if succeeded else 1)
+
+        # Extract and aggregate the benchmark results
+        benchmark_results = load(
+            args.benchmark_results, args.max_workers, args.parse_cache
+        )
+        if not benchmark_results:
+            warning(f"Find no benchmark results in {args.benchmark_results}")
+            sys.exit(1)
+
+        fingerprint = None
+        if manifest:
+            fingerprint = get_upload_fingerprint(
+                s3_path,
+                metadata,
+                get_file_hashes(args.benchmark_results, benchmark_results.keys()),
+            )
+        write_to_sinks(sinks, s3_path, benchmark_results, args.dry_run, fingerprint)
+    finally:
+        for sink in sinks:
+            sink.close()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+
+import hashlib
+import json
+import os
+import threading
+from logging import info, warning
+from typing import Any, Dict, Iterable, Optional, Tuple
+from json.decoder import JSONDecodeError
+
+import boto3
+from botocore.exceptions import ClientError
+
+# Bump this when the layout of the manifest changes
+UPLOAD_MANIFEST_VERSION = 2
+# These metadata change on every rerun of the same job even though the benchmark
+# results are the same, so they are not part of the upload fingerprint nor of the
+# hashes of the shards
+VOLATILE_METADATA = set(
+    [
+        "timestamp",
+        "workflow_id",
+        "run_attempt",
+        "job_id",
+    ]
+)
+
+
+def get_upload_fingerprint(
+    s3_path: str, metadata: Dict[str, Any], file_hashes: Dict[str, str]
+) -> str:
+    """
+    Identify an upload by its destination, its stable metadata, and the content of
+    the benchmark result files that go into it
+    """
+    return hashlib.sha256(
+        json.dumps(
+            {
+                "s3_path": s3_path,
+                "metadata": {
+                    k: v for k, v in metadata.items() if k not in VOLATILE_METADATA
+                },
+                "files": file_hashes,
+            },
+            sort_keys=True,
+        ).encode()
+    ).hexdigest()
+
+
+def get_upload_key(destination: str, s3_path: str) -> str:
+    """
+    The same S3 path can be uploaded to several destinations, e.g. --sinks api,s3,
+    and each of them is tracked on its own
+    """
+    return f"{destination}:{s3_path}"
+
+
+def strip_volatile_metadata(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Remove the volatile metadata from an aggregated row, or from the header of the
+    compact encoding
+    """
+    record = {k: v for k, v in record.items() if k not in VOLATILE_METADATA}
+    if isinstance(record.get("metadata"), dict):
+        record["metadata"] = strip_volatile_metadata(record["metadata"])
+    return record
+
+
+def update_content_hash(sha256: Any, record: Dict[str, Any]) -> None:
+    """
+    Hash a row without its volatile metadata, so that the same benchmark results
+    have the same hash when the job is rerun
+    """
+    sha256.update(json.dumps(strip_volatile_metadata(record), sort_keys=True).encode())
+    sha256.update(b"\n")
+
+
+def get_shard_hash(data: str) -> str:
+    """
+    The content hash of a shard in JSONEachRow format
+    """
+    sha256 = hashlib.sha256()
+    for line in data.splitlines():
+        update_content_hash(sha256, json.loads(line))
+    return sha256.hexdigest()
+
+
+def get_file_hashes(benchmark_results_dir: str, filenames: Iterable[str]) -> Dict[str, str]:
+    file_hashes = {}
+    for filename in filenames:
+        with open(os.path.join(benchmark_results_dir, filename), "rb") as f:
+            file_hashes[filename] = hashlib.sha256(f.read()).hexdigest()
+    return file_hashes
+
+
+class UploadManifest:
+    """
+    Keep track of what has been uploaded to each S3 path and destination, keyed by
+    get_upload_key(), so that reruns can skip the uploads and the shards that have
+    not changed. The manifest is a local JSON
+    file or an S3 object when its location starts with s3://
+    """
+
+    def __init__(self, location: str):
+        self.location = location
+        self.lock = threading.Lock()
+        self.bytes_avoided = 0
+        self.uploads: Dict[str, Any] = self._read()
+
+    def _split_s3_location(self) -> Tuple[str, str]:
+        bucket, _, key = self.location[len("s3://") :].partition("/")
+        return bucket, key
+
+    def _read(self) -> Dict[str, Any]:
+        try:
+            if self.location.startswith("s3://"):
+                try:
+                    body = (
+                        boto3.resource("s3")
+                        .Object(*self._split_s3_location())
+                        .get()["Body"]
+                        .read()
+                    )
+                except ClientError as e:
+                    if e.response["Error"]["Code"] != "NoSuchKey":
+                        warning(f"Fail to load the upload manifest {self.location}: {e}")
+                    return {}
+                manifest = json.loads(body)
+            else:
+                if not os.path.exists(self.location):
+                    return {}
+                with open(self.location) as f:
+                    manifest = json.load(f)
+        except (JSONDecodeError, OSError) as e:
+            warning(f"Fail to load the upload manifest {self.location}: {e}")
+            return {}
+
+        if manifest.get("version") != UPLOAD_MANIFEST_VERSION:
+            warning(f"Unknown upload manifest version in {self.location}, ignoring it")
+            return {}
+        return manifest["uploads"]
+
+    def save(self) -> None:
+        # Hold the lock until the manifest is written, so that concurrent uploads
+        # don't overwrite it with an older version
+        with self.lock:
+            data = json.dumps(
+                {"version": UPLOAD_MANIFEST_VERSION, "uploads": self.uploads}
+            )
+
+            if self.location.startswith("s3://"):
+                boto3.resource("s3").Object(*self._split_s3_location()).put(
+                    Body=data.encode(), ContentType="application/json"
+                )
+            else:
+                os.makedirs(
+                    os.path.dirname(os.path.abspath(self.location)), exist_ok=True
+                )
+                with open(self.location, "w") as f:
+                    f.write(data)
+
+    def is_uploaded(self, key: str, fingerprint: str) -> bool:
+        with self.lock:
+            upload = self.uploads.get(key)
+            if not upload or upload.get("fingerprint") != fingerprint:
+                return False
+
+            self.bytes_avoided += upload.get("bytes", 0)
+            return True
+
+    def is_shard_uploaded(self, key: str, shard_path: str, sha256: str) -> bool:
+        with self.lock:
+            shard = self.uploads.get(key, {}).get("shards", {}).get(shard_path)
+            if not shard or shard["sha256"] != sha256:
+                return False
+
+            self.bytes_avoided += shard["bytes"]
+            return True
+
+    def record_shard(self, key: str, shard_path: str, sha256: str, size: int) -> None:
+        with self.lock:
+            upload = self.uploads.setdefault(key, {})
+            # Any change to the shards invalidates the fingerprint of the whole upload
+            upload.pop("fingerprint", None)
+            upload.setdefault("shards", {})[shard_path] = {
+                "sha256": sha256,
+                "bytes": size,
+            }
+
+    def record_upload(
+        self, key: str, fingerprint: Optional[str], shard_paths: Iterable[str]
+    ) -> None:
+        with self.lock:
+            upload = self.uploads.setdefault(key, {})
+            shards = upload.get("shards", {})
+            # Forget the shards that are not part of this upload anymore
+            upload["shards"] = {
+                shard_path: shards[shard_path]
+                for shard_path in shard_paths
+                if shard_path in shards
+            }
+            upload["fingerprint"] = fingerprint
+            upload["bytes"] = sum(shard["bytes"] for shard in upload["shards"].values())
+
+    def report(self) -> None:
+        info(f"Avoid sending {self.bytes_avoided} bytes that have been uploaded before")
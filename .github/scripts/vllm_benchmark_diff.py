@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+
+"""
+Find out which models and platforms are affected by the changes since a base
+git ref, so that a PR that only changes the configs of some models only needs
+to benchmark them. The configs are compared as parsed JSON test by test, so
+reformatting a file or reordering its tests affects nothing. Any change to the
+scripts and the workflow shared by all the benchmarks affects everything.
+
+Print the affected models and platforms of the current branch:
+
+python .github/scripts/vllm_benchmark_diff.py --benchmark-configs-dir vllm-benchmarks/benchmarks --base-ref origin/main
+"""
+
+import json
+import logging
+import os
+import re
+import subprocess
+from argparse import ArgumentParser
+from json.decoder import JSONDecodeError
+from logging import info, warning
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from vllm_benchmark_index import get_benchmark_config
+
+logging.basicConfig(level=logging.INFO)
+
+# The changes to these paths, relative to the root of the repo, could change the
+# result of any benchmark, so everything needs to run
+SHARED_PATHS = [
+    r"^\.github/workflows/vllm-benchmark\.yml$",
+    r"^\.github/actions/",
+    r"^\.github/scripts/(?!test_|microbenchmarks/|bisect/)[^/]+$",
+    r"^vllm-benchmarks/download_models\.sh$",
+]
+SHARED_PATHS_PATTERN = re.compile("|".join(SHARED_PATHS))
+
+
+def git(repo_dir: str, *args: str) -> str:
+    return subprocess.check_output(["git", *args], cwd=repo_dir, text=True)
+
+
+def get_changed_files(repo_dir: str, merge_base: str) -> List[str]:
+    """
+    Return the files changed since the merge base, including the uncommitted
+    changes, relative to the root of the repo
+    """
+    return [
+        path
+        for path in git(repo_dir, "diff", "--name-only", merge_base).splitlines()
+        if path
+    ]
+
+
+def load_configs(content: Optional[str], path: str) -> List[Dict[str, Any]]:
+    if not content:
+        return []
+    try:
+        configs = json.loads(content)
+    except JSONDecodeError as e:
+        warning(f"Fail to load {path}: {e}")
+        return []
+    return configs if isinstance(configs, list) else []
+
+
+def get_tests(configs: List[Dict[str, Any]]) -> Dict[str, Tuple[str, str]]:
+    """
+    Map each test to its model and its config in a canonical form. The tests
+    without a name are keyed by their position
+    """
+    tests = {}
+    for i, config in enumerate(configs):
+        model = get_benchmark_config(config).get("model")
+        if not model:
+            continue
+        tests[config.get("test_name") or f"#{i}"] = (
+            model.lower(),
+            json.dumps(config, sort_keys=True),
+        )
+    return tests
+
+
+def diff_configs(
+    old_configs: List[Dict[str, Any]], new_configs: List[Dict[str, Any]]
+) -> Set[str]:
+    """
+    Return the models of the tests that are added or changed. The models of the
+    removed tests are only affected if they still have other tests, which is
+    taken care of by the benchmark matrix that only has the models that exist
+    """
+    old_tests = get_tests(old_configs)
+    new_tests = get_tests(new_configs)
+    models = set()
+    for name in set(old_tests) | set(new_tests):
+        old, new = old_tests.get(name), new_tests.get(name)
+        if old == new:
+            continue
+        if old:
+            models.add(old[0])
+        if new:
+            models.add(new[0])
+    return models
+
+
+def get_affected_models(
+    benchmark_configs_dir: str, base_ref: str
+) -> Optional[Set[Tuple[str, str]]]:
+    """
+    Return the (model, platform) pairs whose configs have changed since the base
+    ref, or None if everything is affected. That's also the case when the changes
+    can't be found, e.g. the base ref isn't in a shallow clone
+    """
+    try:
+        return diff_affected_models(benchmark_configs_dir, base_ref)
+    except (subprocess.CalledProcessError, OSError) as e:
+        warning(f"Fail to find the changes since {base_ref}, run everything: {e}")
+        return None
+
+
+def diff_affected_models(
+    benchmark_configs_dir: str, base_ref: str
+) -> Optional[Set[Tuple[str, str]]]:
+    repo_dir = git(benchmark_configs_dir, "rev-parse", "--show-toplevel").strip()
+    configs_dir = os.path.relpath(
+        os.path.realpath(benchmark_configs_dir), os.path.realpath(repo_dir)
+    )
+
+    # Only the changes of this branch, not the ones on the base ref since then
+    merge_base = git(repo_dir, "merge-base", base_ref, "HEAD").strip()
+    affected = set()
+    for path in get_changed_files(repo_dir, merge_base):
+        if SHARED_PATHS_PATTERN.search(path):
+            info(f"{path} is shared by all the benchmarks, run everything")
+            return None
+
+        relpath = os.path.relpath(path, configs_dir)
+        parts = relpath.split(os.sep)
+        if relpath.startswith("..") or len(parts) != 2 or not path.endswith(".json"):
+            continue
+        platform = parts[0]
+
+        old_content = None
+        # A new file isn't there at the merge base
+        if git(repo_dir, "ls-tree", "--name-only", merge_base, "--", path).strip():
+            old_content = git(repo_dir, "show", f"{merge_base}:{path}")
+        new_content = None
+        if os.path.exists(os.path.join(repo_dir, path)):
+            with open(os.path.join(repo_dir, path)) as f:
+                new_content = f.read()
+
+        models = diff_configs(
+            load_configs(old_content, f"{merge_base}:{path}"),
+            load_configs(new_content, path),
+        )
+        if models:
+            info(f"{path} changes {', '.join(sorted(models))}")
+        affected.update((model, platform) for model in models)
+    return affected
+
+
+def main() -> None:
+    parser = ArgumentParser("Find the vLLM benchmarks affected by the changes")
+    parser.add_argument(
+        "--benchmark-configs-dir",
+        type=str,
+        default="vllm-benchmarks/benchmarks",
+        help="the directory contains vLLM benchmark configs",
+    )
+    parser.add_argument(
+        "--base-ref",
+        type=str,
+        required=True,
+        help="the git ref to compare with, e.g. origin/main",
+    )
+    args = parser.parse_args()
+    affected = get_affected_models(args.benchmark_configs_dir, args.base_ref)
+    if affected is None:
+        print("everything")
+        return
+    for model, platform in sorted(affected):
+        print(f"{platform} {model}")
+
+
+if __name__ == "__main__":
+    main()
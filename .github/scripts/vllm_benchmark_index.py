@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+
+"""
+An index of the vLLM benchmark configs, i.e. vllm-benchmarks/benchmarks, from
+model to platforms to test files to tensor parallel size, shared by
+generate_vllm_benchmark_matrix.py and setup_vllm_benchmark.py so that neither
+of them needs to parse all the configs again. The index is cached on disk by
+configs directory and each file in it is stamped with its mtime, size, and
+hash, so only the files that have changed since the last run are parsed again.
+
+Print the index:
+
+python .github/scripts/vllm_benchmark_index.py --benchmark-configs-dir vllm-benchmarks/benchmarks
+"""
+
+import glob
+import hashlib
+import json
+import logging
+import os
+from argparse import ArgumentParser
+from json.decoder import JSONDecodeError
+from logging import info, warning
+from typing import Any, Dict, List, Optional, Set
+
+logging.basicConfig(level=logging.INFO)
+
+CACHE_DIR = os.environ.get(
+    "BENCHMARK_INDEX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "pytorch-integration-testing"),
+)
+# Bump this when the layout of the index changes
+INDEX_VERSION = 2
+
+# All the different names vLLM uses to refer to their benchmark configs
+VLLM_BENCHMARK_CONFIGS_PARAMETER = set(
+    [
+        "parameters",
+        "server_parameters",
+        "common_parameters",
+    ]
+)
+# The tensor parallel size of the configs that don't set it
+DEFAULT_TP = 8
+
+
+def hash_file(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def get_benchmark_config(config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Return the parameters of the config that have the model and the TP
+    """
+    param = list(VLLM_BENCHMARK_CONFIGS_PARAMETER & set(config.keys()))
+    assert len(param) == 1
+    return config[param[0]]
+
+
+def parse_config_file(path: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    Return the model, the tensor parallel size, and the memory footprint hints
+    of each config in the file in order, or None if the file can't be parsed
+    """
+    with open(path) as f:
+        try:
+            configs = json.load(f)
+        except JSONDecodeError as e:
+            warning(f"Fail to load {path}: {e}")
+            return None
+
+    entries = []
+    for config in configs:
+        benchmark_config = get_benchmark_config(config)
+        if "model" not in benchmark_config:
+            warning(f"Model name is not set in {benchmark_config}, skipping...")
+            continue
+
+        if "tensor_parallel_size" in benchmark_config:
+            tp = benchmark_config["tensor_parallel_size"]
+        elif "tp" in benchmark_config:
+            tp = benchmark_config["tp"]
+        else:
+            tp = DEFAULT_TP
+        entries.append(
+            {
+                "test_name": config.get("test_name", ""),
+                "model": benchmark_config["model"].lower(),
+                "tp": tp,
+                # The hints to estimate the memory footprint of the test
+                "max_model_len": benchmark_config.get(
+                    "max_model_len", benchmark_config.get("max-model-len")
+                ),
+                "dtype": benchmark_config.get("dtype"),
+                "quantization": benchmark_config.get("quantization"),
+            }
+        )
+    return entries
+
+
+def get_cache_file(benchmark_configs_dir: str) -> str:
+    cache_key = hashlib.sha256(
+        os.path.realpath(benchmark_configs_dir).encode()
+    ).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f"vllm-benchmark-index-{cache_key}.json")
+
+
+def build_index(
+    benchmark_configs_dir: str, cached: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Index all the JSON files of all the platforms, reusing the entries of the
+    files in the cached index that haven't changed. A file whose mtime or size
+    has changed is only parsed again when its content has too, e.g. a fresh
+    checkout touches all the files without changing any of them
+    """
+    cached_files = (cached or {}).get("files", {})
+    files: Dict[str, Dict[str, Any]] = {}
+    parsed = 0
+
+    for platform in sorted(os.listdir(benchmark_configs_dir)):
+        platform_dir = os.path.join(benchmark_configs_dir, platform)
+        if not os.path.isdir(platform_dir):
+            continue
+
+        # Keep the glob order, the matrix follows the order of the configs
+        for file in glob.glob(f"{platform_dir}/*.json"):
+            filename = os.path.basename(file)
+            stat = os.stat(file)
+            record = cached_files.get(f"{platform}/{filename}")
+            if not record or (record["mtime_ns"], record["size"]) != (
+                stat.st_mtime_ns,
+                stat.st_size,
+            ):
+                sha256 = hash_file(file)
+                if not record or record["sha256"] != sha256:
+                    parsed += 1
+                    record = {"sha256": sha256, "entries": parse_config_file(file)}
+                record = {
+                    **record,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                }
+            files[f"{platform}/{filename}"] = {
+                **record,
+                "platform": platform,
+                "filename": filename,
+            }
+
+    models: Dict[str, Dict[str, Dict[str, int]]] = {}
+    for record in files.values():
+        for entry in record["entries"] or []:
+            tests = models.setdefault(entry["model"], {}).setdefault(
+                record["platform"], {}
+            )
+            # The first config of the model in the file sets its TP, the same as
+            # the dedup of the benchmark matrix
+            tests.setdefault(record["filename"], entry["tp"])
+
+    info(f"Parse {parsed} out of {len(files)} vLLM benchmark config files")
+    return {
+        "version": INDEX_VERSION,
+        "benchmark_configs_dir": os.path.realpath(benchmark_configs_dir),
+        "files": files,
+        "models": models,
+    }
+
+
+def load_index(
+    benchmark_configs_dir: str, cache_file: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Load the index of the configs directory from the cache, bringing it up to
+    date with the files on disk, and write it back if anything has changed
+    """
+    cache_file = cache_file or get_cache_file(benchmark_configs_dir)
+    cached = None
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            try:
+                cached = json.load(f)
+            except JSONDecodeError as e:
+                warning(f"Fail to load {cache_file}: {e}")
+        if cached and cached.get("version") != INDEX_VERSION:
+            cached = None
+
+    index = build_index(benchmark_configs_dir, cached)
+    if index == cached:
+        return index
+
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        with open(f"{cache_file}.tmp", "w") as f:
+            json.dump(index, f)
+        os.replace(f"{cache_file}.tmp", cache_file)
+    except OSError as e:
+        warning(f"Fail to cache the vLLM benchmark config index in {cache_file}: {e}")
+    return index
+
+
+def get_platform_files(index: Dict[str, Any], platform: str) -> List[Dict[str, Any]]:
+    return [
+        record for record in index["files"].values() if record["platform"] == platform
+    ]
+
+
+def get_platform_tests(
+    index: Dict[str, Any], platform: str, pattern: str = "serving"
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Return the tests of each model of the platform in the files whose name has
+    the pattern, the models in the order they first appear. Only the serving
+    configs are used by default because they have all the models
+    """
+    tests: Dict[str, List[Dict[str, Any]]] = {}
+    for record in get_platform_files(index, platform):
+        if pattern not in record["filename"]:
+            continue
+        for entry in record["entries"] or []:
+            tests.setdefault(entry["model"], []).append(entry)
+    return tests
+
+
+def get_platform_models(
+    index: Dict[str, Any], platform: str, pattern: str = "serving"
+) -> Dict[str, int]:
+    """
+    Return the models of the platform with the tensor parallel size of their
+    first test, see get_platform_tests
+    """
+    return {
+        model: tests[0]["tp"]
+        for model, tests in get_platform_tests(index, platform, pattern).items()
+    }
+
+
+def get_config_files(
+    index: Dict[str, Any], platform: str, models: Set[str]
+) -> List[str]:
+    """
+    Return the config files of the platform that have any of the models
+    """
+    return [
+        record["filename"]
+        for record in get_platform_files(index, platform)
+        if any(entry["model"] in models for entry in record["entries"] or [])
+    ]
+
+
+def main() -> None:
+    parser = ArgumentParser("Index the vLLM benchmark configs")
+    parser.add_argument(
+        "--benchmark-configs-dir",
+        type=str,
+        default="vllm-benchmarks/benchmarks",
+        help="the directory contains vLLM benchmark configs",
+    )
+    args = parser.parse_args()
+    print(json.dumps(load_index(args.benchmark_configs_dir)["models"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
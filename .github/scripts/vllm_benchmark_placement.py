@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+"""
+A rough capacity model to place each vLLM benchmark on the smallest runner that
+fits it, instead of the fixed mapping from tensor parallel size to runners. The
+memory that a test needs on each device is the weights of the model, from its
+number of parameters and its dtype or quantization, plus the KV cache for a few
+sequences of max_model_len tokens, split across its tensor parallel size. Both
+are estimates, good enough to tell an 8B model from a 400B one, not to tune
+gpu_memory_utilization.
+"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+# The devices of each runner, GPUs or HPUs, or the NUMA nodes of the CPU runners,
+# and the memory of each device in GB. The runners without a capacity are never
+# picked by the memory placement
+RUNNER_CAPACITY = {
+    "mt-l-x86iamx-22-225-h100": {"devices": 1, "memory": 80},
+    "mt-l-x86iamx-88-900-h100-4": {"devices": 4, "memory": 80},
+    "mt-l-bx86iamx-176-1800-h100-8": {"devices": 8, "memory": 80},
+    "linux.dgx.b200": {"devices": 1, "memory": 180},
+    "linux.dgx.b200.8": {"devices": 8, "memory": 180},
+    "linux.rocm.gpu.gfx942.1": {"devices": 1, "memory": 192},
+    "linux.rocm.gpu.gfx942.2": {"devices": 2, "memory": 192},
+    "linux.rocm.gpu.gfx942.4": {"devices": 4, "memory": 192},
+    "linux.rocm.gpu.gfx942.8": {"devices": 8, "memory": 192},
+    "linux.hpu.gaudi3.8": {"devices": 8, "memory": 128},
+    # The CPU runners use the host memory, shared by their NUMA nodes
+    "linux.24xl.spr-metal": {"devices": 1, "memory": 192},
+    "linux.24xl.gnr": {"devices": 2, "memory": 96},
+    "linux.arm64.m8g.4xlarge": {"devices": 1, "memory": 64},
+}
+
+# The number of parameters of the models in billions, and the dtype of their
+# checkpoints when they are quantized without saying so in their names. The size
+# of the other models is guessed from their names, e.g. Qwen3-8B
+MODEL_PARAMETERS = {
+    "mistralai/mixtral-8x7b-instruct-v0.1": {"parameters": 46.7},
+    "qwen/qwen3-30b-a3b": {"parameters": 30.5},
+    "meta-llama/llama-4-scout-17b-16e-instruct": {"parameters": 109},
+    "meta-llama/llama-4-maverick-17b-128e-instruct-fp8": {"parameters": 400},
+    "openai/gpt-oss-20b": {"parameters": 21, "dtype": "mxfp4"},
+    "openai/gpt-oss-120b": {"parameters": 117, "dtype": "mxfp4"},
+    "deepseek-ai/deepseek-v3.1": {"parameters": 671, "dtype": "fp8"},
+    "deepseek-ai/deepseek-v3.2": {"parameters": 671, "dtype": "fp8"},
+    "deepseek-ai/deepseek-r1": {"parameters": 671, "dtype": "fp8"},
+}
+
+# The bytes per parameter of each dtype, the quantized ones are also looked for
+# in the model names, e.g. gemma-3-27b-it-INT4
+BYTES_PER_PARAMETER = {
+    "float32": 4,
+    "float": 4,
+    "bfloat16": 2,
+    "float16": 2,
+    "half": 2,
+    "auto": 2,
+    "fp8": 1,
+    "int8": 1,
+    "w8a8": 1,
+    "int4": 0.5,
+    "w4a16": 0.5,
+    "awq": 0.5,
+    "gptq": 0.5,
+    "mxfp4": 0.5,
+}
+QUANTIZED_DTYPES_PATTERN = re.compile(r"\b(fp8|int8|w8a8|int4|w4a16|awq|gptq|mxfp4)\b")
+MODEL_SIZE_PATTERN = re.compile(r"(?<![\w.])(\d+(?:\.\d+)?)([bm])(?![a-z0-9])")
+
+# Most of the configs set max_model_len to this, or less
+DEFAULT_MAX_MODEL_LEN = 8192
+# The KV cache needs to hold a few full sequences for the benchmark to run
+# concurrent requests without preempting all the time
+KV_CACHE_SEQUENCES = 4
+# The KV cache of a token grows with the size of the model until the number of
+# layers and KV heads stops growing, e.g. 128KB for Llama 3.1 8B. This is an
+# overestimate for the models with GQA or MLA, which is on the safe side
+KV_CACHE_BYTES_PER_TOKEN_PER_BILLION = 16 * 1024
+KV_CACHE_MAX_BILLIONS = 70
+# The same as the default gpu_memory_utilization of vLLM, the rest of the memory
+# and this much on top are for the activations, CUDA graphs, and the runtime
+MEMORY_UTILIZATION = 0.9
+RUNTIME_OVERHEAD = 3
+# Flag the placements that use less than this fraction of the memory of the
+# devices they use
+WASTED_MEMORY_THRESHOLD = 0.25
+
+
+def get_model_parameters(model: str) -> Optional[float]:
+    """
+    Return the number of parameters of the model in billions, or None if it's
+    unknown
+    """
+    if model in MODEL_PARAMETERS:
+        return MODEL_PARAMETERS[model]["parameters"]
+    sizes = [
+        float(size) / (1000 if unit == "m" else 1)
+        for size, unit in MODEL_SIZE_PATTERN.findall(model.split("/")[-1])
+    ]
+    # The largest number is the total size, e.g. Qwen3-30B-A3B is 30B
+    return max(sizes) if sizes else None
+
+
+def get_bytes_per_parameter(test: Dict[str, Any]) -> float:
+    """
+    The weights of a quantized checkpoint keep their dtype, the dtype of the
+    config only applies to the unquantized ones
+    """
+    model = test["model"]
+    native = MODEL_PARAMETERS.get(model, {}).get("dtype")
+    if native:
+        return BYTES_PER_PARAMETER[native]
+    match = QUANTIZED_DTYPES_PATTERN.search(model.split("/")[-1].replace("-", " "))
+    if match:
+        return BYTES_PER_PARAMETER[match.group(1)]
+    dtype = str(test.get("dtype") or "auto").lower()
+    return BYTES_PER_PARAMETER.get(dtype, 2)
+
+
+def estimate_memory(test: Dict[str, Any]) -> Optional[Dict[str, float]]:
+    """
+    Return the estimated weights and KV cache of the test in GB, and how much of
+    them is on each device, or None if the size of the model is unknown
+    """
+    parameters = get_model_parameters(test["model"])
+    if parameters is None:
+        return None
+
+    weights = parameters * get_bytes_per_parameter(test)
+    max_model_len = test.get("max_model_len") or DEFAULT_MAX_MODEL_LEN
+    kv_cache = (
+        KV_CACHE_BYTES_PER_TOKEN_PER_BILLION
+        * min(parameters, KV_CACHE_MAX_BILLIONS)
+        * max_model_len
+        * KV_CACHE_SEQUENCES
+        / 1024**3
+    )
+    return {
+        "weights": weights,
+        "kv_cache": kv_cache,
+        "per_device": (weights + kv_cache) / test["tp"] + RUNTIME_OVERHEAD,
+    }
+
+
+def get_usable_memory(runner: str) -> float:
+    return RUNNER_CAPACITY[runner]["memory"] * MEMORY_UTILIZATION
+
+
+def get_min_tp(estimate: Dict[str, float], runner: str) -> int:
+    """
+    The smallest power of two tensor parallel size that fits the test on the
+    devices of the runner
+    """
+    usable = get_usable_memory(runner) - RUNTIME_OVERHEAD
+    if usable <= 0:
+        return RUNNER_CAPACITY[runner]["devices"]
+    devices = math.ceil((estimate["weights"] + estimate["kv_cache"]) / usable)
+    return 2 ** math.ceil(math.log2(max(devices, 1)))
+
+
+def place_model(
+    model: str,
+    tests: List[Dict[str, Any]],
+    runners: List[str],
+    skipped_runners: Optional[Set[str]] = None,
+) -> Tuple[Optional[str], List[str]]:
+    """
+    Pick the smallest runner, by its total memory then its number of devices,
+    that has enough devices for the largest tensor parallel size of the tests of
+    the model and enough memory on each device for all of them. Return the runner,
+    or None if none fits, and the reasons behind the decision
+    """
+    tp = max(test["tp"] for test in tests)
+    estimates = [estimate_memory(test) for test in tests]
+    known = [e for e in estimates if e is not None]
+    need = max((e["per_device"] for e in known), default=None)
+    largest = max(known, key=lambda e: e["per_device"]) if known else None
+
+    reasons = []
+    if largest is None:
+        reasons.append(f"{model}: the size is unknown, only check the device count")
+    else:
+        reasons.append(
+            f"{model}: TP {tp}, {largest['weights']:.0f}GB of weights and "
+            f"{largest['kv_cache']:.0f}GB of KV cache, {need:.0f}GB per device"
+        )
+
+    fits = []
+    for runner in runners:
+        capacity = RUNNER_CAPACITY.get(runner)
+        if skipped_runners and runner in skipped_runners:
+            reasons.append(f"  {runner}: skipped by PLATFORM_SKIPS")
+        elif not capacity:
+            reasons.append(f"  {runner}: unknown capacity, skip")
+        elif capacity["devices"] < tp:
+            reasons.append(f"  {runner}: only {capacity['devices']} devices")
+        elif need is not None and need > get_usable_memory(runner):
+            reasons.append(
+                f"  {runner}: only {get_usable_memory(runner):.0f}GB usable per device"
+            )
+        else:
+            fits.append(runner)
+    if not fits:
+        reasons.append("  no runner fits")
+        return None, reasons
+
+    runner = min(
+        fits,
+        key=lambda r: (
+            RUNNER_CAPACITY[r]["devices"] * RUNNER_CAPACITY[r]["memory"],
+            RUNNER_CAPACITY[r]["devices"],
+            r,
+        ),
+    )
+    capacity = RUNNER_CAPACITY[runner]
+    reasons.append(
+        f"  pick {runner}, the smallest of {', '.join(fits)}"
+        if len(fits) > 1
+        else f"  pick {runner}, the only one that fits"
+    )
+    if capacity["devices"] > tp:
+        reasons.append(
+            f"  WASTED: {capacity['devices'] - tp} out of {capacity['devices']} devices are idle"
+        )
+    if largest and need < WASTED_MEMORY_THRESHOLD * get_usable_memory(runner):
+        min_tp = get_min_tp(largest, runner)
+        reasons.append(
+            f"  WASTED: only {need / get_usable_memory(runner):.0%} of the memory of each device is used"
+            + (f", it would fit with TP {min_tp}" if min_tp < tp else "")
+        )
+    return runner, reasons